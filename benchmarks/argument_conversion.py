@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for the argument and return value conversion of
+:class:`~plankton.adapters.stream.Cmd`.
+
+The ``set_target``-command of the example motor (``T=12.5``) is processed by
+:meth:`~plankton.adapters.stream.StreamAdapter.handle_request` to measure the complete request
+path. In addition, the conversion of the captured groups alone is compared to applying the
+mappings with ``zip`` on each call, and unpacking binary arguments with ``argument_struct`` is
+compared to doing it in an argument mapping:
+
+::
+
+    $ python -m benchmarks.argument_conversion
+"""
+
+from __future__ import print_function
+
+import argparse
+import struct
+
+from plankton.adapters.stream import Cmd
+from plankton.examples.example_motor import SimulatedExampleMotor, ExampleMotorStreamInterface
+
+from benchmarks.command_dispatch import requests_per_second
+
+
+def zip_mapping(cmd, groups):
+    return [f(a) for f, a in zip(cmd.argument_mappings, groups)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark stream argument conversion.')
+    parser.add_argument('-n', '--requests', type=int, default=30000,
+                        help='Number of requests per measurement.')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='Number of repetitions, the best result is reported.')
+    arguments = parser.parse_args()
+
+    adapter = ExampleMotorStreamInterface(SimulatedExampleMotor(), [])
+
+    requests = [b'T=12.5', b'T=100', b'T=-3.25'] * (arguments.requests // 3)
+    set_target = Cmd('set_target', r'^T=([-+]?[0-9]*\.?[0-9]+)$', argument_mappings=(float,))
+    groups = [set_target.pattern.match(request).groups() for request in requests]
+
+    binary = [(struct.pack('>hd', i, 0.5 * i),) for i in range(len(requests))]
+    binary_mapping = Cmd('a', r'^(.{10})$', argument_mappings=(lambda x: struct.unpack('>hd', x),))
+    binary_struct = Cmd('a', r'^(.{10})$', argument_struct='>hd')
+
+    results = [
+        ('handle_request(T=...)', adapter.handle_request, requests),
+        ('zip mapping', lambda g: zip_mapping(set_target, g), groups),
+        ('convert_arguments', set_target.convert_arguments, groups),
+        ('struct in mapping', binary_mapping.convert_arguments, binary),
+        ('argument_struct', binary_struct.convert_arguments, binary),
+    ]
+
+    print('{:>25} {:>15}'.format('', 'Requests/s'))
+
+    for name, function, data in results:
+        print('{:>25} {:>15.0f}'.format(
+            name, requests_per_second(function, data, arguments.repeat)))
+
+
+if __name__ == '__main__':
+    main()
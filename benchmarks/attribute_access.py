@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for access to device attributes through adapters.
+
+Adapters used to install :class:`~plankton.adapters.ForwardProperty` descriptors on their
+type and :class:`~plankton.adapters.ForwardMethod` objects on themselves to forward access to
+the device. The benchmark compares these to the accessors created by
+:func:`~plankton.adapters.create_accessors`, to bound methods resolved once and to direct
+access on the device:
+
+::
+
+    $ python -m benchmarks.attribute_access --number 1000000
+"""
+
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from plankton.adapters import ForwardMethod, ForwardProperty, create_accessors
+
+
+class Device(object):
+    def __init__(self):
+        self._speed = 1.0
+
+    @property
+    def speed(self):
+        """Speed of the device."""
+        return self._speed
+
+    @speed.setter
+    def speed(self, value):
+        self._speed = value
+
+    def get_speed(self):
+        return self._speed
+
+
+class Adapter(object):
+    def __init__(self, device):
+        self._device = device
+
+
+def make_forwarding_adapter(device):
+    # A new type per adapter, like EpicsAdapter did, so that other benchmarks are not affected.
+    adapter_type = type('ForwardingAdapter', (Adapter,), {})
+    adapter = adapter_type(device)
+
+    adapter_type.speed = ForwardProperty('_device', 'speed', instance=adapter)
+    adapter.get_speed = ForwardMethod(device, 'get_speed')
+
+    return adapter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark attribute access via adapters.')
+    parser.add_argument('-n', '--number', type=int, default=1000000,
+                        help='Number of accesses per measurement.')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of repetitions, the best result is reported.')
+    arguments = parser.parse_args()
+
+    device = Device()
+    adapter = make_forwarding_adapter(device)
+    getter, setter = create_accessors(device, 'speed')
+    method = device.get_speed
+
+    cases = (
+        ('ForwardProperty get', lambda: adapter.speed),
+        ('Accessor get', getter),
+        ('Direct get', lambda: device.speed),
+        ('ForwardProperty set', lambda: setattr(adapter, 'speed', 2.0)),
+        ('Accessor set', lambda: setter(2.0)),
+        ('Direct set', lambda: setattr(device, 'speed', 2.0)),
+        ('ForwardMethod call', lambda: adapter.get_speed()),
+        ('Bound method call', method),
+    )
+
+    for name, function in cases:
+        duration = min(timeit.repeat(function, number=arguments.number,
+                                     repeat=arguments.repeat))
+
+        print('{:<20} {:.0f} ns'.format(name + ':', 1e9 * duration / arguments.number))
+
+
+if __name__ == '__main__':
+    main()
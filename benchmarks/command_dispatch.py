@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for finding the command that matches a request in
+:class:`~plankton.adapters.stream.StreamAdapter`.
+
+Interfaces with an increasing number of commands are generated, the commands follow the
+pattern of typical device protocols (``P12?`` to query parameter 12, ``P12=3.5`` to set it).
+For each interface, the number of requests per second is measured for the linear search over
+all commands and for the :class:`~plankton.adapters.stream.CommandIndex`:
+
+::
+
+    $ python -m benchmarks.command_dispatch
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import timeit
+
+from plankton.adapters.stream import Cmd, CommandIndex
+
+
+def make_commands(count):
+    commands = []
+
+    for i in range(count // 2):
+        commands.append(Cmd('get', r'^P{}\?$'.format(i)))
+        commands.append(Cmd('set', r'^P{}=([-+]?[0-9]*\.?[0-9]+)$'.format(i)))
+
+    return commands
+
+
+def make_requests(count, number):
+    rng = random.Random(1)
+    requests = []
+
+    for _ in range(number):
+        parameter = rng.randrange(count // 2)
+        requests.append(rng.choice(['P{}?', 'P{}=3.5']).format(parameter).encode())
+
+    return requests
+
+
+def linear_match(commands, request):
+    for cmd in commands:
+        match = cmd.pattern.match(request)
+        if match:
+            return cmd, match
+
+    return None, None
+
+
+def requests_per_second(function, requests, repeat):
+    def run():
+        for request in requests:
+            function(request)
+
+    return len(requests) / min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark stream command dispatch.')
+    parser.add_argument('-c', '--commands', type=int, nargs='+', default=[10, 20, 40, 80, 160],
+                        help='Numbers of commands to benchmark.')
+    parser.add_argument('-n', '--requests', type=int, default=20000,
+                        help='Number of requests per measurement.')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='Number of repetitions, the best result is reported.')
+    arguments = parser.parse_args()
+
+    print('{:>10} {:>15} {:>15}'.format('Commands', 'Linear [req/s]', 'Index [req/s]'))
+
+    for count in arguments.commands:
+        commands = make_commands(count)
+        index = CommandIndex(commands)
+        requests = make_requests(count, arguments.requests)
+
+        linear = requests_per_second(
+            lambda request: linear_match(commands, request), requests, arguments.repeat)
+        indexed = requests_per_second(index.match, requests, arguments.repeat)
+
+        print('{:>10} {:>15.0f} {:>15.0f}'.format(count, linear, indexed))
+
+
+if __name__ == '__main__':
+    main()
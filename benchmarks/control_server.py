@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for the control server of :class:`~plankton.core.simulation.Simulation`.
+
+The very simple example device is simulated in a background thread with a control server.
+A :class:`~plankton.core.control_client.ControlClient` reads a device property repeatedly,
+each read is one roundtrip. The benchmark reports the number of reads per second and the
+latency distribution, which depend on how many requests the server handles per cycle:
+
+::
+
+    $ python -m benchmarks.control_server --reads 500 --cycle-delay 0.1
+
+With ``--batch``, the given number of reads is combined into one batch request, the latency
+is then reported per batch. With ``--thread``, the control server answers requests in a
+background thread (see :class:`~plankton.core.control_server.ThreadedControlServer`).
+"""
+
+from __future__ import print_function
+
+import argparse
+import threading
+import time
+
+from plankton.core.control_client import ControlClient
+from plankton.core.simulation import Simulation
+from plankton.examples.simple_device import VerySimpleDevice, VerySimpleInterface
+
+from .stream_server import free_port, report
+
+
+def start_simulation(control_port, cycle_delay, control_server_thread=False):
+    device = VerySimpleDevice()
+    adapter = VerySimpleInterface(device, ['-b', '127.0.0.1', '-p', str(free_port())])
+
+    simulation = Simulation(device=device, adapter=adapter,
+                            control_server='127.0.0.1:{}'.format(control_port),
+                            control_server_thread=control_server_thread)
+    simulation.cycle_delay = cycle_delay
+
+    thread = threading.Thread(target=simulation.start)
+    thread.daemon = True
+    thread.start()
+
+    return simulation, thread
+
+
+def run_reads(client, reads, batch_size=0):
+    device = client.get_object('device')
+    latencies = []
+
+    for _ in range(reads if not batch_size else reads // batch_size):
+        start = time.time()
+
+        if batch_size:
+            with client.batch() as batch:
+                values = [batch.device.param for _ in range(batch_size)]
+
+            [value.result() for value in values]
+        else:
+            device.param
+
+        latencies.append(time.time() - start)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the control server.')
+    parser.add_argument('-n', '--reads', type=int, default=500,
+                        help='Number of property reads.')
+    parser.add_argument('-c', '--cycle-delay', type=float, default=0.1,
+                        help='Cycle delay of the simulation.')
+    parser.add_argument('-b', '--batch', type=int, default=0,
+                        help='Number of reads per batch request, 0 disables batches.')
+    parser.add_argument('-t', '--thread', action='store_true',
+                        help='Answer requests in a background thread.')
+    arguments = parser.parse_args()
+
+    port = free_port()
+    simulation, thread = start_simulation(port, arguments.cycle_delay, arguments.thread)
+
+    client = ControlClient('127.0.0.1', port)
+
+    start = time.time()
+    latencies = run_reads(client, arguments.reads, arguments.batch)
+    duration = time.time() - start
+
+    simulation.stop()
+    thread.join()
+
+    print('Reads/s:       {:.0f}'.format(arguments.reads / duration))
+    report(latencies, duration)
+
+
+if __name__ == '__main__':
+    main()
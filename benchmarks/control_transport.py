@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Latency benchmark for the transports supported by the control server.
+
+A :class:`~plankton.core.control_server.ThreadedControlServer` exposes the very simple example
+device, so property reads are answered from its background thread independently of the
+simulation cycle. A :class:`~plankton.core.control_client.ControlClient` reads a property
+repeatedly via TCP on the loopback interface, via IPC (Unix domain sockets) and, for reference,
+in-process. The latency distribution is reported for each transport:
+
+::
+
+    $ python -m benchmarks.control_transport --reads 5000
+
+IPC is not available on Windows.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from plankton.core.control_client import ControlClient
+from plankton.core.control_server import ThreadedControlServer
+from plankton.examples.simple_device import VerySimpleDevice
+
+from .control_server import run_reads
+from .stream_server import free_port, report
+
+
+def serve(server, stop):
+    server.start_server()
+
+    while not stop.is_set():
+        server.process()
+        time.sleep(0.001)
+
+    server.stop_server()
+
+
+def measure(endpoint, reads):
+    server = ThreadedControlServer({'device': VerySimpleDevice()}, endpoint)
+    stop = threading.Event()
+
+    thread = threading.Thread(target=serve, args=(server, stop))
+    thread.daemon = True
+    thread.start()
+
+    client = ControlClient(endpoint)
+    run_reads(client, 100)
+
+    start = time.time()
+    latencies = run_reads(client, reads)
+    duration = time.time() - start
+
+    stop.set()
+    thread.join()
+
+    return latencies, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the latency of control transports.')
+    parser.add_argument('-n', '--reads', type=int, default=5000,
+                        help='Number of property reads per transport.')
+    arguments = parser.parse_args()
+
+    endpoints = [
+        ('TCP', 'tcp://127.0.0.1:{}'.format(free_port())),
+        ('IPC', 'ipc://{}'.format(
+            os.path.join(tempfile.gettempdir(), 'plankton-benchmark-{}'.format(os.getpid())))),
+        ('inproc', 'inproc://plankton-benchmark'),
+    ]
+
+    for name, endpoint in endpoints:
+        latencies, duration = measure(endpoint, arguments.reads)
+
+        print('{} ({})'.format(name, endpoint))
+        report(latencies, duration)
+        print()
+
+        if endpoint.startswith('ipc://') and os.path.exists(endpoint[len('ipc://'):]):
+            os.remove(endpoint[len('ipc://'):])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for :class:`~plankton.adapters.datagram.DatagramAdapter`, the counterpart of
+:mod:`benchmarks.stream_server` for UDP.
+
+The very simple example device is exposed via UDP in a simulation that runs in a background
+thread. Each client sends a request and waits for the reply before sending the next one.
+Since UDP does not guarantee delivery, a client re-sends its request if no reply arrived
+within a timeout. The benchmark reports the number of requests per second and the latency
+distribution as seen by the clients, as well as the statistics of the server:
+
+::
+
+    $ python -m benchmarks.datagram_server --clients 100 --duration 10
+"""
+
+from __future__ import print_function
+
+import argparse
+import selectors
+import socket
+import threading
+import time
+
+from plankton.adapters.datagram import DatagramAdapter
+from plankton.core.simulation import Simulation
+from plankton.examples.simple_device import VerySimpleDevice, VerySimpleInterface
+
+from benchmarks.stream_server import report
+
+
+class VerySimpleDatagramInterface(DatagramAdapter, VerySimpleInterface):
+    pass
+
+
+def start_simulation(cycle_delay):
+    device = VerySimpleDevice()
+    adapter = VerySimpleDatagramInterface(device, ['-b', '127.0.0.1', '-p', '0'])
+
+    simulation = Simulation(device=device, adapter=adapter)
+    simulation.cycle_delay = cycle_delay
+
+    thread = threading.Thread(target=simulation.start)
+    thread.daemon = True
+    thread.start()
+
+    while getattr(adapter, '_server', None) is None:
+        time.sleep(0.01)
+
+    return simulation, thread, adapter
+
+
+def run_clients(address, count, request, duration, timeout=0.5):
+    selector = selectors.DefaultSelector()
+    latencies = []
+    sent_at = {}
+
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+
+        sent_at[sock] = time.time()
+        sock.sendto(request, address)
+
+    end = time.time() + duration
+
+    while time.time() < end:
+        for key, _ in selector.select(0.1):
+            sock = key.fileobj
+            sock.recv(65536)
+
+            now = time.time()
+            latencies.append(now - sent_at[sock])
+
+            sent_at[sock] = now
+            sock.sendto(request, address)
+
+        now = time.time()
+        for sock, sent in sent_at.items():
+            if now - sent > timeout:
+                sent_at[sock] = now
+                sock.sendto(request, address)
+
+    for key in list(selector.get_map().values()):
+        key.fileobj.close()
+
+    selector.close()
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the datagram adapter\'s UDP server.')
+    parser.add_argument('-n', '--clients', type=int, default=100,
+                        help='Number of concurrent clients.')
+    parser.add_argument('-d', '--duration', type=float, default=10.0,
+                        help='Duration of the benchmark in seconds.')
+    parser.add_argument('-c', '--cycle-delay', type=float, default=0.1,
+                        help='Cycle delay of the simulation.')
+    arguments = parser.parse_args()
+
+    simulation, thread, adapter = start_simulation(arguments.cycle_delay)
+
+    latencies = run_clients(adapter._server._socket.getsockname(), arguments.clients,
+                            b'P\r\n', arguments.duration)
+
+    simulation.stop()
+    thread.join()
+
+    print('Clients:       {}'.format(arguments.clients))
+    report(latencies, arguments.duration)
+
+    statistics = adapter.statistics
+    print('Server:        {} requests, {} replies, {} dropped'.format(
+        statistics['requests'], statistics['replies'], statistics['dropped']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for scheduling PV updates in :class:`~plankton.adapters.epics.PropertyExposingDriver`.
+
+An interface with many PVs with different poll intervals is simulated for a number of cycles.
+The benchmark compares walking over all PVs in each cycle to check whether they are due with
+the :class:`~plankton.adapters.epics.PollScheduler`, which only touches PVs that are due.
+The update loops of the driver are reproduced here, so pcaspy is not required:
+
+::
+
+    $ python -m benchmarks.pv_polling --pvs 10000
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import timeit
+
+from plankton.adapters.epics import PV, PollScheduler
+
+
+class Target(object):
+    value = 1.0
+
+
+def make_pvs(count):
+    rng = random.Random(1)
+
+    return {'PV{}'.format(i): PV('value', poll_interval=rng.choice([0.1, 0.5, 1.0, 5.0, 10.0]))
+            for i in range(count)}
+
+
+def run_linear(pvs, target, cycles, dt):
+    timers = {name: 0.0 for name in pvs}
+    params = {}
+
+    for _ in range(cycles):
+        for pv, pv_object in pvs.items():
+            timers[pv] += dt
+            if timers[pv] >= pv_object.poll_interval:
+                params[pv] = getattr(target, pv_object.property)
+                timers[pv] = 0.0
+
+    return params
+
+
+def run_scheduled(pvs, target, cycles, dt):
+    scheduler = PollScheduler({name: pv.poll_interval for name, pv in pvs.items()})
+    params = {}
+
+    for _ in range(cycles):
+        for pv in scheduler.advance(dt):
+            pv_object = pvs[pv]
+            params[pv] = getattr(target, pv_object.property)
+            scheduler.schedule(pv, pv_object.poll_interval)
+
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scheduling of PV updates.')
+    parser.add_argument('-n', '--pvs', type=int, default=10000,
+                        help='Number of PVs.')
+    parser.add_argument('-c', '--cycles', type=int, default=1000,
+                        help='Number of simulated cycles.')
+    parser.add_argument('-d', '--cycle-delay', type=float, default=0.01,
+                        help='Simulated time between cycles.')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of repetitions, the best result is reported.')
+    arguments = parser.parse_args()
+
+    pvs = make_pvs(arguments.pvs)
+    target = Target()
+
+    print('PVs:    {}, cycles: {}'.format(arguments.pvs, arguments.cycles))
+
+    for name, function in (('Linear', run_linear), ('Heap', run_scheduled)):
+        duration = min(timeit.repeat(
+            lambda: function(pvs, target, arguments.cycles, arguments.cycle_delay),
+            number=1, repeat=arguments.repeat))
+
+        print('{:<7} {:.3f} ms per cycle'.format(name + ':', 1000 * duration / arguments.cycles))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for the codecs of the control channel, see :mod:`plankton.core.serialization`.
+
+An object with a scalar and an array property is exposed via a
+:class:`~plankton.core.control_server.ControlServer` that runs in a background thread. For
+each available codec, a :class:`~plankton.core.control_client.ControlClient` reads both
+properties repeatedly and the number of roundtrips per second is reported:
+
+::
+
+    $ python -m benchmarks.serialization --array-size 1048576
+
+The array contains double precision numbers, its size is given in bytes. NumPy is used for
+the array if it is installed, otherwise ``array.array``.
+"""
+
+from __future__ import print_function
+
+import argparse
+import threading
+import time
+import timeit
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from plankton.core.control_client import ControlClient
+from plankton.core.control_server import ControlServer
+from plankton.core.serialization import codecs
+
+from .stream_server import free_port
+
+
+class Source(object):
+    def __init__(self, array_size):
+        self.scalar = 1.5
+
+        count = array_size // 8
+        self.array = numpy.random.random(count) if numpy is not None else array('d', [0.5]) * count
+
+
+def start_server(port, source):
+    server = ControlServer({'source': source}, '127.0.0.1:{}'.format(port), time_budget=1.0)
+    server.start_server()
+
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            if not server.process():
+                time.sleep(0.001)
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+
+    return stop, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark codecs of the control channel.')
+    parser.add_argument('-s', '--array-size', type=int, default=1024 * 1024,
+                        help='Size of the array in bytes.')
+    parser.add_argument('-n', '--number', type=int, default=20,
+                        help='Number of array reads per measurement, scalars are read 100 times '
+                             'as often.')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of repetitions, the best result is reported.')
+    arguments = parser.parse_args()
+
+    port = free_port()
+    stop, thread = start_server(port, Source(arguments.array_size))
+
+    print('Array:    {} bytes, {}'.format(
+        arguments.array_size, 'NumPy' if numpy is not None else 'array.array'))
+
+    for name in sorted(codecs):
+        source = ControlClient('127.0.0.1', port, codec=name).get_object('source')
+
+        for prop, number in (('scalar', 100 * arguments.number), ('array', arguments.number)):
+            duration = min(timeit.repeat(lambda: getattr(source, prop), number=number,
+                                         repeat=arguments.repeat))
+
+            print('{:<8}  {:<6}  {:8.0f} roundtrips/s'.format(name, prop, number / duration))
+
+    stop.set()
+    thread.join()
+
+
+if __name__ == '__main__':
+    main()
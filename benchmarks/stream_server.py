@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+Benchmark for the TCP server of :class:`~plankton.adapters.stream.StreamAdapter`.
+
+The very simple example device is exposed in a simulation that runs in a background thread.
+A number of telnet-style clients connect to it, each client sends one request and waits for
+the reply before sending the next one. The benchmark reports the number of requests per second
+and the latency distribution:
+
+::
+
+    $ python -m benchmarks.stream_server --clients 500 --duration 10
+
+With ``--pipeline``, clients send several requests back-to-back and wait for all replies
+before sending the next batch, like polling clients that query several values at once.
+
+Each client needs a file descriptor on both ends of the connection, so the limit on open files
+(``ulimit -n``) must be larger than twice the number of clients.
+"""
+
+from __future__ import print_function
+
+import argparse
+import selectors
+import socket
+import threading
+import time
+
+from plankton.core.simulation import Simulation
+from plankton.examples.simple_device import VerySimpleDevice, VerySimpleInterface
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    return port
+
+
+def start_simulation(port, cycle_delay, adapter_args=()):
+    device = VerySimpleDevice()
+    adapter = VerySimpleInterface(
+        device, ['-b', '127.0.0.1', '-p', str(port)] + list(adapter_args))
+
+    simulation = Simulation(device=device, adapter=adapter)
+    simulation.cycle_delay = cycle_delay
+
+    thread = threading.Thread(target=simulation.start)
+    thread.daemon = True
+    thread.start()
+
+    wait_for_port(port)
+
+    return simulation, thread
+
+
+def wait_for_port(port, timeout=5.0):
+    end = time.time() + timeout
+
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except socket.error:
+            if time.time() > end:
+                raise
+            time.sleep(0.01)
+
+
+def connect_clients(port, count):
+    clients = []
+
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        clients.append(sock)
+
+    return clients
+
+
+def run_clients(clients, request, terminator, duration, pipeline=1):
+    selector = selectors.DefaultSelector()
+    latencies = []
+    buffers = {}
+    sent_at = {}
+    outstanding = {}
+
+    for sock in clients:
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b''
+        sent_at[sock] = time.time()
+        outstanding[sock] = pipeline
+        sock.send(request * pipeline)
+
+    end = time.time() + duration
+
+    while time.time() < end:
+        for key, _ in selector.select(0.1):
+            sock = key.fileobj
+            buffers[sock] += sock.recv(65536)
+
+            while terminator in buffers[sock]:
+                _, buffers[sock] = buffers[sock].split(terminator, 1)
+
+                now = time.time()
+                latencies.append(now - sent_at[sock])
+                outstanding[sock] -= 1
+
+                if not outstanding[sock]:
+                    sent_at[sock] = now
+                    outstanding[sock] = pipeline
+                    sock.send(request * pipeline)
+
+    selector.close()
+
+    for sock in clients:
+        sock.close()
+
+    return latencies
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def report(latencies, duration):
+    latencies = sorted(latencies)
+
+    print('Requests:      {}'.format(len(latencies)))
+    print('Requests/s:    {:.0f}'.format(len(latencies) / duration))
+
+    if latencies:
+        print('Latency (ms):  median {:.2f}, 90% {:.2f}, 99% {:.2f}, max {:.2f}'.format(
+            *(1000 * percentile(latencies, f) for f in (0.5, 0.9, 0.99, 1.0))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the stream adapter\'s TCP server.')
+    parser.add_argument('-n', '--clients', type=int, default=500,
+                        help='Number of concurrent clients.')
+    parser.add_argument('-d', '--duration', type=float, default=10.0,
+                        help='Duration of the benchmark in seconds.')
+    parser.add_argument('-c', '--cycle-delay', type=float, default=0.1,
+                        help='Cycle delay of the simulation.')
+    parser.add_argument('-q', '--pipeline', type=int, default=1,
+                        help='Number of requests each client sends back-to-back.')
+    arguments = parser.parse_args()
+
+    port = free_port()
+    simulation, thread = start_simulation(port, arguments.cycle_delay)
+
+    clients = connect_clients(port, arguments.clients)
+    latencies = run_clients(
+        clients, b'P\r\n', b'\r\n', arguments.duration, arguments.pipeline)
+
+    simulation.stop()
+    thread.join()
+
+    print('Clients:       {}'.format(arguments.clients))
+    print('Pipeline:      {}'.format(arguments.pipeline))
+    report(latencies, arguments.duration)
+
+
+if __name__ == '__main__':
+    main()
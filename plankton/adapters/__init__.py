@@ -21,6 +21,7 @@
 This module defines a base class for adapters and some supporting infrastructure.
 """
 
+import functools
 import importlib
 import inspect
 from ..core.exceptions import PlanktonException
@@ -46,11 +47,17 @@ class Adapter(object):
     implementations of existing adapters (:class:`~plankton.adapters.epics.EpicsAdapter`,
     :class:`~plankton.adapters.stream.StreamAdapter`),to get some examples.
 
+    Members of the adapter that are listed in ``control_members`` are exposed via the control
+    server of the simulation under the name ``adapter``. This can be used to make protocol
+    specific settings and statistics available at runtime.
+
     :param device: Device that is supposed to be exposed. Available as ``_device``.
     :param arguments: Command line arguments to the adapter, currently ignored.
     """
     protocol = None
 
+    control_members = ()
+
     def __init__(self, device, arguments=None):
         super(Adapter, self).__init__()
         self._device = device
@@ -72,6 +79,14 @@ class Adapter(object):
         """
         pass
 
+    def stop_server(self):
+        """
+        This method is called when the simulation stops. It should be re-implemented if the
+        adapter starts threads or other infrastructure that must not outlive the simulation.
+        The default implementation does nothing.
+        """
+        pass
+
     def handle(self, cycle_delay=0.1):
         """
         This function is called on each cycle of a simulation. It should process requests that are
@@ -157,6 +172,46 @@ def import_adapter(device_name, protocol_name, device_package='devices'):
         '-k and -a flags of the run script.'.format(device_name, protocol_name))
 
 
+def find_owner(name, *objects):
+    """
+    Returns the first of the supplied objects that has a member with the specified name. This
+    is used by adapters to resolve the names of commands or PVs, which may refer to members of
+    the adapter itself or of the device it exposes.
+
+    The lookup is based on :func:`dir`, so properties are not evaluated.
+
+    :param name: Name of the member.
+    :param objects: Objects to search in order.
+    :return: The object that owns the member or None if none of the objects has it.
+    """
+    for obj in objects:
+        if name in dir(obj):
+            return obj
+
+    return None
+
+
+def create_accessors(obj, name):
+    """
+    Creates a pair of functions that get and set the attribute ``name`` of ``obj``. Owner and
+    name are bound once, so each access is a single attribute lookup on the owner:
+
+    .. sourcecode:: Python
+
+        getter, setter = create_accessors(device, 'speed')
+
+        setter(10)  # equivalent to device.speed = 10
+        getter()  # equivalent to device.speed
+
+    Unlike :class:`ForwardProperty`, no type is modified.
+
+    :param obj: Object that owns the attribute.
+    :param name: Name of the attribute.
+    :return: Tuple of getter and setter.
+    """
+    return functools.partial(getattr, obj, name), functools.partial(setattr, obj, name)
+
+
 class ForwardProperty(object):
     """
     This is a small helper class that can be used to act as
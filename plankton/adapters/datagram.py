@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+This module contains an adapter that exposes the commands of a
+:class:`~plankton.adapters.stream.StreamAdapter` via UDP, where each datagram carries one
+request and each reply is sent back as one datagram. This avoids the overhead of managing a
+connection per client, which makes it suitable for clients that poll at high rates.
+"""
+
+from __future__ import print_function
+
+import socket
+import time
+from argparse import ArgumentParser
+from timeit import default_timer
+
+try:
+    import selectors
+except ImportError:
+    import selectors34 as selectors
+
+from six import PY2
+
+from plankton.adapters.stream import StreamAdapter, TerminatorFramer, _WOULD_BLOCK, _release, \
+    _to_bytes
+
+
+class DatagramServer(object):
+    """
+    A UDP server based on the :mod:`selectors`-module. Like
+    :class:`~plankton.adapters.stream.StreamServer` it does not run its own loop,
+    :meth:`process` has to be called regularly.
+
+    Python's socket module does not expose ``recvmmsg``, so when the socket becomes readable,
+    the server drains it by receiving datagrams into a preallocated buffer until the operating
+    system reports that no more data is available. The datagrams are processed in batches of
+    at most ``batch_size`` and the replies of each batch are sent after the batch has been
+    processed. Since UDP does not guarantee delivery, replies that can not be sent immediately
+    are dropped.
+
+    The server counts received requests and sent replies, see :attr:`statistics`.
+
+    :param host: Address to bind to.
+    :param port: Port to listen on.
+    :param target: The :class:`DatagramAdapter` that processes requests.
+    :param batch_size: Maximum number of datagrams that are received before replies are sent.
+    :param buffer_size: Maximum size of a datagram in bytes, larger datagrams are truncated.
+    """
+
+    def __init__(self, host, port, target, batch_size=64, buffer_size=65536):
+        self.target = target
+        self.batch_size = batch_size
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._socket.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._socket, selectors.EVENT_READ)
+
+        self._buffers = [bytearray(buffer_size) for _ in range(batch_size)]
+
+        self._start_time = time.time()
+        self._requests = 0
+        self._replies = 0
+        self._dropped = 0
+        self._errors = 0
+        self._bytes_received = 0
+        self._bytes_sent = 0
+
+    @property
+    def statistics(self):
+        """
+        Dictionary with the number of received requests, sent and dropped replies, requests
+        that could not be processed, transferred bytes and the average number of requests per
+        second since the server was started.
+        """
+        elapsed = time.time() - self._start_time
+
+        return {
+            'requests': self._requests,
+            'replies': self._replies,
+            'dropped': self._dropped,
+            'errors': self._errors,
+            'bytes_received': self._bytes_received,
+            'bytes_sent': self._bytes_sent,
+            'requests_per_second': self._requests / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def receive_batch(self):
+        """
+        Receives up to ``batch_size`` datagrams without blocking.
+
+        :return: List of (request, address)-tuples, requests are memoryviews.
+        """
+        batch = []
+
+        for buffer in self._buffers:
+            try:
+                size, address = self._socket.recvfrom_into(buffer)
+            except socket.error as error:
+                if error.errno not in _WOULD_BLOCK:
+                    raise
+                break
+
+            batch.append((memoryview(buffer)[:size], address))
+
+        return batch
+
+    def send_reply(self, reply, address):
+        try:
+            self._bytes_sent += self._socket.sendto(reply, address)
+            self._replies += 1
+        except socket.error as error:
+            if error.errno not in _WOULD_BLOCK:
+                raise
+            self._dropped += 1
+
+    def process(self, timeout):
+        """
+        Waits at most ``timeout`` seconds for the socket to become readable and then processes
+        the datagrams that are available. Batches are processed until no more datagrams are
+        waiting or ``timeout`` seconds have passed since the method was called, at least one
+        batch is processed. Datagrams that remain in the socket's receive buffer are processed
+        in the next call, so that a constant stream of requests can not stall the simulation.
+
+        :param timeout: Maximum time to wait for requests and process them in seconds.
+        """
+        deadline = default_timer() + timeout
+
+        if not self._selector.select(timeout):
+            return
+
+        while True:
+            batch = self.receive_batch()
+            replies = []
+
+            for request, address in batch:
+                self._requests += 1
+                self._bytes_received += len(request)
+
+                try:
+                    reply = self.target.handle_datagram(request)
+                except Exception:
+                    # A request that can not be processed must not stop the server
+                    self._errors += 1
+                    reply = None
+                finally:
+                    _release(request)
+
+                if reply is not None:
+                    replies.append((reply, address))
+
+            for reply, address in replies:
+                self.send_reply(reply, address)
+
+            if len(batch) < self.batch_size or default_timer() >= deadline:
+                return
+
+    def close(self):
+        """
+        Closes the socket.
+        """
+        self._selector.unregister(self._socket)
+        self._socket.close()
+        self._selector.close()
+
+
+class DatagramAdapter(StreamAdapter):
+    """
+    This adapter exposes the commands of a stream interface via UDP. Commands are defined in
+    exactly the same way as for :class:`~plankton.adapters.stream.StreamAdapter`, so existing
+    stream interfaces can be reused by deriving from both classes:
+
+    .. sourcecode:: Python
+
+        class ExampleMotorDatagramInterface(DatagramAdapter, ExampleMotorStreamInterface):
+            pass
+
+    Each datagram contains exactly one request, which is framed by the adapter's framer
+    (see :meth:`~plankton.adapters.stream.StreamAdapter.get_framer`). For compatibility with
+    clients of the stream protocol, the ``in_terminator`` of a
+    :class:`~plankton.adapters.stream.TerminatorFramer` is removed if the request ends with
+    it, but it is not required. Each reply is framed in the same way and sent back to the
+    client as one datagram. Commands that return None do not send a reply.
+
+    :param device: The exposed device.
+    :param arguments: Command line arguments.
+    """
+    protocol = 'datagram'
+
+    control_members = ('statistics', 'metrics', 'reset_metrics')
+
+    def start_server(self):
+        """
+        Starts the UDP server, binding to the configured host and port.
+        Host and port are configured via the command line arguments.
+
+        .. note:: The server does not process requests unless
+                  :meth:`handle` is called in regular intervals.
+
+        """
+        self._framer = self.get_framer()
+        self._server = DatagramServer(self._options.bind_address, self._options.port, self,
+                                      batch_size=self._options.batch_size)
+
+    def _parseArguments(self, arguments):
+        parser = ArgumentParser(description='Adapter to expose a device via UDP datagrams')
+        parser.add_argument('-b', '--bind-address', default='0.0.0.0',
+                            help='IP Address to bind and listen for requests on')
+        parser.add_argument('-p', '--port', type=int, default=9999,
+                            help='Port to listen for requests on')
+        parser.add_argument('--batch-size', type=int, default=64,
+                            help='Maximum number of requests processed before replies are sent')
+        parser.add_argument('--metrics-file', default=None,
+                            help='File to which per-command metrics are written periodically')
+        parser.add_argument('--metrics-interval', type=float, default=10.0,
+                            help='Time in seconds between writes of the metrics file')
+        return parser.parse_args(arguments)
+
+    def handle_datagram(self, datagram):
+        """
+        Processes the request contained in one datagram and returns the framed reply.
+        A datagram that does not contain a complete frame raises a ValueError.
+
+        :param datagram: Received datagram as memoryview.
+        :return: Framed reply as bytes or None if there is no reply.
+        """
+        if PY2:
+            datagram = datagram.tobytes()
+
+        framer = self._framer
+
+        if isinstance(framer, TerminatorFramer):
+            in_terminator = framer.in_terminator
+
+            if in_terminator and datagram[-len(in_terminator):] == in_terminator:
+                datagram = datagram[:-len(in_terminator)]
+        else:
+            frame = framer.find_frame(datagram, 0)
+
+            if frame is None:
+                raise ValueError('The datagram does not contain a complete request.')
+
+            datagram = datagram[frame[0]:frame[1]]
+
+        reply = self.handle_request(datagram)
+
+        if reply is None:
+            return None
+
+        out_buffer = bytearray()
+        framer.write_frame(_to_bytes(reply), out_buffer)
+
+        return bytes(out_buffer)
+
+    @property
+    def statistics(self):
+        """
+        Throughput statistics of the UDP server, see :attr:`DatagramServer.statistics`.
+        """
+        if self._server is None:
+            return {}
+
+        return self._server.statistics
@@ -20,15 +20,25 @@
 from __future__ import print_function
 
 from argparse import ArgumentParser
+from array import array
+from collections import deque
 from datetime import datetime
+import heapq
 import inspect
+import threading
+import time
 
-from . import Adapter, ForwardProperty
+from . import Adapter, create_accessors, find_owner
 from six import iteritems
 
 from plankton.core.utils import seconds_since, FromOptionalDependency, format_doc_text
 from plankton.core.exceptions import PlanktonException
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # pcaspy might not be available. To make EPICS-based adapters show up
 # in the listed adapters anyway dummy types are created in this case
 # and the failure is postponed to runtime, where a more appropriate
@@ -57,27 +67,231 @@ class PV(object):
     are forwarded to the pcaspy server's `pvdb`, so it's possible to pass on
     limits, types, enum-values and so on.
 
+    To make readbacks more realistic, a noise generator (see :mod:`plankton.core.noise`) can
+    be supplied. Its samples are added to the value each time the PV is updated, the value
+    of the property itself is not modified.
+
+    Values are only published to clients if they have changed. For numeric values, the
+    ``mdel`` argument (monitor deadband, as in EPICS records) specifies how much a value
+    must change to be published, the default of 0 publishes every change. A negative
+    ``mdel`` publishes every update, even if the value did not change.
+
+    If the property is a NumPy array or an ``array.array``, the PV is an array (waveform) PV.
+    Its ``count`` and ``type`` are inferred from the value when the server is started, unless
+    they are specified explicitly. The buffer is passed on to pcaspy without converting it
+    to a list. Comparing large arrays on every update is expensive, so array values are
+    published on every update unless a ``version_property`` is specified. It names a
+    property (of the adapter or the device) that changes whenever the contents of the
+    array change, for example a counter that is incremented by the device. The array is
+    then only published if the version is different from the last published one.
+
     :param target_property: Property of the adapter to expose.
     :param poll_interval: Update interval of the PV.
     :param read_only: Should be True if the PV is read only.
     :param doc: Description of the PV. If not supplied, docstring of mapped property is used.
+    :param noise: Noise generator that is applied to the value on each update.
+    :param version_property: Property that changes when the value of an array PV changes.
     :param kwargs: Arguments forwarded into pcaspy pvdb-dict.
     """
-    def __init__(self, target_property, poll_interval=1.0, read_only=False, doc=None, **kwargs):
+    def __init__(self, target_property, poll_interval=1.0, read_only=False, doc=None,
+                 noise=None, version_property=None, **kwargs):
         self.property = target_property
         self.read_only = read_only
         self.poll_interval = poll_interval
         self.doc = doc
+        self.noise = noise
+        self.version_property = version_property
         self.config = kwargs
 
 
+class PollScheduler(object):
+    """
+    Keeps track of when each PV needs to be updated next. The due times are stored in a heap,
+    so that finding the PVs that are due only touches those PVs and not all of them, which
+    matters for interfaces with many PVs and comparatively long poll intervals.
+
+    Time is advanced explicitly via :meth:`advance`. Initially, each PV is due after its
+    poll interval has elapsed.
+
+    :param intervals: Dictionary with PV names as keys and poll intervals as values.
+    """
+
+    def __init__(self, intervals):
+        self._time = 0.0
+        self._heap = [(interval, name) for name, interval in iteritems(intervals)]
+        heapq.heapify(self._heap)
+
+    def advance(self, dt):
+        """
+        Advances the time by ``dt`` and returns the names of the PVs that are due. These
+        are removed from the schedule, so each of them must be passed to either
+        :meth:`schedule` or :meth:`retry` afterwards.
+
+        :param dt: Elapsed time.
+        :return: List of PV names that are due, in order of their due time.
+        """
+        self._time += dt
+
+        heap = self._heap
+        due = []
+
+        while heap and heap[0][0] <= self._time:
+            due.append(heapq.heappop(heap)[1])
+
+        return due
+
+    def schedule(self, name, interval):
+        """
+        Schedules the next update of a PV ``interval`` after the current time.
+
+        :param name: Name of the PV.
+        :param interval: Time until the next update.
+        """
+        heapq.heappush(self._heap, (self._time + interval, name))
+
+    def retry(self, name):
+        """
+        Schedules a PV that could not be updated to be due again on the next call of
+        :meth:`advance`.
+
+        :param name: Name of the PV.
+        """
+        heapq.heappush(self._heap, (self._time, name))
+
+
+def value_changed(old, new, deadband=0):
+    """
+    Returns True if a PV value has changed enough to be published. For numeric values,
+    the difference must exceed ``deadband``, other values are compared for equality.
+    A change from or to NaN is always published, while two NaNs are considered equal.
+    A negative deadband means that values are always considered to have changed.
+
+    :param old: Previously published value.
+    :param new: New value.
+    :param deadband: Minimum change of numeric values.
+    :return: True if the new value should be published.
+    """
+    if deadband < 0:
+        return True
+
+    try:
+        difference = abs(new - old)
+    except TypeError:
+        return new != old
+
+    # The difference is NaN if a value is NaN or both are the same infinity, NaN never
+    # exceeds the deadband, so those cases are decided here
+    if difference != difference:
+        return (old != old) != (new != new)
+
+    return difference > deadband
+
+
+def is_array(value):
+    """
+    Returns True if the value is a NumPy array or an ``array.array``.
+
+    :param value: Value to check.
+    :return: True if the value is exposed as an array PV.
+    """
+    return isinstance(value, array) or (numpy is not None and isinstance(value, numpy.ndarray))
+
+
+def infer_array_config(value):
+    """
+    Returns the pcaspy configuration (``count`` and ``type``) for an array value. Arrays of
+    single bytes are exposed as ``char``, other integer arrays as ``int`` and all others
+    as ``float``.
+
+    :param value: NumPy array or ``array.array``.
+    :return: Dictionary with the keys ``count`` and ``type``.
+    """
+    if isinstance(value, array):
+        kind, item_size = 'f' if value.typecode in 'fd' else 'i', value.itemsize
+    else:
+        kind, item_size = value.dtype.kind, value.dtype.itemsize
+
+    if kind in 'iub':
+        data_type = 'char' if item_size == 1 else 'int'
+    else:
+        data_type = 'float'
+
+    return {'count': len(value), 'type': data_type}
+
+
+def to_pv_value(value):
+    """
+    Converts an ``array.array`` to a NumPy array that shares its memory, so that it can be
+    passed to pcaspy without copying. If NumPy is not available, it is converted to a list.
+    Other values are returned unchanged.
+
+    :param value: Value of a PV.
+    :return: Value that can be passed to pcaspy.
+    """
+    if not isinstance(value, array):
+        return value
+
+    if numpy is None:
+        return value.tolist()
+
+    return numpy.frombuffer(value, dtype=value.typecode)
+
+
 class PropertyExposingDriver(Driver):
-    def __init__(self, target, pv_dict):
+    def __init__(self, target, pv_dict, accessors=None, queue_writes=False):
         super(PropertyExposingDriver, self).__init__()
 
         self._target = target
         self._pv_dict = pv_dict
-        self._timers = {k: 0.0 for k in self._pv_dict.keys()}
+
+        # If the server runs in another thread, writes are not applied immediately but
+        # stored until apply_pending_writes is called from the simulation thread.
+        self._queue_writes = queue_writes
+        self._pending_writes = deque()
+
+        # Getter and setter per property, see create_accessors. They are looked up by PV name,
+        # so reading a PV does not have to go through the target's attributes.
+        if accessors is None:
+            accessors = {name: create_accessors(target, name)
+                         for pv in pv_dict.values()
+                         for name in (pv.property, pv.version_property) if name}
+
+        self._getters = {k: accessors[v.property][0] for k, v in iteritems(self._pv_dict)}
+        self._setters = {k: accessors[v.property][1] for k, v in iteritems(self._pv_dict)}
+        self._version_getters = {k: accessors[v.version_property][0]
+                                 for k, v in iteritems(self._pv_dict) if v.version_property}
+        self._scheduler = PollScheduler(
+            {k: v.poll_interval for k, v in iteritems(self._pv_dict)})
+
+        # Last values passed to setParam, updatePVs is only called if any of them changed.
+        self._published = {}
+        self._published_versions = {}
+        self._dirty = False
+
+        self.published_updates = 0
+        self.suppressed_updates = 0
+
+    def _publish(self, pv, value):
+        if pv in self._version_getters:
+            self._published_versions[pv] = self._version_getters[pv]()
+
+        self.setParam(pv, to_pv_value(value))
+
+        self._published[pv] = value
+        self._dirty = True
+
+    def _needs_update(self, pv, value):
+        if pv not in self._published:
+            return True
+
+        if pv in self._version_getters:
+            return self._version_getters[pv]() != self._published_versions[pv]
+
+        # The published array may be the same object as the current value
+        if is_array(value):
+            return True
+
+        return value_changed(self._published[pv], value, self._pv_dict[pv].config.get('mdel', 0))
 
     def write(self, pv, value):
         pv_object = self._pv_dict.get(pv)
@@ -85,24 +299,53 @@ class PropertyExposingDriver(Driver):
         if not pv_object or pv_object.read_only:
             return False
 
-        setattr(self._target, pv_object.property, value)
+        if self._queue_writes:
+            self._pending_writes.append((pv, value))
+            return True
+
+        self._setters[pv](value)
 
-        self.setParam(pv, getattr(self._target, pv_object.property))
+        self._publish(pv, self._getters[pv]())
 
         return True
 
+    def apply_pending_writes(self):
+        # deque.popleft is atomic, so writes may be queued concurrently
+        while self._pending_writes:
+            pv, value = self._pending_writes.popleft()
+
+            try:
+                self._setters[pv](value)
+                self._publish(pv, self._getters[pv]())
+            except Exception:
+                # The client has already been told that the write succeeded, so
+                # an error can not be reported anymore. The write is discarded.
+                pass
+
     def process_pv_updates(self, dt):
-        # Updates bound parameters as needed
-        for pv, pv_object in iteritems(self._pv_dict):
-            self._timers[pv] += dt
-            if self._timers[pv] >= pv_object.poll_interval:
-                try:
-                    self.setParam(pv, getattr(self._target, pv_object.property))
-                    self._timers[pv] = 0.0
-                except (AttributeError, TypeError):
-                    pass
+        # Updates bound parameters that are due, failed updates are retried on the next call
+        for pv in self._scheduler.advance(dt):
+            pv_object = self._pv_dict[pv]
+
+            try:
+                value = self._getters[pv]()
+
+                if pv_object.noise is not None:
+                    value = value + pv_object.noise()
 
-        self.updatePVs()
+                if self._needs_update(pv, value):
+                    self._publish(pv, value)
+                    self.published_updates += 1
+                else:
+                    self.suppressed_updates += 1
+
+                self._scheduler.schedule(pv, pv_object.poll_interval)
+            except (AttributeError, TypeError):
+                self._scheduler.retry(pv)
+
+        if self._dirty:
+            self.updatePVs()
+            self._dirty = False
 
 
 class EpicsAdapter(Adapter):
@@ -153,9 +396,11 @@ class EpicsAdapter(Adapter):
 
         $ caput STOP 1
 
-    will achieve the desired behavior, because ``EpicsAdapter`` merges the properties
-    of the device into ``SimpleDeviceEpicsInterface`` itself, so that it is does not
+    will achieve the desired behavior, because ``EpicsAdapter`` looks up the properties
+    in ``SimpleDeviceEpicsInterface`` first and then in the device, so that it is does not
     matter whether the specified property in PV exists in the device or the adapter.
+    The lookup happens once on construction, reading and writing PVs afterwards goes
+    directly to the object that owns the property.
 
     The intention of this design is to keep device classes small and free of
     protocol specific stuff, such as in the case above where stopping a device
@@ -168,17 +413,22 @@ class EpicsAdapter(Adapter):
     protocol = 'epics'
     pvs = None
 
+    control_members = ('statistics',)
+
     def __init__(self, device, arguments=None):
         super(EpicsAdapter, self).__init__(device, arguments)
 
         if arguments is not None:
             self._options = self._parseArguments(arguments)
 
-        self._create_properties(self.pvs.values())
+        self._accessors = self._create_accessors(self.pvs.values())
 
         self._server = None
         self._driver = None
 
+        self._io_thread = None
+        self._stop_io = threading.Event()
+
     @property
     def documentation(self):
         pvs = []
@@ -189,7 +439,7 @@ class EpicsAdapter(Adapter):
             data_type = pv.config.get('type', 'float')
             read_only_tag = ', read only' if pv.read_only else ''
 
-            doc = pv.doc or inspect.getdoc(getattr(type(self), pv.property)) or ''
+            doc = pv.doc or self._get_property_doc(pv.property)
 
             pvs.append('{} ({}{}):\n{}'.format(
                 complete_name, data_type, read_only_tag, format_doc_text(doc)))
@@ -201,32 +451,108 @@ class EpicsAdapter(Adapter):
         """
         Creates a pcaspy-server.
 
+        If the ``--io-thread`` option is set, requests are processed in a background thread,
+        see :meth:`handle`.
+
         .. note::
 
-            The server does not process requests unless :meth:`handle` is called regularly.
+            PV values are not updated unless :meth:`handle` is called regularly.
         """
+        # A thread started by a previous call would process requests of the new server
+        self.stop_io_thread()
+
         self._server = SimpleServer()
         self._server.createPV(prefix=self._options.prefix,
-                              pvdb={k: v.config for k, v in self.pvs.items()})
-        self._driver = PropertyExposingDriver(target=self, pv_dict=self.pvs)
+                              pvdb={k: self._get_pv_config(v) for k, v in self.pvs.items()})
+        self._driver = PropertyExposingDriver(target=self, pv_dict=self.pvs,
+                                              accessors=self._accessors,
+                                              queue_writes=self._options.io_thread)
 
         self._last_update = datetime.now()
 
-    def _create_properties(self, pvs):
+        if self._options.io_thread:
+            self._stop_io.clear()
+            self._io_thread = threading.Thread(target=self._process_requests)
+            self._io_thread.daemon = True
+            self._io_thread.start()
+
+    def stop_io_thread(self, timeout=None):
+        """
+        Stops the background thread that processes requests, if it is running.
+
+        :param timeout: Maximum time in seconds to wait for the thread to finish.
+        """
+        if self._io_thread is not None:
+            self._stop_io.set()
+            self._io_thread.join(timeout)
+            self._io_thread = None
+
+    def stop_server(self):
+        """
+        Stops the background thread that processes requests, see :meth:`stop_io_thread`.
+        """
+        self.stop_io_thread(1.0)
+
+    def _process_requests(self):
+        while not self._stop_io.is_set():
+            self._server.process(0.1)
+
+    def _create_accessors(self, pvs):
+        accessors = {}
+
         for pv in pvs:
-            prop = pv.property
+            for prop in (pv.property, pv.version_property):
+                if prop is None:
+                    continue
 
-            if prop not in dir(self):
-                if prop not in dir(self._device):
+                owner = find_owner(prop, self, self._device)
+
+                if owner is None:
                     raise AttributeError('Can not find property \''
                                          + prop + '\' in device or interface.')
-                setattr(type(self), prop, ForwardProperty('_device', prop, instance=self))
+
+                accessors[prop] = create_accessors(owner, prop)
+
+        return accessors
+
+    def _get_pv_config(self, pv):
+        config = dict(pv.config)
+        value = self._accessors[pv.property][0]()
+
+        if is_array(value):
+            for key, inferred in iteritems(infer_array_config(value)):
+                config.setdefault(key, inferred)
+
+        return config
+
+    def _get_property_doc(self, prop):
+        # The docstring is taken from the type, otherwise the docstring of the value is returned
+        owner = find_owner(prop, self, self._device)
+
+        if owner is None:
+            return ''
+
+        return inspect.getdoc(getattr(type(owner), prop, None)) or ''
 
     def _parseArguments(self, arguments):
         parser = ArgumentParser(description="Adapter to expose a device via EPICS")
         parser.add_argument('-p', '--prefix', help='Prefix to use for all PVs', default='')
+        parser.add_argument('--io-thread', action='store_true',
+                            help='Process requests in a background thread')
         return parser.parse_args(arguments)
 
+    @property
+    def statistics(self):
+        """
+        Dictionary with the number of PV updates that were published to clients and the number
+        of updates that were suppressed because the value did not change.
+        """
+        if self._driver is None:
+            return {}
+
+        return {'published_updates': self._driver.published_updates,
+                'suppressed_updates': self._driver.suppressed_updates}
+
     def handle(self, cycle_delay=0.1):
         """
         Call this method to spend about ``cycle_delay`` seconds processing
@@ -234,8 +560,27 @@ class EpicsAdapter(Adapter):
         high frequency, the actual time spent in the method may be much shorter. This effect
         is not corrected for.
 
+        If requests are processed in a background thread (``--io-thread``), this method
+        applies the writes that were received since the last call, publishes the PV values
+        that are due and then waits for the rest of ``cycle_delay``. Clients are served
+        the last published values in the meantime, so their latency does not depend on
+        how long the device takes to process a cycle. Written values become visible to the
+        device in the next cycle.
+
         :param cycle_delay: Approximate time to be spent processing requests in pcaspy server.
         """
-        self._server.process(cycle_delay)
+        if self._io_thread is None:
+            self._server.process(cycle_delay)
+            self._update_pvs()
+            return
+
+        start = time.time()
+
+        self._driver.apply_pending_writes()
+        self._update_pvs()
+
+        time.sleep(max(0.0, cycle_delay - (time.time() - start)))
+
+    def _update_pvs(self):
         self._driver.process_pv_updates(seconds_since(self._last_update))
         self._last_update = datetime.now()
@@ -19,71 +19,604 @@
 
 from __future__ import print_function
 
-import asynchat
-import asyncore
+import errno
+import json
 import re
 import socket
+import struct
 import inspect
+import time
 from argparse import ArgumentParser
+from array import array
+from timeit import default_timer
 
-from six import b
+try:
+    import selectors
+except ImportError:
+    import selectors34 as selectors
 
-from plankton.adapters import Adapter, ForwardMethod
+from six import b, PY2
+
+from plankton.adapters import Adapter, find_owner
 from plankton.core.utils import format_doc_text
 
+# Error codes of non-blocking socket operations that just mean "try again later".
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+# Characters with special meaning in regular expressions, a literal prefix ends before them.
+_SPECIAL_CHARACTERS = b'.^$*+?{}[]()|\\'
+
+# Type code of the metrics counters. 'L' is only 32 bits wide on Windows, Python 2 does not
+# support 'Q', but doubles count exactly up to 2**53.
+_COUNTER_TYPE = 'd' if PY2 else 'Q'
+
+
+def _to_bytes(value):
+    return value if isinstance(value, bytes) else b(value)
+
+
+def _request_bytes(request):
+    return request.tobytes() if isinstance(request, memoryview) else request
+
+
+def _release(view):
+    # Python 2's memoryview has no release-method, its buffer is freed by the garbage collector
+    if not PY2:
+        view.release()
+
+
+class TerminatorFramer(object):
+    """
+    Splits the incoming data into requests at a terminator and appends a terminator
+    to each reply. This is the default framing of :class:`StreamAdapter`, which constructs
+    it from its ``in_terminator`` and ``out_terminator``.
+
+    :param in_terminator: Bytes that terminate each request.
+    :param out_terminator: Bytes that are appended to each reply.
+    """
+
+    def __init__(self, in_terminator, out_terminator):
+        self.in_terminator = _to_bytes(in_terminator)
+        self.out_terminator = _to_bytes(out_terminator)
+
+    def find_frame(self, buffer, start):
+        """
+        Locates the next complete frame in the buffer, starting at ``start``. All framers
+        implement this method, they must not modify the buffer.
+
+        :param buffer: The input buffer.
+        :param start: Position in the buffer where the next frame starts.
+        :return: None if there is no complete frame, otherwise a tuple with start and end
+                 of the request in the buffer and the position where the next frame starts.
+        """
+        index = buffer.find(self.in_terminator, start)
+
+        if index < 0:
+            return None
+
+        return start, index, index + len(self.in_terminator)
+
+    def write_frame(self, reply, out_buffer):
+        """
+        Appends the framed reply to the output buffer. All framers implement this method.
+
+        :param reply: The reply as bytes.
+        :param out_buffer: The output buffer, a bytearray.
+        """
+        out_buffer += reply
+        out_buffer += self.out_terminator
+
+    def __str__(self):
+        return 'Request terminator: {}\nReply terminator: {}'.format(
+            repr(self.in_terminator.decode('latin-1')),
+            repr(self.out_terminator.decode('latin-1')))
+
+
+class FixedLengthFramer(object):
+    """
+    Frames binary protocols where each request has the same length. Replies are sent as they
+    are, the device interface is responsible for producing replies of the correct length.
+
+    :param length: Length of each request in bytes.
+    """
+
+    def __init__(self, length):
+        if length < 1:
+            raise ValueError('The frame length must be at least 1.')
+
+        self.length = length
+
+    def find_frame(self, buffer, start):
+        end = start + self.length
+
+        if end > len(buffer):
+            return None
+
+        return start, end, end
+
+    def write_frame(self, reply, out_buffer):
+        out_buffer += reply
+
+    def __str__(self):
+        return 'Fixed request length: {} bytes'.format(self.length)
+
+
+class LengthPrefixedFramer(object):
+    """
+    Frames binary protocols where each request and reply is preceded by a header that
+    contains the length of the payload. The header is described by a format string for
+    the :mod:`struct`-module, the default is an unsigned 16 bit integer in network byte order.
+    If ``include_header`` is True, the length in the header includes the header itself.
+
+    A header that specifies a negative payload length (possible with signed formats or if
+    the length includes the header) is invalid, :meth:`find_frame` raises a ValueError and
+    the stream server closes the connection.
+
+    :param header_format: Format of the length header.
+    :param include_header: True if the length includes the header.
+    """
 
-class StreamHandler(asynchat.async_chat):
-    def __init__(self, sock, target):
-        asynchat.async_chat.__init__(self, sock=sock)
-        self.set_terminator(b(target.in_terminator))
+    def __init__(self, header_format='>H', include_header=False):
+        self.header = struct.Struct(header_format)
+        self.include_header = include_header
+
+    def find_frame(self, buffer, start):
+        payload_start = start + self.header.size
+
+        if payload_start > len(buffer):
+            return None
+
+        length = self.header.unpack_from(buffer, start)[0]
+
+        if self.include_header:
+            length -= self.header.size
+
+        if length < 0:
+            raise ValueError('Invalid payload length in header: {}'.format(length))
+
+        end = payload_start + length
+
+        if end > len(buffer):
+            return None
+
+        return payload_start, end, end
+
+    def write_frame(self, reply, out_buffer):
+        length = len(reply) + (self.header.size if self.include_header else 0)
+
+        out_buffer += self.header.pack(length)
+        out_buffer += reply
+
+    def __str__(self):
+        return 'Length prefix: struct format {}{}'.format(
+            repr(self.header.format), ', including the prefix' if self.include_header else '')
+
+
+class StreamHandler(object):
+    """
+    This class handles a single client connection of a :class:`StreamServer`. Incoming data
+    is split into requests by the framer of the target adapter (see :class:`TerminatorFramer`).
+    Requests are passed on as memoryviews of the input buffer, so they are not copied.
+    All complete requests that arrived with one read are processed in a batch and their
+    replies are appended to an output buffer. The server sends the output buffer once per
+    iteration of its loop, so that pipelined requests (for example ``T\\rT\\rT\\r``) are
+    answered with a single write instead of one write per request.
+
+    Writes are non-blocking, whatever can not be sent immediately stays in the output buffer
+    until the socket becomes writable again. While the output buffer is larger than the
+    server's ``write_buffer_limit``, no further requests are processed and no data is read
+    from the client, so that a client which does not read its replies can not make the
+    buffer grow without bound. Similarly, if the input buffer grows beyond the server's
+    ``read_buffer_limit`` without containing a complete request, the connection is closed.
+    The connection is also closed if the framer reports invalid data by raising a ValueError.
+
+    :param sock: Connected, non-blocking client socket.
+    :param target: The :class:`StreamAdapter` that processes requests.
+    :param server: The :class:`StreamServer` this connection belongs to.
+    """
+    recv_size = 4096
+
+    def __init__(self, sock, target, server):
+        self.socket = sock
         self.target = target
-        self.buffer = []
+        self.connected = True
 
-    def collect_incoming_data(self, data):
-        self.buffer.append(data)
+        self._server = server
+        self._framer = target.get_framer()
 
-    def found_terminator(self):
-        request = b''.join(self.buffer)
-        reply = None
-        self.buffer = []
+        self.buffer = bytearray()
+        self._out_buffer = bytearray()
 
         try:
-            match = None
-            for cmd in self.target.commands:
-                match = cmd.pattern.match(request)
-                if match:
-                    groups = match.groups()
-                    func = getattr(self.target, cmd.method)
-
-                    args = cmd.map_arguments(groups)
-                    reply = cmd.return_mapping(func(*args))
+            self.address = '{}:{}'.format(*sock.getpeername()[:2])
+        except socket.error:
+            self.address = None
+
+        self.connected_since = self.last_activity = time.time()
+        self.requests = 0
+
+    @property
+    def buffered_bytes(self):
+        """
+        Number of bytes in the input and output buffers of this connection.
+        """
+        return len(self.buffer) + len(self._out_buffer)
+
+    @property
+    def info(self):
+        """
+        Dictionary with information about the connection, its age, idle time and buffers.
+        """
+        now = time.time()
+
+        return {
+            'address': self.address,
+            'connected': now - self.connected_since,
+            'idle': now - self.last_activity,
+            'requests': self.requests,
+            'input_buffer': len(self.buffer),
+            'output_buffer': len(self._out_buffer),
+        }
+
+    @property
+    def events(self):
+        """
+        Selector events this handler is currently interested in.
+        """
+        events = 0
+
+        if len(self._out_buffer) < self._server.write_buffer_limit:
+            events |= selectors.EVENT_READ
+
+        if self._out_buffer:
+            events |= selectors.EVENT_WRITE
+
+        return events
+
+    def handle_read(self):
+        try:
+            data = self.socket.recv(self.recv_size)
+        except socket.error as error:
+            if error.errno not in _WOULD_BLOCK:
+                self.close()
+            return
+
+        if not data:
+            self.close()
+            return
+
+        self.last_activity = time.time()
+
+        self.collect_incoming_data(data)
+        self.process_requests()
+
+        # Requests are only held back while the output buffer is full, otherwise the
+        # input buffer contains at most one incomplete request.
+        if len(self.buffer) > self._server.read_buffer_limit \
+                and len(self._out_buffer) < self._server.write_buffer_limit:
+            self._server.buffer_overflows += 1
+            self.close()
+
+    def process_requests(self):
+        """
+        Processes all complete requests in the input buffer, unless the output buffer
+        exceeds the server's ``write_buffer_limit``. Requests that are not processed
+        remain in the input buffer.
+        """
+        framer = self._framer
+        limit = self._server.write_buffer_limit
+        start = 0
+
+        view = memoryview(self.buffer)
+
+        try:
+            while self.connected and len(self._out_buffer) < limit:
+                try:
+                    frame = framer.find_frame(self.buffer, start)
+                except ValueError:
+                    # The stream can not be split into requests anymore
+                    self._server.framing_errors += 1
+                    self.close()
                     break
 
-            if match is None:
-                raise RuntimeError('None of the device\'s commands matched.')
+                if frame is None:
+                    break
 
-        except Exception as error:
-            reply = self.target.handle_error(request, error)
+                begin, end, start = frame
+                request = view[begin:end]
+                self.requests += 1
+
+                try:
+                    self.handle_frame(request)
+                finally:
+                    _release(request)
+        finally:
+            _release(view)
+
+            # In Python 2, the input buffer can not be resized while views of it exist
+            view = request = None
+
+        if start:
+            del self.buffer[:start]
+
+    def handle_write(self):
+        """
+        Sends as much of the output buffer as possible. If that makes room in the output
+        buffer, requests that were held back are processed.
+        """
+        if self._out_buffer:
+            try:
+                sent = self.socket.send(self._out_buffer)
+            except socket.error as error:
+                if error.errno not in _WOULD_BLOCK:
+                    self.close()
+                return
+
+            del self._out_buffer[:sent]
+
+            if self.buffer:
+                self.process_requests()
+
+        self._server.update_events(self)
+
+    def collect_incoming_data(self, data):
+        self.buffer += data
+
+    def handle_frame(self, request):
+        reply = self.target.handle_request(request)
 
         if reply is not None:
-            self.push(b(reply + self.target.out_terminator))
+            self._framer.write_frame(_to_bytes(reply), self._out_buffer)
+            self._server.schedule_write(self)
+
+    def push(self, data):
+        """
+        Appends data to the output buffer, it is sent at the end of the current iteration
+        of the server loop.
+
+        :param data: Bytes to send to the client.
+        """
+        self._out_buffer += data
+        self._server.schedule_write(self)
 
+    def close(self):
+        if self.connected:
+            self.connected = False
+            self._server.remove_handler(self)
 
-class StreamServer(asyncore.dispatcher):
-    def __init__(self, host, port, target):
-        asyncore.dispatcher.__init__(self)
+
+class StreamServer(object):
+    """
+    A TCP server based on the :mod:`selectors`-module. It listens on the given host and port
+    and creates a :class:`StreamHandler` for each client. The server does not run its own
+    loop, instead :meth:`process` has to be called regularly.
+
+    To protect the simulation from misbehaving clients, the server enforces a number of
+    limits. Once ``max_connections`` clients are connected, the server stops accepting
+    connections. Further clients then wait in the listen backlog of the operating system and
+    are accepted in the order they connected as soon as other clients disconnect. Connections
+    that send more than ``read_buffer_limit`` bytes without completing a request are closed,
+    as are connections that have not sent any data for ``idle_timeout`` seconds. If processing
+    the data of a connection raises an exception, only that connection is closed.
+
+    :param host: Address to bind to.
+    :param port: Port to listen on.
+    :param target: The :class:`StreamAdapter` that processes requests.
+    :param backlog: Maximum number of pending connections passed to ``listen``.
+    :param write_buffer_limit: Number of unsent bytes per connection above which no more
+                               requests are read from that connection.
+    :param read_buffer_limit: Maximum size of an incomplete request in bytes.
+    :param max_connections: Maximum number of connected clients, None for no limit.
+    :param idle_timeout: Time in seconds after which idle connections are closed, None to
+                         keep idle connections open.
+    """
+
+    def __init__(self, host, port, target, backlog=socket.SOMAXCONN, write_buffer_limit=65536,
+                 read_buffer_limit=65536, max_connections=None, idle_timeout=None):
         self.target = target
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.set_reuse_addr()
-        self.bind((host, port))
-        self.listen(5)
+        self.write_buffer_limit = write_buffer_limit
+        self.read_buffer_limit = read_buffer_limit
+        self.idle_timeout = idle_timeout
+
+        self.accepted_connections = 0
+        self.buffer_overflows = 0
+        self.framing_errors = 0
+        self.handler_errors = 0
+        self.idle_disconnects = 0
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._socket.listen(backlog)
+        self._socket.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._socket, selectors.EVENT_READ)
+        self._accepting = True
+
+        self._handlers = set()
+        self._pending_writes = set()
+
+        self._max_connections = None
+        self.max_connections = max_connections
+
+    @property
+    def handlers(self):
+        """
+        Handlers of the currently connected clients.
+        """
+        return list(self._handlers)
+
+    @property
+    def max_connections(self):
+        """
+        Maximum number of connected clients, None if the number is not limited. If the limit
+        is lowered below the number of connected clients, these remain connected.
+        """
+        return self._max_connections
+
+    @max_connections.setter
+    def max_connections(self, new_max_connections):
+        if new_max_connections is not None and new_max_connections < 1:
+            raise ValueError('At least one connection must be allowed.')
+
+        self._max_connections = new_max_connections
+        self._update_accepting()
+
+    @property
+    def statistics(self):
+        """
+        Dictionary with the number of connected clients, the total number of bytes buffered
+        for all connections and counters for accepted and closed connections.
+        """
+        return {
+            'connections': len(self._handlers),
+            'accepting': self._accepting,
+            'buffered_bytes': sum(handler.buffered_bytes for handler in self._handlers),
+            'accepted_connections': self.accepted_connections,
+            'buffer_overflows': self.buffer_overflows,
+            'framing_errors': self.framing_errors,
+            'handler_errors': self.handler_errors,
+            'idle_disconnects': self.idle_disconnects,
+        }
+
+    def _is_full(self):
+        return self._max_connections is not None and len(self._handlers) >= self._max_connections
+
+    def _update_accepting(self):
+        # While the server is full, the listening socket is not watched, so pending
+        # connections stay in the backlog instead of making every select return.
+        accepting = not self._is_full()
+
+        if accepting != self._accepting:
+            if accepting:
+                self._selector.register(self._socket, selectors.EVENT_READ)
+            else:
+                self._selector.unregister(self._socket)
+
+            self._accepting = accepting
 
     def handle_accept(self):
-        pair = self.accept()
-        if pair is not None:
-            sock, addr = pair
-            print("Client connect from %s" % repr(addr))
-            StreamHandler(sock, self.target)
+        while not self._is_full():
+            try:
+                sock, addr = self._socket.accept()
+            except socket.error as error:
+                if error.errno not in _WOULD_BLOCK + (errno.ECONNABORTED,):
+                    raise
+                break
+
+            sock.setblocking(False)
+
+            handler = StreamHandler(sock, self.target, self)
+            self._handlers.add(handler)
+            self._selector.register(sock, handler.events, handler)
+
+            self.accepted_connections += 1
+
+        self._update_accepting()
+
+    def update_events(self, handler):
+        """
+        Updates the events the selector is watching for the socket of the supplied handler.
+
+        :param handler: Handler whose interest might have changed.
+        """
+        if handler.connected:
+            events = handler.events
+
+            if self._selector.get_key(handler.socket).events != events:
+                self._selector.modify(handler.socket, events, handler)
+
+    def schedule_write(self, handler):
+        """
+        Marks the handler's output buffer to be sent at the end of the current iteration.
+
+        :param handler: Handler with pending output.
+        """
+        self._pending_writes.add(handler)
+
+    def remove_handler(self, handler):
+        """
+        Unregisters the handler from the server and closes its socket.
+
+        :param handler: Handler to remove.
+        """
+        self._handlers.discard(handler)
+        self._pending_writes.discard(handler)
+        self._selector.unregister(handler.socket)
+        handler.socket.close()
+
+        self._update_accepting()
+
+    def close_idle_connections(self):
+        """
+        Closes all connections that have not received any data for ``idle_timeout`` seconds.
+        """
+        if self.idle_timeout is None:
+            return
+
+        deadline = time.time() - self.idle_timeout
+
+        for handler in [h for h in self._handlers if h.last_activity < deadline]:
+            handler.close()
+            self.idle_disconnects += 1
+
+    def process(self, timeout):
+        """
+        Waits at most ``timeout`` seconds for socket events and processes all events that
+        occurred. The method returns as soon as events have been processed. At the end,
+        each connection with pending output is written to once and idle connections are
+        closed.
+
+        :param timeout: Maximum time to wait for events in seconds.
+        """
+        for key, mask in self._selector.select(timeout):
+            handler = key.data
+
+            if handler is None:
+                self.handle_accept()
+                continue
+
+            if mask & selectors.EVENT_READ:
+                self._call_handler(handler, handler.handle_read)
+
+            if mask & selectors.EVENT_WRITE:
+                self.schedule_write(handler)
+
+        self.flush()
+        self.close_idle_connections()
+
+    def _call_handler(self, handler, callback):
+        # An error in one connection must not stop the server, the connection is closed
+        # instead and the remaining connections are still served.
+        try:
+            callback()
+        except Exception:
+            self.handler_errors += 1
+            handler.close()
+
+    def flush(self):
+        """
+        Writes the output buffers of all connections that have pending output.
+        """
+        pending, self._pending_writes = self._pending_writes, set()
+
+        for handler in pending:
+            if handler.connected:
+                self._call_handler(handler, handler.handle_write)
+
+    def close(self):
+        """
+        Closes all client connections and the listening socket.
+        """
+        for handler in self.handlers:
+            handler.close()
+
+        if self._accepting:
+            self._selector.unregister(self._socket)
+
+        self._socket.close()
+        self._selector.close()
 
 
 class Cmd(object):
@@ -97,49 +630,380 @@ class Cmd(object):
     number of arguments of the method. The first parameter will be transformed using the
     first function, the second using the second function and so on. This can be useful
     to automatically transform strings provided by the adapter into a proper data type
-    such as ``int`` or ``float`` before they are passed to the method.
+    such as ``int`` or ``float`` before they are passed to the method. Arguments are passed
+    to the mappings as bytes, which ``int`` and ``float`` accept directly.
+
+    For binary protocols, ``argument_struct`` can be a format string of the :mod:`struct`-module.
+    The regular expression must then have exactly one group, which is unpacked into the method
+    arguments. If argument_mappings are supplied as well, they are applied to the unpacked values.
 
     The return_mapping argument is similar, it should map the return value of the method
-    to a string. The default map function only does that when the supplied value
-    is not None.
+    to a string or bytes. The default map function converts values other than bytes to
+    a string if they are not None.
+
+    For numeric return values, a noise generator (see :mod:`plankton.core.noise`) can be
+    supplied. A sample is added to the return value before the return mapping is applied.
+
+    All these conversions are combined into two callables when the command is constructed,
+    :attr:`convert_arguments` and :attr:`convert_return_value`, so that no decisions need to
+    be made when a request is processed.
+
+    Commands that only read the device state can be marked as ``pure``. Since the device
+    state does not change until the next simulation cycle, the reply to a pure command is
+    computed once per cycle for each set of arguments and then served from a cache, which
+    is useful when many clients poll the same values. The cache is cleared when the cycle
+    advances and whenever a command that is not pure is executed. Note that noise is then
+    also only sampled once per cycle. A pure command may write to the device if the write
+    is idempotent, i.e. it sets a value that nothing else changes back. A cached reply is
+    only served after the command has been executed, so skipping the repeated write does
+    not change the device state.
 
     Finally, documentation can be provided by passing the doc-argument. If it is omitted,
     the docstring of the bound method is used and if that is not present, left empty.
 
     :param target_method: Method to be called when regex matches.
-    :param regex: Regex to match for method call.
+    :param regex: Regex to match for method call, as str or bytes.
     :param regex_flags: Flags to pass ot re.compile, default is 0.
     :param argument_mappings: Iterable with mapping functions from string to some type.
     :param return_mapping: Mapping function for return value of method.
     :param doc: Description of the command. If not supplied, the docstring is used.
+    :param noise: Noise generator that is applied to the return value of the method.
+    :param pure: True if the command does not modify the device (or only with idempotent
+                 writes), so that replies can be cached.
+    :param argument_struct: Format string to unpack the only group of the regex into arguments.
     """
 
     def __init__(self, target_method, regex, regex_flags=0, argument_mappings=None,
-                 return_mapping=lambda x: None if x is None else str(x), doc=None):
+                 return_mapping=lambda x: x if x is None or isinstance(x, bytes) else str(x),
+                 doc=None, noise=None, pure=False, argument_struct=None):
         self.method = target_method
-        self.pattern = re.compile(b(regex), regex_flags)
+        self.pattern = re.compile(_to_bytes(regex), regex_flags)
+
+        self.argument_struct = struct.Struct(argument_struct) if argument_struct else None
+
+        if self.argument_struct is not None:
+            if self.pattern.groups != 1:
+                raise RuntimeError(
+                    'Expected exactly one group for argument_struct, got {}'.format(
+                        self.pattern.groups))
+
+            argument_count = len(self.argument_struct.unpack(b'\0' * self.argument_struct.size))
+        else:
+            argument_count = self.pattern.groups
 
-        if argument_mappings is not None and (self.pattern.groups != len(argument_mappings)):
+        if argument_mappings is not None and (argument_count != len(argument_mappings)):
             raise RuntimeError(
                 'Expected {} argument mapping(s), got {}'.format(
-                    self.pattern.groups, len(argument_mappings)))
+                    argument_count, len(argument_mappings)))
 
         self.argument_mappings = argument_mappings
         self.return_mapping = return_mapping
         self.doc = doc
+        self.noise = noise
+        self.pure = pure
+
+        self.convert_arguments = self._compile_argument_conversion()
+        self.convert_return_value = self._compile_return_value_conversion()
+
+    def _compile_argument_conversion(self):
+        mappings = tuple(self.argument_mappings or ())
+
+        # Specialized functions for the common cases avoid iterating over the mappings.
+        if len(mappings) == 1:
+            first, = mappings
+
+            def convert(values):
+                return first(values[0]),
+        elif len(mappings) == 2:
+            first, second = mappings
+
+            def convert(values):
+                return first(values[0]), second(values[1])
+        elif mappings:
+            def convert(values):
+                return tuple(f(value) for f, value in zip(mappings, values))
+        else:
+            convert = None
+
+        if self.argument_struct is None:
+            return convert or (lambda groups: groups)
+
+        unpack = self.argument_struct.unpack
+
+        if convert is None:
+            return lambda groups: unpack(groups[0])
+
+        return lambda groups: convert(unpack(groups[0]))
+
+    def _compile_return_value_conversion(self):
+        mapping = self.return_mapping
+        noise = self.noise
+
+        if noise is None:
+            return mapping
+
+        return lambda value: mapping(value if value is None else value + noise())
 
     def map_arguments(self, arguments):
         """
         Returns the mapped function arguments. If no mapping functions are defined, the arguments
-        are returned as they were supplied.
+        are returned as they were supplied. This is equivalent to calling
+        :attr:`convert_arguments`.
 
         :param arguments: List of arguments for bound function as strings.
         :return: Mapped arguments.
         """
-        if not self.argument_mappings:
-            return arguments
+        return self.convert_arguments(arguments)
+
+    def apply_noise(self, value):
+        """
+        Adds a sample of the noise generator to the supplied value. If no generator is
+        defined or the value is None, it is returned unchanged.
+
+        :param value: Return value of the bound function.
+        :return: Value with noise added.
+        """
+        if self.noise is None or value is None:
+            return value
+
+        return value + self.noise()
+
+
+def _has_top_level_alternation(regex):
+    depth = 0
+    position = 0
+
+    while position < len(regex):
+        char = regex[position:position + 1]
+
+        if char == b'\\':
+            position += 1
+        elif char == b'[':
+            # Skip character classes, where ] is literal if it comes first.
+            position = regex.find(b']', position + 2)
+            if position < 0:
+                return True
+        elif char == b'(':
+            depth += 1
+        elif char == b')':
+            depth -= 1
+        elif char == b'|' and depth == 0:
+            return True
+
+        position += 1
+
+    return False
+
+
+def literal_prefix(pattern):
+    """
+    Returns the literal prefix of a compiled bytes-pattern, that is the bytes that any string
+    matched by the pattern must start with. If that can not be determined easily, for example
+    because the pattern contains alternations or is case insensitive, an empty bytes-object is
+    returned. The result may be shorter than the actual literal prefix, but never longer.
+
+    :param pattern: Compiled regular expression.
+    :return: Literal prefix of the pattern.
+    """
+    regex = pattern.pattern
+
+    if pattern.flags & (re.IGNORECASE | re.VERBOSE) or _has_top_level_alternation(regex):
+        return b''
+
+    position = 1 if regex.startswith(b'^') else 0
+    prefix = bytearray()
+
+    while position < len(regex):
+        char = regex[position:position + 1]
+
+        if char == b'\\':
+            char = regex[position + 1:position + 2]
+
+            if not char or char.isalnum():
+                break
+
+            position += 2
+        elif char in _SPECIAL_CHARACTERS:
+            break
+        else:
+            position += 1
+
+        # A quantifier that allows zero repetitions makes the character optional.
+        if regex[position:position + 1] in (b'*', b'?', b'{'):
+            break
+
+        prefix += char
+
+        if regex[position:position + 1] == b'+':
+            break
+
+    return bytes(prefix)
+
+
+class CommandIndex(object):
+    """
+    This class is used by :class:`StreamAdapter` to find the command that matches a request
+    without trying the regular expressions of all commands in sequence.
+
+    The commands are grouped by the literal prefix of their regular expression (see
+    :func:`literal_prefix`). For each distinct prefix length there is a dictionary that maps
+    prefixes to commands, so finding the candidates for a request takes one dictionary lookup
+    per prefix length. Only the candidates' regular expressions are then evaluated. Commands
+    that have no literal prefix are candidates for every request.
+
+    If several commands match a request, the one that comes first in ``commands`` is chosen.
+    Because sets do not have a defined order, commands supplied as a set are sorted by
+    their regular expression.
+
+    :param commands: Iterable of :class:`Cmd`-objects.
+    """
+
+    def __init__(self, commands):
+        if isinstance(commands, (set, frozenset)):
+            commands = sorted(commands, key=lambda cmd: cmd.pattern.pattern)
+
+        self.commands = list(commands)
+
+        self._unindexed = []
+        tables = {}
+
+        for position, cmd in enumerate(self.commands):
+            prefix = literal_prefix(cmd.pattern)
+
+            if prefix:
+                tables.setdefault(len(prefix), {}).setdefault(prefix, []).append((position, cmd))
+            else:
+                self._unindexed.append((position, cmd))
+
+        self._tables = sorted(tables.items())
+
+    def candidates(self, request):
+        """
+        Returns the commands that could match the request, in order of precedence.
+
+        :param request: The request.
+        :return: List of (position, command)-tuples.
+        """
+        candidates = self._unindexed
+
+        for length, table in self._tables:
+            found = table.get(_request_bytes(request[:length]))
+
+            if found is not None:
+                candidates = sorted(candidates + found) if candidates else found
+
+        return candidates
+
+    def match(self, request):
+        """
+        Returns the first command that matches the request along with the match object.
+        If no command matches, (None, None) is returned.
+
+        :param request: The request.
+        :return: Tuple of command and match object.
+        """
+        for _, cmd in self.candidates(request):
+            match = cmd.pattern.match(request)
+
+            if match:
+                return cmd, match
+
+        return None, None
+
+
+class CommandMetrics(object):
+    """
+    Collects metrics per command of a :class:`StreamAdapter`: the number of calls and errors,
+    the number of bytes in requests and replies and a histogram of the time it took to process
+    the requests. Requests that do not match any command are counted separately.
+
+    All values are stored in arrays that are allocated once, so that recording a request
+    does not allocate memory. The latency histogram has logarithmic buckets, bucket ``i``
+    counts requests that took less than ``2**i`` microseconds, the last bucket counts all
+    requests that took longer than that.
+
+    :param commands: List of :class:`Cmd`-objects.
+    """
+    latency_buckets = 24
+
+    def __init__(self, commands):
+        self.commands = list(commands)
+
+        self._positions = dict((cmd, i) for i, cmd in enumerate(self.commands))
+        self._unmatched = len(self.commands)
+
+        self.reset()
+
+    def reset(self):
+        """
+        Sets all counters to zero.
+        """
+        size = len(self.commands) + 1
+
+        self.calls = array(_COUNTER_TYPE, [0]) * size
+        self.errors = array(_COUNTER_TYPE, [0]) * size
+        self.bytes_in = array(_COUNTER_TYPE, [0]) * size
+        self.bytes_out = array(_COUNTER_TYPE, [0]) * size
+        self.latency = array(_COUNTER_TYPE, [0]) * (size * self.latency_buckets)
+
+    def record(self, cmd, bytes_in, bytes_out, duration, failed=False):
+        """
+        Records one processed request.
+
+        :param cmd: The command that matched the request, None if no command matched.
+        :param bytes_in: Size of the request.
+        :param bytes_out: Size of the reply.
+        :param duration: Time it took to process the request in seconds.
+        :param failed: True if an error occurred while processing the request.
+        """
+        position = self._positions.get(cmd, self._unmatched)
 
-        return [f(a) for f, a in zip(self.argument_mappings, arguments)]
+        self.calls[position] += 1
+        self.bytes_in[position] += bytes_in
+        self.bytes_out[position] += bytes_out
+
+        if failed:
+            self.errors[position] += 1
+
+        bucket = min(int(duration * 1e6).bit_length(), self.latency_buckets - 1)
+        self.latency[position * self.latency_buckets + bucket] += 1
+
+    def as_list(self):
+        """
+        Returns the metrics as a list with one dictionary per command, the last entry contains
+        the metrics of requests that did not match any command. The result can be serialized
+        to JSON.
+
+        :return: List of dictionaries.
+        """
+        names = [(cmd.method, cmd.pattern.pattern.decode('latin-1')) for cmd in self.commands]
+        names.append((None, None))
+
+        buckets = self.latency_buckets
+
+        return [{
+            'method': method,
+            'pattern': pattern,
+            'calls': int(self.calls[i]),
+            'errors': int(self.errors[i]),
+            'bytes_in': int(self.bytes_in[i]),
+            'bytes_out': int(self.bytes_out[i]),
+            'latency': [int(count) for count in self.latency[i * buckets:(i + 1) * buckets]],
+        } for i, (method, pattern) in enumerate(names)]
+
+    def dump(self, filename):
+        """
+        Writes the metrics to the supplied file as JSON, along with the current time and
+        the upper bounds of the latency buckets in seconds.
+
+        :param filename: Name of the file, it is overwritten.
+        """
+        with open(filename, 'w') as metrics_file:
+            json.dump({
+                'time': time.time(),
+                'latency_bounds': [2 ** i * 1e-6 for i in range(self.latency_buckets - 1)],
+                'commands': self.as_list(),
+            }, metrics_file)
 
 
 class StreamAdapter(Adapter):
@@ -182,6 +1046,29 @@ class StreamAdapter(Adapter):
     In addition, the :meth:`handle_error`-method can be overridden. It is called when an exception
     is raised while handling commands.
 
+    The limits of the TCP server (see :class:`StreamServer`) are configured via command line
+    arguments. They can be changed at runtime via the control server, which also provides
+    information about the connected clients and how much data is buffered for each of them.
+    Metrics for each command (see :class:`CommandMetrics`) are available in the same way and
+    can optionally be written to a file periodically.
+
+    Devices with binary protocols that do not use terminators can set the ``framer``-member
+    to a different framer, for example :class:`FixedLengthFramer` or
+    :class:`LengthPrefixedFramer`. In that case the terminators are ignored. Binary commands
+    can return bytes, which are sent without further conversion:
+
+    .. sourcecode:: Python
+
+        class BinaryDeviceStreamInterface(StreamAdapter):
+            framer = LengthPrefixedFramer('>H')
+
+            commands = [
+                Cmd('get_status', '^\\x01$'),
+            ]
+
+            def get_status(self):
+                return struct.pack('>Hd', self._device.state, self._device.speed)
+
     :param device: The exposed device.
     :param arguments: Command line arguments.
     """
@@ -190,8 +1077,13 @@ class StreamAdapter(Adapter):
     in_terminator = '\r'
     out_terminator = '\r'
 
+    framer = None
+
     commands = None
 
+    control_members = ('max_connections', 'max_buffer', 'idle_timeout',
+                       'connections', 'statistics', 'metrics', 'reset_metrics')
+
     def __init__(self, device, arguments=None):
         super(StreamAdapter, self).__init__(device, arguments)
 
@@ -200,25 +1092,44 @@ class StreamAdapter(Adapter):
 
         self._server = None
 
-        self._create_properties(self.commands)
+        self._methods = self._bind_methods(self.commands)
+        self._command_index = CommandIndex(self.commands)
+
+        # Replies of pure commands in the current cycle, keyed by command and arguments.
+        self._reply_cache = {}
+
+        self._metrics = CommandMetrics(self._command_index.commands)
+        self._next_metrics_dump = 0.0
 
     @property
     def documentation(self):
 
         commands = ['{}:\n{}'.format(
             cmd.pattern.pattern,
-            format_doc_text(cmd.doc or inspect.getdoc(getattr(self, cmd.method)) or ''))
-                    for cmd in self.commands]
+            format_doc_text(cmd.doc or inspect.getdoc(self._methods[cmd]) or ''))
+                    for cmd in self._command_index.commands]
 
         options = format_doc_text(
-            'Listening on: {}\nPort: {}\nRequest terminator: {}\nReply terminator: {}'.format(
-                self._options.bind_address, self._options.port,
-                repr(self.in_terminator), repr(self.out_terminator)))
+            'Listening on: {}\nPort: {}\n{}'.format(
+                self._options.bind_address, self._options.port, self.get_framer()))
 
         return '\n\n'.join(
             [inspect.getdoc(self) or '',
              'Parameters\n==========', options, 'Commands\n========'] + commands)
 
+    def get_framer(self):
+        """
+        Returns the framer that splits requests and frames replies. This is the ``framer``-member
+        if it is set, otherwise a :class:`TerminatorFramer` is constructed from
+        ``in_terminator`` and ``out_terminator``.
+
+        :return: The framer of this adapter.
+        """
+        if self.framer is not None:
+            return self.framer
+
+        return TerminatorFramer(self.in_terminator, self.out_terminator)
+
     def start_server(self):
         """
         Starts the TCP stream server, binding to the configured host and port.
@@ -228,7 +1139,20 @@ class StreamAdapter(Adapter):
                   :meth:`handle` is called in regular intervals.
 
         """
-        self._server = StreamServer(self._options.bind_address, self._options.port, self)
+        self._server = StreamServer(self._options.bind_address, self._options.port, self,
+                                    backlog=self._options.backlog,
+                                    read_buffer_limit=self._options.max_buffer,
+                                    max_connections=self._options.max_connections,
+                                    idle_timeout=self._options.idle_timeout)
+
+    def stop_server(self):
+        """
+        Closes all client connections and the listening socket, so that the server can be
+        started again on the same port.
+        """
+        if self._server is not None:
+            self._server.close()
+            self._server = None
 
     def _parseArguments(self, arguments):
         parser = ArgumentParser(description='Adapter to expose a device via TCP Stream')
@@ -236,18 +1160,108 @@ class StreamAdapter(Adapter):
                             help='IP Address to bind and listen for connections on')
         parser.add_argument('-p', '--port', type=int, default=9999,
                             help='Port to listen for connections on')
+        parser.add_argument('-l', '--backlog', type=int, default=socket.SOMAXCONN,
+                            help='Maximum number of pending connections')
+        parser.add_argument('--max-connections', type=int, default=None,
+                            help='Maximum number of connected clients')
+        parser.add_argument('--max-buffer', type=int, default=65536,
+                            help='Maximum size of an incomplete request in bytes')
+        parser.add_argument('--idle-timeout', type=float, default=None,
+                            help='Close connections that have been idle for this many seconds')
+        parser.add_argument('--metrics-file', default=None,
+                            help='File to which per-command metrics are written periodically')
+        parser.add_argument('--metrics-interval', type=float, default=10.0,
+                            help='Time in seconds between writes of the metrics file')
         return parser.parse_args(arguments)
 
-    def _create_properties(self, cmds):
+    @property
+    def max_connections(self):
+        """
+        Maximum number of connected clients, None if the number is not limited.
+        """
+        return self._options.max_connections
+
+    @max_connections.setter
+    def max_connections(self, new_max_connections):
+        if self._server is not None:
+            self._server.max_connections = new_max_connections
+
+        self._options.max_connections = new_max_connections
+
+    @property
+    def max_buffer(self):
+        """
+        Maximum size of an incomplete request in bytes. Clients that exceed it are disconnected.
+        """
+        return self._options.max_buffer
+
+    @max_buffer.setter
+    def max_buffer(self, new_max_buffer):
+        if self._server is not None:
+            self._server.read_buffer_limit = new_max_buffer
+
+        self._options.max_buffer = new_max_buffer
+
+    @property
+    def idle_timeout(self):
+        """
+        Time in seconds after which idle clients are disconnected, None if they are not.
+        """
+        return self._options.idle_timeout
+
+    @idle_timeout.setter
+    def idle_timeout(self, new_idle_timeout):
+        if self._server is not None:
+            self._server.idle_timeout = new_idle_timeout
+
+        self._options.idle_timeout = new_idle_timeout
+
+    @property
+    def connections(self):
+        """
+        List with information about each connected client, see :attr:`StreamHandler.info`.
+        """
+        if self._server is None:
+            return []
+
+        return [handler.info for handler in self._server.handlers]
+
+    @property
+    def statistics(self):
+        """
+        Connection statistics of the TCP server, see :attr:`StreamServer.statistics`.
+        """
+        if self._server is None:
+            return {}
+
+        return self._server.statistics
+
+    @property
+    def metrics(self):
+        """
+        Per-command metrics of all processed requests, see :meth:`CommandMetrics.as_list`.
+        """
+        return self._metrics.as_list()
+
+    def reset_metrics(self):
+        """
+        Sets all per-command metrics to zero.
+        """
+        self._metrics.reset()
+
+    def _bind_methods(self, cmds):
+        # Resolves the method of each command once, either in the adapter or in the device.
+        methods = {}
         patterns = set()
         for cmd in cmds:
             method = cmd.method
+            owner = find_owner(method, self, self._device)
 
-            if method not in dir(self):
-                if method not in dir(self._device):
-                    raise AttributeError('Can not find method \''
-                                         + method + '\' in device or interface.')
-                setattr(self, method, ForwardMethod(self._device, method))
+            if owner is None:
+                raise AttributeError('Can not find method \''
+                                     + method + '\' in device or interface.')
+
+            methods[cmd] = getattr(owner, method)
 
             if cmd.pattern.pattern in patterns:
                 raise RuntimeError(
@@ -259,6 +1273,58 @@ class StreamAdapter(Adapter):
         if len(patterns) < len(cmds):
             raise RuntimeError('Warning')
 
+        return methods
+
+    def handle_request(self, request):
+        """
+        Processes a single request, which must not contain the terminator. The matching command
+        is found, its arguments are mapped and the bound method is called. Any exception raised
+        in the process is passed on to :meth:`handle_error`.
+
+        Replies to commands that are marked as ``pure`` are cached until the end of the cycle or
+        until a command that is not pure is executed.
+
+        Each request is recorded in :attr:`metrics`.
+
+        :param request: The request as bytes or memoryview.
+        :return: The reply (string or bytes) without framing or None if there is no reply.
+        """
+        start = default_timer()
+        cmd = None
+        failed = False
+
+        if PY2:
+            # The re-module does not accept memoryviews in Python 2
+            request = _request_bytes(request)
+
+        try:
+            cmd, match = self._command_index.match(request)
+
+            if cmd is None:
+                raise RuntimeError('None of the device\'s commands matched.')
+
+            groups = match.groups()
+
+            if not cmd.pure:
+                self._reply_cache.clear()
+
+            if cmd.pure and (cmd, groups) in self._reply_cache:
+                reply = self._reply_cache[(cmd, groups)]
+            else:
+                func = self._methods[cmd]
+                reply = cmd.convert_return_value(func(*cmd.convert_arguments(groups)))
+
+                if cmd.pure:
+                    self._reply_cache[(cmd, groups)] = reply
+        except Exception as error:
+            failed = True
+            reply = self.handle_error(_request_bytes(request), error)
+
+        self._metrics.record(cmd, len(request), len(reply) if reply is not None else 0,
+                             default_timer() - start, failed)
+
+        return reply
+
     def handle_error(self, request, error):
         """
         Override this method to handle exceptions that are raised during command processing.
@@ -273,6 +1339,11 @@ class StreamAdapter(Adapter):
         """
         Spend approximately ``cycle_delay`` seconds to process requests to the server.
 
-        :param cycle_delay: S
+        :param cycle_delay: Maximum time to wait for requests in seconds.
         """
-        asyncore.loop(cycle_delay, count=1)
+        self._reply_cache.clear()
+        self._server.process(cycle_delay)
+
+        if self._options.metrics_file is not None and time.time() >= self._next_metrics_dump:
+            self._metrics.dump(self._options.metrics_file)
+            self._next_metrics_dump = time.time() + self._options.metrics_interval
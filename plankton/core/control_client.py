@@ -28,10 +28,13 @@ This module provides client code for objects exposed via JSON-RPC over ZMQ.
 
 from __future__ import absolute_import
 
+import threading
 import zmq
 import uuid
 import types
 
+from .serialization import codecs
+
 # This does not import .exceptions, because absolute_import from the __future__ module
 try:
     import exceptions
@@ -65,6 +68,123 @@ class ProtocolException(Exception):
     """
 
 
+def get_result(response):
+    """
+    Returns the result contained in a JSON-RPC response. If the response contains an error,
+    an exception is raised. Server side exceptions are raised using the same type as on the
+    server if they are part of the exceptions-module. Otherwise, a RemoteException is raised.
+
+    :param response: JSON-RPC response as dictionary.
+    :return: Result of the remote call.
+    """
+    if 'result' in response:
+        return response['result']
+
+    if 'error' in response:
+        if 'data' in response['error']:
+            exception_type = response['error']['data']['type']
+            exception_message = response['error']['data']['message']
+
+            if not hasattr(exceptions, exception_type):
+                raise RemoteException(exception_type, exception_message)
+            else:
+                exception = getattr(exceptions, exception_type)
+                raise exception(exception_message)
+        else:
+            raise ProtocolException(response['error']['message'])
+
+
+def get_endpoint(host, port):
+    """
+    Returns the ZMQ endpoint for connecting to host and port. If host is already
+    a ZMQ endpoint (for example ``ipc:///tmp/plankton``), it is returned unchanged.
+
+    :param host: Host name, IP address or ZMQ endpoint.
+    :param port: Port, ignored if host is an endpoint.
+    :return: ZMQ endpoint.
+    """
+    if '://' in host:
+        return host
+
+    return 'tcp://{0}:{1}'.format(host, port)
+
+
+class SocketPool(object):
+    """
+    A pool of connected ZMQ sockets per endpoint. Sockets are created in the process-wide
+    context (``zmq.Context.instance()``), so creating many clients does not create additional
+    contexts and I/O threads. When a socket is released, it is kept for the next client
+    that connects to the same endpoint, up to ``max_idle`` sockets per endpoint.
+
+    Acquiring and releasing sockets is thread-safe, each socket is only handed out to one
+    client at a time. The sockets themselves are not thread-safe, so a client must only be
+    used by one thread at a time.
+
+    :param socket_type: ZMQ socket type of the pooled sockets.
+    :param max_idle: Maximum number of unused sockets that are kept per endpoint.
+    """
+
+    def __init__(self, socket_type=zmq.REQ, max_idle=8):
+        self._socket_type = socket_type
+        self._max_idle = max_idle
+
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, endpoint):
+        """
+        Returns an unused socket that is connected to the endpoint, a new socket is created
+        if there is none.
+
+        :param endpoint: ZMQ endpoint, for example ``tcp://127.0.0.1:10000``.
+        :return: Connected ZMQ socket.
+        """
+        with self._lock:
+            idle = self._idle.get(endpoint)
+
+            if idle:
+                return idle.pop()
+
+        sock = zmq.Context.instance().socket(self._socket_type)
+        sock.connect(endpoint)
+
+        return sock
+
+    def release(self, endpoint, sock, reusable=True):
+        """
+        Returns a socket to the pool. Sockets that are not reusable, for example REQ sockets
+        that still wait for a reply, and sockets exceeding ``max_idle`` are closed.
+
+        :param endpoint: Endpoint the socket is connected to.
+        :param sock: The socket.
+        :param reusable: False if the socket must not be handed out again.
+        """
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(endpoint, [])
+
+                if len(idle) < self._max_idle:
+                    idle.append(sock)
+                    return
+
+        sock.close(linger=0)
+
+    def clear(self):
+        """
+        Closes all unused sockets.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for sockets in idle.values():
+            for sock in sockets:
+                sock.close(linger=0)
+
+
+#: Pool of REQ sockets that is shared by all instances of :class:`ControlClient`.
+socket_pool = SocketPool()
+
+
 class ControlClient(object):
     """
     This class provides an interface to a ControlServer instance on
@@ -73,17 +193,102 @@ class ControlClient(object):
     of objects at the top level, a dictionary of named objects can be
     obtained via get_object_collection.
 
-    :param host: Host the control server is running on
+    The API of each remote object is only requested once, subsequent calls of get_object
+    for the same object are answered from a cache.
+
+    Several calls can be combined into one request via :meth:`batch`.
+
+    Messages are encoded as JSON by default. For large payloads, a binary codec
+    (see :mod:`~plankton.core.serialization`) can be selected via the ``codec`` parameter.
+    If the server does not support the codec, the client falls back to JSON, the codec
+    that is actually used is available in :attr:`codec`.
+
+    Instead of a host name, a ZMQ endpoint such as ``ipc:///tmp/plankton`` can be supplied
+    as host, the port is then ignored.
+
+    Connections are taken from :data:`socket_pool` and returned to it by :meth:`close`,
+    so creating many short-lived clients is cheap. Clients can be used as context managers,
+    which closes them on exit:
+
+    .. sourcecode:: Python
+
+        with ControlClient('127.0.0.1', 10000) as client:
+            device = client.get_object('device')
+
+    :param host: Host the control server is running on or ZMQ endpoint
     :param port: Port on which the control server is listening
+    :param codec: Name of the codec used to encode messages.
     """
 
-    def __init__(self, host='127.0.0.1', port='10000'):
-        self._socket = self._get_zmq_req_socket()
-        self._socket.connect('tcp://{0}:{1}'.format(host, port))
+    def __init__(self, host='127.0.0.1', port='10000', codec='json'):
+        if codec not in codecs:
+            raise ValueError('Unknown codec \'{}\', available codecs are: {}'.format(
+                codec, ', '.join(sorted(codecs))))
+
+        self._endpoint = get_endpoint(host, port)
+        self._socket = self._get_zmq_req_socket(self._endpoint)
+
+        # True while a request is waiting for its reply
+        self._waiting = False
+
+        # Plain JSON messages are sent without the codec frame
+        self._codec = codecs[codec] if codec != 'json' else None
+
+        self._api_cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def codec(self):
+        """
+        Name of the codec that is used to encode messages.
+        """
+        return self._codec.name if self._codec is not None else 'json'
+
+    def _get_zmq_req_socket(self, endpoint):
+        return socket_pool.acquire(endpoint)
+
+    def close(self):
+        """
+        Returns the socket to :data:`socket_pool`, so that other clients can reuse the
+        connection. If a request was interrupted before its reply arrived, the socket can
+        not be reused and is closed instead. The client can not be used after it has been
+        closed, closing it again has no effect.
+        """
+        if self._socket is not None:
+            socket_pool.release(self._endpoint, self._socket, reusable=not self._waiting)
+            self._socket = None
+
+    def _request(self, data):
+        if self._socket is None:
+            raise RuntimeError('The client has been closed.')
+
+        self._waiting = True
+        reply = self._exchange(data)
+        self._waiting = False
+
+        return reply
 
-    def _get_zmq_req_socket(self):
-        context = zmq.Context()
-        return context.socket(zmq.REQ)
+    def _exchange(self, data):
+        if self._codec is None:
+            self._socket.send_json(data)
+            return self._socket.recv_json()
+
+        name = self._codec.name.encode('ascii')
+
+        self._socket.send_multipart([name] + self._codec.encode(data))
+        frames = self._socket.recv_multipart()
+
+        if frames[0] != name:
+            # The server does not support the codec and has replied with an error in JSON
+            self._codec = None
+            return self._exchange(data)
+
+        return self._codec.decode(frames[1:])
 
     def json_rpc(self, method, *args):
         """
@@ -98,26 +303,85 @@ class ControlClient(object):
         :return: JSON result and request id.
         """
         id = str(uuid.uuid4())
-        self._socket.send_json(
+
+        return self._request(
             {'method': method,
              'params': args,
              'jsonrpc': '2.0',
              'id': id
-             })
+             }), id
+
+    def json_rpc_batch(self, calls):
+        """
+        Sends several calls to the server in one JSON-RPC batch request and waits for the
+        responses. The server processes all calls of a batch at once, so the results are
+        consistent with each other.
+
+        :param calls: List of (method, args)-tuples.
+        :return: List of responses in the same order as the calls.
+        """
+        ids = [str(uuid.uuid4()) for _ in calls]
+
+        responses = self._request(
+            [{'method': method,
+              'params': args,
+              'jsonrpc': '2.0',
+              'id': id
+              } for id, (method, args) in zip(ids, calls)])
+
+        if isinstance(responses, dict):
+            responses = [responses]
 
-        return self._socket.recv_json(), id
+        responses = {response.get('id'): response for response in responses}
+
+        return [responses.get(id, {'error': {'message': 'No response to request.'}})
+                for id in ids]
+
+    def get_api(self, object_name=''):
+        """
+        Returns the API of the remote object, that is its class name and exposed members.
+        The result is cached.
+
+        :param object_name: Object name on the server.
+        :return: Dictionary with the keys ``class`` and ``methods``.
+        """
+        if object_name not in self._api_cache:
+            api, request_id = self.json_rpc(object_name + ':api')
+
+            if 'result' not in api or api['id'] != request_id:
+                raise ProtocolException('Failed to retrieve API of remote object.')
+
+            self._api_cache[object_name] = api['result']
+
+        return self._api_cache[object_name]
 
     def get_object(self, object_name=''):
-        api, request_id = self.json_rpc(object_name + ':api')
+        return self._create_proxy(self, object_name, ObjectProxy)
 
-        if 'result' not in api or api['id'] != request_id:
-            raise ProtocolException('Failed to retrieve API of remote object.')
+    def _create_proxy(self, connection, object_name, proxy_type):
+        api = self.get_api(object_name)
 
-        object_type = type(str(api['result']['class']), (ObjectProxy,), {})
-        methods = api['result']['methods']
+        object_type = type(str(api['class']), (proxy_type,), {})
 
         glue = '.' if object_name else ''
-        return object_type(self, methods, object_name + glue)
+        return object_type(connection, api['methods'], object_name + glue)
+
+    def batch(self):
+        """
+        Returns a :class:`Batch` that collects calls and sends them in one request when the
+        ``with``-block is left:
+
+        .. sourcecode:: Python
+
+            with client.batch() as batch:
+                speed = batch.device.speed
+                phase = batch.device.phase
+
+            print(speed.result(), phase.result())
+
+        :return: Batch that is bound to this client.
+        """
+        return Batch(self)
 
     def get_object_collection(self, object_name=''):
         """
@@ -136,6 +400,68 @@ class ControlClient(object):
         return {obj: self.get_object(obj) for obj in object_names}
 
 
+class PropertySubscriber(object):
+    """
+    This class receives property values that are published by a
+    :class:`~plankton.core.control_server.PropertyPublisher`. Topics are subscribed via
+    :meth:`subscribe`, values are obtained via :meth:`receive`:
+
+    .. sourcecode:: Python
+
+        subscriber = PropertySubscriber('127.0.0.1', 10001)
+        subscriber.subscribe('device.speed')
+
+        while True:
+            topic, value = subscriber.receive()
+
+    Topics are matched by prefix, so ``device.`` subscribes to all properties of the device.
+
+    :param host: Host the publisher is running on or ZMQ endpoint
+    :param port: Port on which the publisher is listening
+    """
+
+    def __init__(self, host='127.0.0.1', port='10001'):
+        context = zmq.Context.instance()
+        self._socket = context.socket(zmq.SUB)
+        self._socket.connect(get_endpoint(host, port))
+
+    def subscribe(self, topic=''):
+        """
+        Subscribes to all topics that start with ``topic``.
+
+        :param topic: Topic prefix, for example ``device.speed``.
+        """
+        self._socket.setsockopt(zmq.SUBSCRIBE, topic.encode('utf-8'))
+
+    def unsubscribe(self, topic=''):
+        """
+        Removes a subscription that was made via :meth:`subscribe`.
+
+        :param topic: Topic prefix that was subscribed.
+        """
+        self._socket.setsockopt(zmq.UNSUBSCRIBE, topic.encode('utf-8'))
+
+    def receive(self, timeout=None):
+        """
+        Waits for the next published value.
+
+        :param timeout: Maximum time to wait in seconds, waits indefinitely if None.
+        :return: Tuple of topic and value or None if no value was received before the timeout.
+        """
+        if timeout is not None and not self._socket.poll(int(1000 * timeout), zmq.POLLIN):
+            return None
+
+        topic, payload = self._socket.recv_multipart()
+
+        return topic.decode('utf-8'), codecs['json'].decode([payload])
+
+    def close(self):
+        """
+        Closes the socket.
+        """
+        self._socket.close()
+
+
 class ObjectProxy(object):
     """
     This class serves as a base class for dynamically created classes on the
@@ -183,21 +509,7 @@ class ObjectProxy(object):
         """
         response, id = self._connection.json_rpc(self._prefix + method, *args)
 
-        if 'result' in response:
-            return response['result']
-
-        if 'error' in response:
-            if 'data' in response['error']:
-                exception_type = response['error']['data']['type']
-                exception_message = response['error']['data']['message']
-
-                if not hasattr(exceptions, exception_type):
-                    raise RemoteException(exception_type, exception_message)
-                else:
-                    exception = getattr(exceptions, exception_type)
-                    raise exception(exception_message)
-            else:
-                raise ProtocolException(response['error']['message'])
+        return get_result(response)
 
     def _add_member_proxies(self, members):
         for member in [str(m) for m in members]:
@@ -227,3 +539,121 @@ class ObjectProxy(object):
             return obj._make_request(method_name, *args)
 
         return types.MethodType(method_wrapper, self)
+
+
+class Future(object):
+    """
+    Placeholder for the result of a call that is part of a :class:`Batch`. The result is
+    available after the batch has been sent.
+    """
+
+    def __init__(self):
+        self._done = False
+        self._result = None
+        self._exception = None
+
+    def done(self):
+        """
+        Returns True if the batch that contains the call has been sent.
+        """
+        return self._done
+
+    def result(self):
+        """
+        Returns the result of the call. If the call raised an exception on the server, that
+        exception is raised here, see :func:`get_result`.
+
+        :return: Result of the remote call.
+        """
+        if not self._done:
+            raise RuntimeError('The batch containing this call has not been sent yet.')
+
+        if self._exception is not None:
+            raise self._exception
+
+        return self._result
+
+    def set_response(self, response):
+        try:
+            self._result = get_result(response)
+        except Exception as e:
+            self._exception = e
+
+        self._done = True
+
+
+class Batch(object):
+    """
+    Collects remote calls and sends them to the server in one JSON-RPC batch request when
+    :meth:`send` is called or the ``with``-block is left. Instead of results, calls
+    return :class:`Future`-objects.
+
+    Proxies to remote objects are obtained as attributes of the batch or via
+    :meth:`get_object`. Reading a property or calling a method on such a proxy adds a call
+    to the batch.
+
+    :param client: ControlClient that is used to send the batch.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.send()
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+
+        return self.get_object(item)
+
+    def get_object(self, object_name=''):
+        """
+        Returns a proxy for the remote object that adds calls to this batch.
+
+        :param object_name: Object name on the server.
+        :return: Proxy object.
+        """
+        return self._client._create_proxy(self, object_name, BatchObjectProxy)
+
+    def call(self, method, *args):
+        """
+        Adds a call to the batch.
+
+        :param method: Method to call on remote.
+        :param args: Arguments to method call.
+        :return: Future for the result.
+        """
+        future = Future()
+        self._calls.append((method, args, future))
+
+        return future
+
+    def send(self):
+        """
+        Sends all calls that were added to the batch and resolves the futures.
+        """
+        calls, self._calls = self._calls, []
+
+        if not calls:
+            return
+
+        responses = self._client.json_rpc_batch([(method, args) for method, args, _ in calls])
+
+        for (_, _, future), response in zip(calls, responses):
+            future.set_response(response)
+
+
+class BatchObjectProxy(ObjectProxy):
+    """
+    Variant of :class:`ObjectProxy` that adds calls to a :class:`Batch` and returns
+    a :class:`Future` for each call instead of performing it immediately.
+    """
+
+    def _make_request(self, method, *args):
+        return self._connection.call(self._prefix + method, *args)
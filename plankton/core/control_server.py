@@ -30,12 +30,146 @@ this infrastructure in :class:`~plankton.core.simulation.Simulation`.
 
 from __future__ import absolute_import
 
+import binascii
+import copy
+import functools
+import inspect
+import operator
 import socket
+import threading
+import weakref
 import zmq
-import json
+from collections import deque, OrderedDict
+from timeit import default_timer
 from jsonrpc import JSONRPCResponseManager
+from jsonrpc.exceptions import JSONRPCInvalidRequest, JSONRPCInvalidRequestException, \
+    JSONRPCParseError
+from jsonrpc.jsonrpc import JSONRPCRequest
+from six import string_types
 
 from .exceptions import PlanktonException
+from .serialization import codecs
+
+
+# Transports that can be specified as part of a ZMQ endpoint
+_TRANSPORTS = ('tcp', 'ipc', 'inproc')
+
+
+def get_endpoint(connection_string):
+    """
+    Converts a connection string to a ZMQ endpoint. Full endpoints such as
+    ``tcp://127.0.0.1:10000``, ``ipc:///tmp/plankton`` or ``inproc://plankton`` are returned
+    unchanged. For strings of the form 'host:port', the host name is resolved and a TCP
+    endpoint is returned. If the string is invalid or the host can not be resolved,
+    a PlanktonException is raised.
+
+    :param connection_string: ZMQ endpoint or string with host:port pair.
+    :return: ZMQ endpoint.
+    """
+    if '://' in connection_string:
+        transport = connection_string.split('://', 1)[0]
+
+        if transport not in _TRANSPORTS:
+            raise PlanktonException(
+                'Transport \'{}\' is not supported, use one of: {}.'.format(
+                    transport, ', '.join(_TRANSPORTS)))
+
+        return connection_string
+
+    try:
+        host, port = connection_string.split(':')
+    except ValueError:
+        raise PlanktonException(
+            '\'{}\' is not a valid control server initialization string. '
+            'A string of the form "host:port" or a ZMQ endpoint '
+            'is expected.'.format(connection_string))
+
+    try:
+        return 'tcp://{0}:{1}'.format(socket.gethostbyname(host), port)
+    except socket.gaierror:
+        raise PlanktonException('Could not resolve control server host: {}'.format(host))
+
+
+def _snapshot_value(value):
+    return value
+
+
+# Kinds of class members, properties are data descriptors that take precedence over instance
+# attributes, other class attributes can be shadowed by instance attributes.
+_METHOD, _PROPERTY, _ATTRIBUTE = 'method', 'property', 'attribute'
+
+_class_members_cache = weakref.WeakKeyDictionary()
+
+
+def _get_class_members(cls):
+    """
+    Classifies the members of the supplied class and its bases without accessing them
+    through an instance, so property getters are not invoked. The result is cached per class.
+
+    :param cls: The class to inspect.
+    :return: Dictionary with member names as keys and their kind as values.
+    """
+    try:
+        return _class_members_cache[cls]
+    except KeyError:
+        pass
+
+    members = {}
+
+    for base in reversed(inspect.getmro(cls)):
+        for name, value in vars(base).items():
+            if isinstance(value, (staticmethod, classmethod)):
+                members[name] = _METHOD
+            elif hasattr(type(value), '__set__'):
+                members[name] = _PROPERTY
+            else:
+                members[name] = _METHOD if callable(value) else _ATTRIBUTE
+
+    _class_members_cache[cls] = members
+
+    return members
+
+
+def _public_members(obj):
+    """
+    Returns a sorted list of the members of obj that do not start with an underscore. Unless
+    the type of obj customizes ``__dir__``, this list is assembled from the cached class members
+    and the instance dictionary instead of calling ``dir``.
+
+    :param obj: The object to inspect.
+    :return: List of public member names.
+    """
+    obj_type = type(obj)
+
+    if getattr(obj_type, '__dir__', None) is not getattr(object, '__dir__', None):
+        names = dir(obj)
+    else:
+        names = set(_get_class_members(obj_type)).union(getattr(obj, '__dict__', ()))
+
+    return sorted(name for name in names if not name.startswith('_'))
+
+
+def _is_method(obj, member):
+    """
+    Returns True if the member of obj is callable. Members defined in the class (or in the
+    instance dictionary) are classified without invoking property getters. Other members,
+    for example those provided by ``__getattr__``, are retrieved from the object, which
+    raises an AttributeError if the member does not exist.
+
+    :param obj: The object that has the member.
+    :param member: Name of the member.
+    :return: True if the member is a method or another callable object.
+    """
+    kind = _get_class_members(type(obj)).get(member)
+    instance_dict = getattr(obj, '__dict__', {})
+
+    if kind != _PROPERTY and member in instance_dict:
+        return callable(instance_dict[member])
+
+    if kind is not None:
+        return kind == _METHOD
+
+    return callable(getattr(obj, member))
 
 
 class ExposedObject(object):
@@ -48,14 +182,18 @@ class ExposedObject(object):
     really captured well by the RPC-approach, where a client performs function calls on a
     remote machine and gets the result back.
 
-    The supplied object is inspected using dir(object) and all entries that do not start
-    with a _ are exposed in a way that depends on whether the corresponding member
-    is a method or a property (either in the Python-sense or the general OO-sense). Methods
-    are stored directly, and stored in an internal dict where the method name is the key and
-    the callable method object is the value. For properties, a getter- and a setter function
-    are generated, which are then stored in the same dict. The names of these methods for
-    a property called ``a`` are ``a:get`` and ``a:set``. The separator has been chosen to be
-    colon because it can't be part of a valid Python identifier.
+    All members of the supplied object that do not start with a _ are exposed in a way that
+    depends on whether the corresponding member is a method or a property (either in the
+    Python-sense or the general OO-sense). Methods are stored in an internal dict where
+    the method name is the key and the callable method object is the value. For properties,
+    a getter- and a setter function are generated, which are then stored in the same dict.
+    The names of these methods for a property called ``a`` are ``a:get`` and ``a:set``.
+    The separator has been chosen to be colon because it can't be part of a valid
+    Python identifier.
+
+    Members are classified by inspecting the class of the object, which is cached per class,
+    so that property getters are not invoked when the object is exposed. The functions
+    are only created when they are first accessed.
 
     If the second argument is not empty, it is interpreted to be the list of members
     to expose and only those are actually exposed. This can be used to explicitly expose
@@ -74,40 +212,33 @@ class ExposedObject(object):
 
         self._object = object
         self._function_map = {}
+        self._function_factories = {}
 
         self._add_function(':api', self.get_api)
 
-        exposed_members = members if members else self._public_members()
+        exposed_members = members if members else _public_members(object)
 
         for method in exposed_members:
             if not exclude or method not in exclude:
                 self._add_member_wrappers(method)
 
-    def _public_members(self):
-        """
-        Returns a list of members that do not start with an underscore.
-        """
-        return [prop for prop in dir(self._object) if not prop.startswith('_')]
-
     def _add_member_wrappers(self, member):
         """
-        This method probes the supplied member of the wrapped object and inserts an appropriate
-        entry into the internal method map. Getters and setters for properties get a suffix
-        ':get' and ':set' respectively.
+        This method classifies the supplied member of the wrapped object and inserts an
+        appropriate entry into the internal method map. Getters and setters for properties
+        get a suffix ':get' and ':set' respectively.
 
         :param member: The member of the wrapped object to expose
         """
-        method_object = getattr(self._object, member)
+        obj = self._object
 
-        if callable(method_object):
-            self._add_function(member, method_object)
+        if _is_method(obj, member):
+            self._add_lazy_function(member, lambda: getattr(obj, member))
         else:
-            self._add_function('{}:get'.format(member), lambda: getattr(self._object, member))
-
-            def setter(arg):
-                return setattr(self._object, member, arg)
-
-            self._add_function('{}:set'.format(member), setter)
+            self._add_lazy_function('{}:get'.format(member),
+                                    lambda: functools.partial(operator.attrgetter(member), obj))
+            self._add_lazy_function('{}:set'.format(member),
+                                    lambda: functools.partial(setattr, obj, member))
 
     def get_api(self):
         """
@@ -119,7 +250,13 @@ class ExposedObject(object):
         return {'class': type(self._object).__name__, 'methods': list(self._function_map.keys())}
 
     def __getitem__(self, item):
-        return self._function_map[item]
+        function = self._function_map[item]
+
+        if function is None:
+            function = self._function_factories.pop(item)()
+            self._add_function(item, function)
+
+        return function
 
     def __len__(self):
         return len(self._function_map)
@@ -134,8 +271,19 @@ class ExposedObject(object):
         if not callable(function):
             raise TypeError('Only callable objects can be exposed.')
 
+        self._function_factories.pop(name, None)
         self._function_map[name] = function
 
+    def _add_lazy_function(self, name, factory):
+        """
+        Adds a function that is created by calling factory when it is first accessed.
+
+        :param name: Name of the function.
+        :param factory: Callable without arguments that returns the function.
+        """
+        self._function_factories[name] = factory
+        self._function_map[name] = None
+
 
 class ExposedObjectCollection(ExposedObject):
     """
@@ -188,7 +336,8 @@ class ExposedObjectCollection(ExposedObject):
 
         for method_name in exposed_object:
             glue = '.' if not method_name.startswith(':') else ''
-            self._add_function(name + glue + method_name, exposed_object[method_name])
+            self._add_lazy_function(name + glue + method_name,
+                                    functools.partial(exposed_object.__getitem__, method_name))
 
     def get_objects(self):
         """Returns the names of the exposed objects."""
@@ -197,15 +346,37 @@ class ExposedObjectCollection(ExposedObject):
 
 class ControlServer(object):
     """
-    This server opens a ZMQ REP-socket at the given host and port when start_server
-    is called.
+    This server opens a ZMQ ROUTER-socket at the given host and port when start_server
+    is called. Clients connect with REQ- (see :class:`~plankton.core.control_client.ControlClient`)
+    or DEALER-sockets.
+
+    Instead of host and port, a ZMQ endpoint can be supplied. For clients on the same host,
+    ``ipc://`` endpoints (Unix domain sockets, not available on Windows) have a lower latency
+    than TCP. ``inproc://`` endpoints can be used by clients in the same process, all sockets
+    are created in the process-wide ZMQ context.
 
     The server constructs an :class:`ExposedObjectCollection` from the supplied
     name: object-dictionary and uses that as a handler for JSON-RPC requests. If it is an
     instance of :class:`ExposedObject`, that is used directly.
 
-    Each time process is called, the server tries to get request data and responds to that.
-    If there is no data, the method does nothing.
+    Each time process is called, the server handles the requests that are waiting, until
+    none are left or ``time_budget`` seconds have elapsed. If there is no data, the method
+    does nothing. Statistics about processed requests are available via :attr:`statistics`.
+
+    Messages consist of the codec name and the encoded request, the reply is encoded with the
+    same codec. The available codecs are defined in :mod:`~plankton.core.serialization`. If
+    the codec name is omitted, JSON is used, so plain JSON-RPC clients work as well. Requests
+    with an unknown codec are answered with an error that is encoded as JSON.
+
+    JSON-RPC batch requests are supported, all calls in a batch are processed at once, so
+    that the results are consistent with each other.
+
+    Requests are queued per client and the clients are served in turn, one request at a time,
+    so a client that sends many requests can not delay the others indefinitely. Replies are
+    addressed to the client that sent the request and are sent without blocking. If a client
+    does not receive its replies (for example because it has died), further replies to it are
+    dropped instead of blocking the server. Replies to clients that have disconnected are
+    dropped as well, both are counted as ``dropped_replies``.
 
     Please note that this RPC-service comes without any security, authentication, etc.
     Only use it to expose objects on a trusted network and be aware that anyone on that
@@ -213,25 +384,22 @@ class ControlServer(object):
 
     :param object_map: Dictionary with name: object-pairs to construct an
                        ExposedObjectCollection or ExposedObject
-    :param connection_string: String with host:port pair for binding control server.
+    :param connection_string: ZMQ endpoint or string with host:port pair for binding control
+                              server, see :func:`get_endpoint`.
+    :param time_budget: Maximum time in seconds spent processing requests per call of process.
     """
 
-    def __init__(self, object_map, connection_string):
-        super(ControlServer, self).__init__()
+    follow_up_timeout = 0.002
 
-        try:
-            host, port = connection_string.split(':')
-        except ValueError:
-            raise PlanktonException(
-                '\'{}\' is not a valid control server initialization string. '
-                'A string of the form "host:port" is expected.'.format(connection_string))
+    # Statistics are kept for this many clients, the least recently seen are dropped first.
+    max_tracked_clients = 100
 
-        try:
-            self.host = socket.gethostbyname(host)
-        except socket.gaierror:
-            raise PlanktonException('Could not resolve control server host: {}'.format(host))
+    def __init__(self, object_map, connection_string, time_budget=0.05):
+        super(ControlServer, self).__init__()
+
+        self.time_budget = time_budget
 
-        self.port = port
+        self.endpoint = get_endpoint(connection_string)
 
         if isinstance(object_map, ExposedObject):
             self._exposed_object = object_map
@@ -240,6 +408,40 @@ class ControlServer(object):
 
         self._socket = None
 
+        # Waiting requests per client identity and the order in which clients are served.
+        self._queues = {}
+        self._ready = deque()
+
+        self._clients = OrderedDict()
+
+        self._processed_requests = 0
+        self._last_processed = 0
+        self._dropped_replies = 0
+
+    @property
+    def statistics(self):
+        """
+        Dictionary with the total number of processed requests, the number of requests processed
+        in the last call of :meth:`process`, the number of requests that are queued, the number
+        of dropped replies and the number of clients that have requests in the queue.
+        """
+        return {'processed_requests': self._processed_requests,
+                'last_processed': self._last_processed,
+                'queue_depth': sum(len(queue) for queue in list(self._queues.values())),
+                'dropped_replies': self._dropped_replies,
+                'waiting_clients': len(self._queues)}
+
+    @property
+    def client_statistics(self):
+        """
+        Dictionary with statistics for each client, keyed by the hex-encoded identity of the
+        client. For each client the number of processed requests, dropped replies and queued
+        requests is reported.
+        """
+        return {binascii.hexlify(identity).decode('ascii'): dict(
+            stats, queued=len(self._queues.get(identity, ())))
+                for identity, stats in list(self._clients.items())}
+
     @property
     def is_running(self):
         """
@@ -256,12 +458,26 @@ class ControlServer(object):
 
     def start_server(self):
         """
-        Binds the server to the configured host and port and starts listening.
+        Binds the server to the configured endpoint and starts listening.
         """
         if self._socket is None:
-            context = zmq.Context()
-            self._socket = context.socket(zmq.REP)
-            self._socket.bind('tcp://{0}:{1}'.format(self.host, self.port))
+            context = zmq.Context.instance()
+            self._socket = context.socket(zmq.ROUTER)
+            # Without this option, ROUTER silently discards replies it can not deliver
+            self._socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+            self._socket.bind(self.endpoint)
+
+    def stop_server(self):
+        """
+        Closes the socket. Requests that have been received but not processed are dropped.
+        The server can be started again with :meth:`start_server`.
+        """
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+
+            self._queues.clear()
+            self._ready.clear()
 
     def _unhandled_exception_response(self, id, exception):
         return {"jsonrpc": "2.0", "id": id,
@@ -271,11 +487,133 @@ class ControlServer(object):
                                    "args": [exception.args],
                                    "type": type(exception).__name__}}}
 
-    def process(self):
+    def _receive_requests(self):
+        # The envelope consists of the identity and, for REQ-clients, an empty delimiter
+        while True:
+            try:
+                frames = self._socket.recv_multipart(flags=zmq.NOBLOCK)
+            except zmq.Again:
+                return
+
+            delimiter = 2 if frames[1:2] == [b''] else 1
+            envelope, request = frames[:delimiter], frames[delimiter:]
+            identity = envelope[0]
+
+            if identity not in self._queues:
+                self._queues[identity] = deque()
+                self._ready.append(identity)
+
+            self._queues[identity].append((envelope, request))
+
+    def _next_request(self):
+        identity = self._ready.popleft()
+        queue = self._queues[identity]
+
+        envelope, request = queue.popleft()
+
+        if queue:
+            self._ready.append(identity)
+        else:
+            del self._queues[identity]
+
+        return identity, envelope, request
+
+    def _client_stats(self, identity):
+        stats = self._clients.pop(identity, None)
+
+        if stats is None:
+            stats = {'requests': 0, 'dropped_replies': 0}
+
+            if len(self._clients) >= self.max_tracked_clients:
+                self._clients.popitem(last=False)
+
+        self._clients[identity] = stats
+
+        return stats
+
+    def _split_codec(self, frames):
+        # A single frame is a plain JSON request, otherwise the first frame names the codec.
+        # Empty requests are passed to the JSON codec, which fails to decode them.
+        if len(frames) <= 1:
+            return [], codecs['json'], frames
+
+        return frames[:1], codecs.get(frames[0].decode('ascii', 'replace')), frames[1:]
+
+    def _handle_message(self, frames):
+        codec_frame, codec, frames = self._split_codec(frames)
+
+        if codec is None:
+            return [b'json'] + codecs['json'].encode(
+                {'jsonrpc': '2.0', 'id': None,
+                 'error': {'message': 'Unsupported codec', 'code': -32001}})
+
+        try:
+            data = codec.decode(frames)
+        except Exception:
+            response = {'jsonrpc': '2.0', 'id': None, 'error': JSONRPCParseError()._data}
+        else:
+            response = self._handle_request(data)
+
+        return self._encode_reply(codec_frame, codec, response)
+
+    def _encode_reply(self, codec_frame, codec, response):
+        if response is None:
+            return None
+
+        try:
+            return codec_frame + codec.encode(response)
+        except (TypeError, ValueError) as e:
+            id = response.get('id') if isinstance(response, dict) else None
+            return codec_frame + codec.encode(self._unhandled_exception_response(id, e))
+
+    def _handle_request(self, data, dispatcher=None):
+        try:
+            request = JSONRPCRequest.from_data(data)
+        except JSONRPCInvalidRequestException:
+            return {'jsonrpc': '2.0', 'id': None, 'error': JSONRPCInvalidRequest()._data}
+
+        try:
+            response = JSONRPCResponseManager.handle_request(
+                request, self._exposed_object if dispatcher is None else dispatcher)
+        except TypeError as e:
+            return self._unhandled_exception_response(
+                data.get('id') if isinstance(data, dict) else None, e)
+
+        return response.data if response is not None else None
+
+    def _send_reply(self, envelope, reply, stats):
+        try:
+            self._socket.send_multipart(envelope + reply, flags=zmq.NOBLOCK)
+        except zmq.ZMQError as error:
+            # The client does not receive its replies or has disconnected
+            if error.errno not in (zmq.EAGAIN, zmq.EHOSTUNREACH):
+                raise
+
+            self._dropped_replies += 1
+            stats['dropped_replies'] += 1
+
+    def _finish_request(self, envelope, reply, stats):
+        if reply is not None:
+            self._send_reply(envelope, reply, stats)
+
+        stats['requests'] += 1
+
+    def _wait_for_request(self, timeout):
+        return timeout > 0 and self._socket.poll(int(1000 * timeout), zmq.POLLIN)
+
+    def process(self, time_budget=None):
         """
         Each time this method is called, the socket tries to retrieve data and passes
         it to the JSONRPCResponseManager, which in turn passes the RPC to the
-        ExposedObjectCollection.
+        ExposedObjectCollection. This is repeated until no more requests are waiting or
+        the time budget is exhausted. At least one request is processed if one is available.
+        Requests that could not be processed within the time budget remain queued for the
+        next call.
+
+        Scripts usually send the next request as soon as they have received the reply to the
+        previous one. To serve them without waiting for the next cycle, the server waits up to
+        ``follow_up_timeout`` seconds for another request after it has processed one, as long
+        as the time budget permits.
 
         In case no data are available, the method does nothing. This behavior is required for
         Plankton where everything is running in one thread. The central loop can call process
@@ -284,18 +622,505 @@ class ControlServer(object):
 
         If the server has not been started yet (via :meth:`start_server`), a RuntimeError
         is raised.
+
+        :param time_budget: Maximum processing time in seconds, ``time_budget``-member if None.
+        :return: Number of processed requests.
         """
         if self._socket is None:
             raise RuntimeError('The server has not been started yet, use start_server to do so.')
 
-        try:
-            request = self._socket.recv_unicode(flags=zmq.NOBLOCK)
+        if time_budget is None:
+            time_budget = self.time_budget
 
-            try:
-                response = JSONRPCResponseManager.handle(request, self._exposed_object)
-                self._socket.send_unicode(response.json)
-            except TypeError as e:
-                self._socket.send_json(
-                    self._unhandled_exception_response(json.loads(request)['id'], e))
+        start = default_timer()
+        processed = 0
+
+        while True:
+            self._receive_requests()
+
+            if not self._ready:
+                if not processed or not self._wait_for_request(
+                        min(self.follow_up_timeout, time_budget - (default_timer() - start))):
+                    break
+
+                continue
+
+            identity, envelope, request = self._next_request()
+            stats = self._client_stats(identity)
+
+            self._finish_request(envelope, self._handle_message(request), stats)
+            processed += 1
+
+            if default_timer() - start >= time_budget:
+                self._receive_requests()
+                break
+
+        self._processed_requests += processed
+        self._last_processed = processed
+
+        return processed
+
+
+class ThreadedControlServer(ControlServer):
+    """
+    This variant of :class:`ControlServer` receives and answers requests in a background
+    thread, so that the response time does not depend on the cycle time of the simulation.
+    The exposed objects are however only accessed from the thread that calls
+    :meth:`process`, so there are no data races with the simulation.
+
+    Reading a property (a request for ``name:get``) is answered directly by the background
+    thread from a snapshot of property values. All other requests, such as setting properties
+    or calling methods, are queued and executed when :meth:`process` is called at the next
+    cycle boundary, each request (or batch request) as one unit. The reply is sent once the
+    request has been executed.
+
+    Properties are added to the snapshot the first time they are read, that first read is
+    queued like other requests. After each call of :meth:`process`, the values of all
+    properties in the snapshot are read again, so reads return the state of the objects at
+    the last cycle boundary. Because the snapshot is updated after the queued requests have
+    been executed, a client that reads a property after setting it receives the new value.
+    Requests of a client that still waits for a queued request are queued as well, so that
+    the order of requests is preserved for clients that do not wait for each reply.
+
+    The parameters are the same as for :class:`ControlServer`, ``time_budget`` limits the
+    time spent executing queued requests in each call of :meth:`process`.
+    """
+
+    poll_interval = 0.1
+
+    def __init__(self, object_map, connection_string, time_budget=0.05):
+        super(ThreadedControlServer, self).__init__(object_map, connection_string, time_budget)
+
+        self._thread = None
+        self._stop_thread = threading.Event()
+
+        self._wakeup_sender = None
+        self._wakeup_receiver = None
+
+        # Requests waiting for the next cycle boundary and replies waiting to be sent,
+        # these are the only data structures that both threads access.
+        self._pending = deque()
+        self._completed = deque()
+
+        # Property getters in the snapshot, only used in the thread that calls process
+        self._tracked_getters = set()
+        self._snapshot = {}
+
+        # Number of queued requests per client, only used in the server thread
+        self._queued_clients = {}
+
+        self._snapshot_reads = 0
+
+    @property
+    def statistics(self):
+        """
+        In addition to the entries described in :attr:`ControlServer.statistics`, the number
+        of requests answered from the snapshot, the number of requests waiting for the next
+        cycle boundary and the number of properties in the snapshot are reported.
+        """
+        statistics = super(ThreadedControlServer, self).statistics
+        statistics.update({'snapshot_reads': self._snapshot_reads,
+                           'pending_requests': len(self._pending),
+                           'snapshot_size': len(self._snapshot)})
+
+        return statistics
+
+    def start_server(self):
+        """
+        Binds the server to the configured endpoint and starts the background thread.
+        """
+        if self._socket is None:
+            super(ThreadedControlServer, self).start_server()
+
+            context = self._socket.context
+            endpoint = 'inproc://plankton-control-{}'.format(id(self))
+
+            self._wakeup_receiver = context.socket(zmq.PAIR)
+            self._wakeup_receiver.bind(endpoint)
+            self._wakeup_sender = context.socket(zmq.PAIR)
+            self._wakeup_sender.connect(endpoint)
+
+            self._stop_thread.clear()
+            self._thread = threading.Thread(target=self._serve)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop_server(self, timeout=1.0):
+        """
+        Stops the background thread. Replies to requests that have already been executed are
+        still sent, requests that are queued are answered with an error, because they would
+        never be executed otherwise. The thread closes its sockets when it finishes. If it
+        does not finish within ``timeout`` seconds, it keeps running until it does and the
+        server can not be started again before that.
+
+        :param timeout: Maximum time in seconds to wait for the thread to finish.
+        """
+        if self._thread is not None:
+            self._stop_thread.set()
+            self._wake_thread()
+
+            self._thread.join(timeout)
+            self._thread = None
+
+            self._wakeup_sender.close(linger=0)
+            self._wakeup_sender = None
+
+    def _wake_thread(self):
+        try:
+            self._wakeup_sender.send(b'', flags=zmq.NOBLOCK)
         except zmq.Again:
+            # The background thread has not received the previous wakeup yet
             pass
+
+    def _serve(self):
+        poller = zmq.Poller()
+        poller.register(self._socket, zmq.POLLIN)
+        poller.register(self._wakeup_receiver, zmq.POLLIN)
+
+        try:
+            while not self._stop_thread.is_set():
+                events = dict(poller.poll(int(1000 * self.poll_interval)))
+
+                if self._wakeup_receiver in events:
+                    while self._wakeup_receiver.poll(0):
+                        self._wakeup_receiver.recv()
+
+                self._send_completed()
+                self._receive_requests()
+
+                while self._ready:
+                    identity, envelope, request = self._next_request()
+                    self._dispatch(identity, envelope, request, self._client_stats(identity))
+        finally:
+            self._send_completed()
+            self._reject_pending()
+            self._queued_clients.clear()
+
+            self._wakeup_receiver.close(linger=0)
+            self._socket.close(linger=0)
+            self._wakeup_receiver = self._socket = None
+
+    def _reject_pending(self):
+        while self._pending:
+            identity, envelope, codec_frame, codec, data, stats = self._pending.popleft()
+
+            errors = [{'jsonrpc': '2.0', 'id': call['id'],
+                       'error': {'message': 'Server stopped', 'code': -32002}}
+                      for call in self._calls(data)
+                      if isinstance(call, dict) and call.get('id') is not None]
+
+            response = (errors if isinstance(data, list) else errors[0]) if errors else None
+
+            self._finish_request(envelope, self._encode_reply(codec_frame, codec, response), stats)
+
+    def _dispatch(self, identity, envelope, frames, stats):
+        codec_frame, codec, payload = self._split_codec(frames)
+
+        try:
+            data = codec.decode(payload)
+        except Exception:
+            # Unknown codecs and invalid requests do not access the exposed objects
+            self._finish_request(envelope, self._handle_message(frames), stats)
+            return
+
+        snapshot = self._snapshot
+
+        if identity not in self._queued_clients and self._is_snapshot_read(data, snapshot):
+            self._snapshot_reads += 1
+            self._finish_request(
+                envelope,
+                self._encode_reply(codec_frame, codec, self._handle_request(data, snapshot)),
+                stats)
+        else:
+            self._queued_clients[identity] = self._queued_clients.get(identity, 0) + 1
+            self._pending.append((identity, envelope, codec_frame, codec, data, stats))
+
+    def _send_completed(self):
+        while self._completed:
+            identity, envelope, reply, stats = self._completed.popleft()
+
+            self._queued_clients[identity] -= 1
+
+            if not self._queued_clients[identity]:
+                del self._queued_clients[identity]
+
+            self._finish_request(envelope, reply, stats)
+
+    def _finish_request(self, envelope, reply, stats):
+        super(ThreadedControlServer, self)._finish_request(envelope, reply, stats)
+
+        self._processed_requests += 1
+
+    @staticmethod
+    def _calls(data):
+        return data if isinstance(data, list) else [data]
+
+    def _is_snapshot_read(self, data, snapshot):
+        calls = self._calls(data)
+
+        try:
+            return bool(calls) and all(
+                isinstance(call, dict) and call.get('method') in snapshot for call in calls)
+        except TypeError:
+            # The method name is not hashable
+            return False
+
+    def _track_getters(self, data):
+        for call in self._calls(data):
+            method = call.get('method') if isinstance(call, dict) else None
+
+            if isinstance(method, string_types) and method.endswith(':get') \
+                    and method in self._exposed_object:
+                self._tracked_getters.add(method)
+
+    def _update_snapshot(self):
+        snapshot = {}
+
+        for name in self._tracked_getters:
+            try:
+                value = copy.copy(self._exposed_object[name]())
+            except Exception:
+                # Reads that fail are queued, so that the client receives the error
+                continue
+
+            snapshot[name] = functools.partial(_snapshot_value, value)
+
+        self._snapshot = snapshot
+
+    def process(self, time_budget=None):
+        """
+        Executes the queued requests until none are left or the time budget is exhausted,
+        at least one request is executed if there is one. Afterwards, the snapshot of property
+        values is updated and the background thread sends the replies.
+
+        If the server has not been started yet (via :meth:`start_server`), a RuntimeError
+        is raised.
+
+        :param time_budget: Maximum processing time in seconds, ``time_budget``-member if None.
+        :return: Number of executed requests.
+        """
+        if self._socket is None:
+            raise RuntimeError('The server has not been started yet, use start_server to do so.')
+
+        if time_budget is None:
+            time_budget = self.time_budget
+
+        start = default_timer()
+        processed = 0
+
+        while self._pending:
+            identity, envelope, codec_frame, codec, data, stats = self._pending.popleft()
+
+            reply = self._encode_reply(codec_frame, codec, self._handle_request(data))
+            self._track_getters(data)
+
+            self._completed.append((identity, envelope, reply, stats))
+            processed += 1
+
+            if default_timer() - start >= time_budget:
+                break
+
+        self._update_snapshot()
+
+        if processed:
+            self._wake_thread()
+
+        self._last_processed = processed
+
+        return processed
+
+
+class PropertyPublisher(object):
+    """
+    This class publishes the values of properties via a ZMQ XPUB-socket, so that monitoring
+    tools do not have to poll them via :class:`ControlServer`.
+
+    The properties of each object in ``object_map`` are published under topics of the form
+    ``name.property``, for example ``device.speed``. Clients subscribe to topics with a SUB
+    socket (see :class:`~plankton.core.control_client.PropertySubscriber`), ZMQ's prefix
+    matching applies, so subscribing to ``device.`` delivers all properties of the device.
+    Filtering happens on the socket level, so only subscribed values are sent. The publisher
+    keeps track of the subscriptions and only reads properties that are subscribed.
+
+    Each message consists of two frames, the topic and the JSON-encoded value. A value
+    is published when it has changed, but at most once every ``interval`` seconds. When a new
+    subscription arrives, the current values of the matching properties are published
+    immediately.
+
+    Like :class:`ControlServer`, the publisher does not run its own loop, :meth:`process`
+    has to be called regularly.
+
+    If an object in ``object_map`` is an :class:`ExposedObject`, the properties it exposes
+    are published, so the same members can be selected as for the control server.
+
+    :param object_map: Dictionary with name: object-pairs, objects may be ExposedObjects.
+    :param connection_string: ZMQ endpoint or string with host:port pair for binding the
+                              publisher, see :func:`get_endpoint`.
+    :param interval: Minimum time in seconds between two updates of the same property.
+    """
+
+    def __init__(self, object_map, connection_string, interval=0.1):
+        super(PropertyPublisher, self).__init__()
+
+        self.endpoint = get_endpoint(connection_string)
+        self.interval = interval
+
+        self._getters = {}
+
+        for name, obj in object_map.items():
+            for member, getter in self._data_getters(obj).items():
+                self._getters[name + '.' + member] = getter
+
+        self._socket = None
+
+        self._subscriptions = set()
+        self._subscribed_topics = set()
+        self._initial_topics = set()
+
+        self._last_values = {}
+        self._next_update = {}
+
+        self._published_updates = 0
+
+    @staticmethod
+    def _data_getters(obj):
+        if isinstance(obj, ExposedObject):
+            return {function[:-len(':get')]: obj[function]
+                    for function in obj if function.endswith(':get')}
+
+        return {member: functools.partial(getattr, obj, member)
+                for member in _public_members(obj) if not _is_method(obj, member)}
+
+    @property
+    def topics(self):
+        """
+        List of all topics that can be subscribed.
+        """
+        return sorted(self._getters)
+
+    @property
+    def statistics(self):
+        """
+        Dictionary with the number of active subscriptions, the number of subscribed topics
+        and the number of published updates.
+        """
+        return {'subscriptions': len(self._subscriptions),
+                'subscribed_topics': len(self._subscribed_topics),
+                'published_updates': self._published_updates}
+
+    @property
+    def is_running(self):
+        """
+        This property is ``True`` if the publisher is running.
+        """
+        return self._socket is not None
+
+    def start_server(self):
+        """
+        Binds the publisher to the configured endpoint.
+        """
+        if self._socket is None:
+            context = zmq.Context.instance()
+            self._socket = context.socket(zmq.XPUB)
+            self._socket.setsockopt(zmq.XPUB_VERBOSE, 1)
+            self._socket.bind(self.endpoint)
+
+    def stop_server(self):
+        """
+        Closes the socket and forgets all subscriptions. The publisher can be started again
+        with :meth:`start_server`, clients then have to subscribe again.
+        """
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+
+            self._subscriptions.clear()
+            self._subscribed_topics.clear()
+            self._initial_topics.clear()
+            self._last_values.clear()
+            self._next_update.clear()
+
+    def _receive_subscriptions(self):
+        # Subscription messages start with 1 (subscribe) or 0 (unsubscribe), then the topic
+        changed = False
+
+        while True:
+            try:
+                message = self._socket.recv(flags=zmq.NOBLOCK)
+            except zmq.Again:
+                break
+
+            if not message:
+                continue
+
+            prefix = message[1:].decode('utf-8', 'replace')
+
+            if message[0:1] == b'\x01':
+                self._subscriptions.add(prefix)
+                self._initial_topics.update(
+                    topic for topic in self._getters if topic.startswith(prefix))
+            else:
+                self._subscriptions.discard(prefix)
+
+            changed = True
+
+        if changed:
+            self._subscribed_topics = {
+                topic for topic in self._getters
+                if any(topic.startswith(prefix) for prefix in self._subscriptions)}
+
+    def _has_changed(self, topic, value):
+        if topic not in self._last_values:
+            return True
+
+        try:
+            return bool(value != self._last_values[topic])
+        except ValueError:
+            # Arrays can not be compared to a single truth value
+            return True
+
+    def process(self):
+        """
+        Processes new subscriptions and publishes the values of subscribed properties that
+        have changed and are due.
+
+        If the publisher has not been started yet (via :meth:`start_server`), a RuntimeError
+        is raised.
+
+        :return: Number of published updates.
+        """
+        if self._socket is None:
+            raise RuntimeError(
+                'The publisher has not been started yet, use start_server to do so.')
+
+        self._receive_subscriptions()
+
+        now = default_timer()
+        initial, self._initial_topics = self._initial_topics, set()
+        published = 0
+
+        for topic in self._subscribed_topics | initial:
+            if topic not in initial and now < self._next_update.get(topic, 0.0):
+                continue
+
+            try:
+                value = self._getters[topic]()
+
+                if topic not in initial and not self._has_changed(topic, value):
+                    continue
+
+                payload = codecs['json'].encode(value)
+            except Exception:
+                # Values that can not be read or encoded are skipped
+                continue
+
+            self._socket.send_multipart([topic.encode('utf-8')] + payload)
+
+            # Values that are modified in place would never compare as changed otherwise
+            self._last_values[topic] = copy.copy(value)
+            self._next_update[topic] = now + self.interval
+            published += 1
+
+        self._published_updates += published
+
+        return published
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+This module provides noise generators that can be used to make readback values of simulated
+devices more realistic, for example a rotation speed that jitters slightly around its setpoint.
+
+Generating random numbers one by one is comparatively expensive when values are polled at a
+high rate, so the generators in this module fill a preallocated buffer in bulk and serve
+samples from that buffer. If NumPy is available, the buffer is filled using vectorized
+operations, otherwise the standard library's :mod:`random`-module is used.
+
+A generator is simply called to obtain the next sample:
+
+.. sourcecode:: Python
+
+    noise = GaussianNoise(sigma=0.1)
+    value = 10.0 + noise()
+
+Noise can be attached declaratively to device attributes via :class:`Noisy` or to adapter
+definitions via the ``noise``-parameter of :class:`~plankton.adapters.epics.PV` and
+:class:`~plankton.adapters.stream.Cmd`.
+"""
+
+from __future__ import absolute_import
+
+import math
+import random
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Largest exponent for which powers of the inverse correlation coefficient are computed
+# in one block when generating correlated noise with NumPy. e^30 is about 1e13, which
+# leaves enough precision in double precision floating point numbers.
+_MAX_EXPONENT = 30.0
+
+
+class NoiseGenerator(object):
+    """
+    Base class for noise generators. Samples are served from a preallocated buffer of
+    ``buffer_size`` elements, which is refilled in one go when it is exhausted.
+
+    Sub-classes must implement :meth:`_fill_vectorized`, which is used when NumPy is
+    available, and :meth:`_fill_sequential`, which is used otherwise.
+
+    :param buffer_size: Number of samples that are generated at once.
+    :param seed: Seed for the random number generator, useful for reproducible simulations.
+    """
+
+    def __init__(self, buffer_size=4096, seed=None):
+        super(NoiseGenerator, self).__init__()
+
+        if buffer_size < 1:
+            raise ValueError('The buffer size must be at least 1.')
+
+        self._buffer = array('d', [0.0]) * buffer_size
+        self._index = buffer_size
+
+        if numpy is not None:
+            self._random = numpy.random.RandomState(seed)
+            self._view = numpy.frombuffer(self._buffer, dtype=numpy.float64)
+        else:
+            self._random = random.Random(seed)
+            self._view = None
+
+    def __call__(self):
+        if self._index == len(self._buffer):
+            self._fill()
+
+        value = self._buffer[self._index]
+        self._index += 1
+
+        return value
+
+    def _fill(self):
+        if self._view is not None:
+            self._fill_vectorized(self._view)
+        else:
+            self._fill_sequential(self._buffer)
+
+        self._index = 0
+
+    def _fill_vectorized(self, samples):
+        """
+        Implement this method to fill the supplied NumPy array (a view of the internal buffer)
+        with new samples. The array must be modified in place.
+
+        :param samples: NumPy array to fill.
+        """
+        raise NotImplementedError('_fill_vectorized must be implemented in a NoiseGenerator.')
+
+    def _fill_sequential(self, samples):
+        """
+        Implement this method to fill the supplied ``array.array`` with new samples.
+
+        :param samples: Array to fill.
+        """
+        raise NotImplementedError('_fill_sequential must be implemented in a NoiseGenerator.')
+
+
+class UniformNoise(NoiseGenerator):
+    """
+    Noise that is uniformly distributed in the interval [-amplitude, amplitude].
+
+    :param amplitude: Maximum absolute value of the samples.
+    :param buffer_size: Number of samples that are generated at once.
+    :param seed: Seed for the random number generator.
+    """
+
+    def __init__(self, amplitude=1.0, buffer_size=4096, seed=None):
+        super(UniformNoise, self).__init__(buffer_size, seed)
+
+        self._amplitude = amplitude
+
+    def _fill_vectorized(self, samples):
+        samples[:] = self._random.uniform(-self._amplitude, self._amplitude, len(samples))
+
+    def _fill_sequential(self, samples):
+        for i in range(len(samples)):
+            samples[i] = self._random.uniform(-self._amplitude, self._amplitude)
+
+
+class GaussianNoise(NoiseGenerator):
+    """
+    Normally distributed noise with standard deviation ``sigma`` around ``mean``.
+
+    Real sensors rarely produce completely independent values, so consecutive samples
+    can be correlated. The ``correlation`` parameter is the coefficient of a first order
+    autoregressive process, 0 means that samples are independent, values closer to 1 make
+    the noise vary more slowly. The standard deviation of the samples is ``sigma`` regardless
+    of the correlation.
+
+    In addition, a slow drift can be superimposed. It is modelled as a random walk, where
+    ``drift`` is the standard deviation of the change between two consecutive samples. Note
+    that the drift is not bounded, it should thus be small compared to ``sigma``.
+
+    :param sigma: Standard deviation of the noise.
+    :param mean: Mean value of the noise.
+    :param correlation: Correlation between consecutive samples, must be in [0, 1).
+    :param drift: Standard deviation of the random walk per sample.
+    :param buffer_size: Number of samples that are generated at once.
+    :param seed: Seed for the random number generator.
+    """
+
+    def __init__(self, sigma=1.0, mean=0.0, correlation=0.0, drift=0.0,
+                 buffer_size=4096, seed=None):
+        super(GaussianNoise, self).__init__(buffer_size, seed)
+
+        if not 0.0 <= correlation < 1.0:
+            raise ValueError('Correlation must be in the interval [0, 1).')
+
+        self._sigma = sigma
+        self._mean = mean
+        self._correlation = correlation
+        self._drift = drift
+
+        # Last value of the correlated process and accumulated drift, these
+        # are carried over between buffer refills so that there are no jumps.
+        self._last = 0.0
+        self._offset = 0.0
+
+    def _fill_vectorized(self, samples):
+        count = len(samples)
+        rho = self._correlation
+
+        samples[:] = self._random.standard_normal(count)
+        samples *= self._sigma * math.sqrt(1.0 - rho * rho)
+
+        if rho > 0.0:
+            self._correlate(samples)
+
+        if self._drift:
+            offsets = numpy.cumsum(self._random.standard_normal(count))
+            offsets *= self._drift
+            offsets += self._offset
+            self._offset = offsets[-1]
+
+            samples += offsets
+
+        samples += self._mean
+
+    def _correlate(self, samples):
+        # Applies x[n] = rho * x[n - 1] + e[n] in place. The closed form of the recursion,
+        # x[n] = rho^n * (rho * x[-1] + sum(e[k] / rho^k)), is evaluated in blocks that are
+        # small enough for rho^-k not to lose precision.
+        rho = self._correlation
+        block = max(1, int(_MAX_EXPONENT / -math.log(rho)))
+        powers = rho ** numpy.arange(min(block, len(samples)))
+
+        for start in range(0, len(samples), block):
+            chunk = samples[start:start + block]
+            chunk_powers = powers[:len(chunk)]
+
+            chunk /= chunk_powers
+            numpy.cumsum(chunk, out=chunk)
+            chunk += rho * self._last
+            chunk *= chunk_powers
+
+            self._last = chunk[-1]
+
+    def _fill_sequential(self, samples):
+        rho = self._correlation
+        scale = self._sigma * math.sqrt(1.0 - rho * rho)
+        gauss = self._random.gauss
+
+        for i in range(len(samples)):
+            self._last = rho * self._last + scale * gauss(0.0, 1.0)
+
+            if self._drift:
+                self._offset += gauss(0.0, self._drift)
+
+            samples[i] = self._mean + self._last + self._offset
+
+
+class Noisy(object):
+    """
+    This descriptor can be used to declare a read-only attribute that returns the value of
+    another attribute with noise added to it. The original attribute remains unaffected, so
+    the device simulation can keep working with exact values:
+
+    .. sourcecode:: Python
+
+        class SimulatedChopper(StateMachineDevice):
+            speed_readback = Noisy('speed', GaussianNoise(sigma=0.05, correlation=0.9))
+
+    Note that the generator is shared between all instances of the class.
+
+    :param attribute: Name of the attribute the noise is added to.
+    :param noise: Noise generator, any callable returning a number is accepted.
+    """
+
+    def __init__(self, attribute, noise):
+        self._attribute = attribute
+        self._noise = noise
+
+        self.__doc__ = 'Value of \'{}\' with noise added.'.format(attribute)
+
+    def __get__(self, instance, type=None):
+        if instance is None:
+            return self
+
+        return getattr(instance, self._attribute) + self._noise()
+
+    def __set__(self, instance, value):
+        raise AttributeError('Can not set noisy attribute, set \'{}\' instead.'.format(
+            self._attribute))
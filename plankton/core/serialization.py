@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+This module contains the codecs that can be used to serialize the messages exchanged between
+:class:`~plankton.core.control_server.ControlServer` and
+:class:`~plankton.core.control_client.ControlClient`.
+
+JSON is the default, it is human readable and works with any JSON-RPC client. For large
+payloads, such as recorded time series or array-valued device attributes, two binary codecs
+are available:
+
+- ``binary`` encodes the message structure as JSON, but sends NumPy arrays and
+  ``array.array`` objects as raw buffers in separate ZMQ frames, so they are neither converted
+  to lists nor copied into a string. It does not require any additional packages.
+- ``msgpack`` uses `MessagePack <http://msgpack.org>`__, NumPy arrays are stored as raw buffers
+  in an extension type. It is only available if the msgpack package is installed.
+
+Each codec encodes a message into a list of frames and decodes it from such a list.
+"""
+
+from __future__ import absolute_import
+
+import json
+from array import array
+
+from jsonrpc.utils import DatetimeDecimalEncoder
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JsonCodec(object):
+    """
+    Encodes messages as JSON in a single frame. Arrays are converted to lists.
+    """
+    name = 'json'
+
+    class _Encoder(DatetimeDecimalEncoder):
+        def default(self, o):
+            if isinstance(o, array) or (numpy is not None and isinstance(o, numpy.ndarray)):
+                return o.tolist()
+
+            return super(JsonCodec._Encoder, self).default(o)
+
+    def encode(self, message):
+        return [json.dumps(message, cls=self._Encoder).encode('utf-8')]
+
+    def decode(self, frames):
+        return json.loads(frames[0].decode('utf-8'))
+
+
+class BinaryCodec(object):
+    """
+    Encodes the structure of messages as JSON in the first frame. NumPy arrays and
+    ``array.array`` objects are replaced by references to the following frames, which contain
+    the raw data. On decoding, NumPy arrays are restored as read-only NumPy arrays and
+    ``array.array`` objects as ``array.array``. If NumPy is not available on the receiving
+    side, the raw data of NumPy arrays is returned as bytes.
+    """
+    name = 'binary'
+
+    def encode(self, message):
+        buffers = []
+
+        def store(o):
+            if isinstance(o, array):
+                buffers.append(memoryview(o))
+                return {'__array__': len(buffers), 'typecode': o.typecode}
+
+            if numpy is not None and isinstance(o, numpy.ndarray):
+                o = numpy.ascontiguousarray(o)
+                buffers.append(memoryview(o.reshape(-1).view(numpy.uint8)))
+                return {'__ndarray__': len(buffers), 'dtype': o.dtype.str, 'shape': o.shape}
+
+            return DatetimeDecimalEncoder().default(o)
+
+        return [json.dumps(message, default=store).encode('utf-8')] + buffers
+
+    def decode(self, frames):
+        def restore(o):
+            if '__array__' in o:
+                return array(str(o['typecode']), bytes(frames[o['__array__']]))
+
+            if '__ndarray__' in o:
+                data = frames[o['__ndarray__']]
+
+                if numpy is None:
+                    return bytes(data)
+
+                return numpy.frombuffer(data, dtype=o['dtype']).reshape(o['shape'])
+
+            return o
+
+        return json.loads(frames[0].decode('utf-8'), object_hook=restore)
+
+
+class MsgpackCodec(object):
+    """
+    Encodes messages with MessagePack in a single frame. NumPy arrays are stored in an
+    extension type that contains the type, shape and raw data of the array, ``array.array``
+    objects are converted to lists.
+    """
+    name = 'msgpack'
+
+    _NDARRAY = 1
+
+    def encode(self, message):
+        return [msgpack.packb(message, default=self._store, use_bin_type=True)]
+
+    def decode(self, frames):
+        return msgpack.unpackb(frames[0], ext_hook=self._restore, raw=False)
+
+    def _store(self, o):
+        if numpy is not None and isinstance(o, numpy.ndarray):
+            o = numpy.ascontiguousarray(o)
+            return msgpack.ExtType(self._NDARRAY, msgpack.packb(
+                [o.dtype.str, list(o.shape), o.tobytes()], use_bin_type=True))
+
+        if isinstance(o, array):
+            return o.tolist()
+
+        return DatetimeDecimalEncoder().default(o)
+
+    def _restore(self, code, data):
+        if code != self._NDARRAY or numpy is None:
+            return msgpack.ExtType(code, data)
+
+        dtype, shape, raw = msgpack.unpackb(data, raw=False)
+        return numpy.frombuffer(raw, dtype=dtype).reshape(shape)
+
+
+codecs = {codec.name: codec for codec in (JsonCodec(), BinaryCodec())}
+
+if msgpack is not None:
+    codecs[MsgpackCodec.name] = MsgpackCodec()
@@ -18,7 +18,7 @@
 # *********************************************************************
 
 """
-A :class:`~Simulation` combines a :mod:`Device <plankton.devices>` and its interface (derived from
+A :class:`~Simulation` combines a :mod:`Device <plankton.devices>` and its interfaces (derived from
 an :mod:`Adapter <plankton.adapters>`).
 """
 
@@ -26,7 +26,8 @@ from datetime import datetime
 from time import sleep
 
 from plankton.core.utils import seconds_since
-from plankton.core.control_server import ControlServer, ExposedObject
+from plankton.core.control_server import ControlServer, ThreadedControlServer, \
+    ExposedObject, PropertyPublisher
 
 
 class Simulation(object):
@@ -64,20 +65,46 @@ class Simulation(object):
 
     Finally, the simulation can be stopped entirely with the stop-method.
 
+    The device can be exposed via several adapters at once, for example via EPICS and
+    a TCP stream protocol, by passing a list of adapters. All adapters are processed
+    in each cycle, they share the time budget given by cycle_delay. Each adapter may
+    use an equal share of the time that is left when it is processed, so time that
+    is not used by one adapter is available to the adapters that follow it.
+
     All functionality except for the start-method can be made available to remote
     computers via a :class:`ControlServer`-instance. The way to expose device and simulation
     is to pass a 'host:port'-string as the control_server argument,
     which will construct the control server. Simulation will try to start the
-    control server using the start_server method.
+    control server using the start_server method. If the adapter defines
+    ``control_members``, these are exposed as well, under the name ``adapter``. If
+    there are several adapters, the protocol is appended to the name, for example
+    ``adapter_epics``.
+
+    If control_server_thread is True, a
+    :class:`~plankton.core.control_server.ThreadedControlServer` is used instead, which
+    answers requests in a background thread. Property reads are then answered immediately
+    from the values at the end of the last cycle, other requests are executed at the end of
+    the next cycle.
+
+    The values of device and simulation properties can additionally be published
+    via a :class:`~plankton.core.control_server.PropertyPublisher` by passing a
+    'host:port'-string as the publisher argument. Its topics are ``device.<property>`` and
+    ``simulation.<property>``, values are published at the end of each cycle.
 
     :param device: The simulated device.
-    :param adapter: Adapter which contains the simulated device.
+    :param adapter: Adapter which contains the simulated device or a list of adapters.
     :param control_server: 'host:port'-string to construct control server or None.
+    :param publisher: 'host:port'-string to construct a property publisher or None.
+    :param control_server_thread: Process control server requests in a background thread.
     """
 
-    def __init__(self, device, adapter, control_server=None):
+    # Members of the simulation that are not exposed via the control server and the publisher
+    _excluded_members = ('start', 'control_server')
+
+    def __init__(self, device, adapter, control_server=None, publisher=None,
+                 control_server_thread=False):
         self._device = device
-        self._adapter = adapter
+        self._adapters = list(adapter) if isinstance(adapter, (list, tuple)) else [adapter]
 
         self._speed = 1.0  # Multiplier for delta t
         self._cycle_delay = 0.1  # Target time between cycles
@@ -91,23 +118,44 @@ class Simulation(object):
         self._device_connected = True
         self._stop_commanded = False
 
+        self._control_server_thread = control_server_thread
+
         # Constructing the control server must be deferred until the end,
         # because the construction is not complete at this point
         self._control_server = None  # Just initialize to None and use property setter afterwards
         self.control_server = control_server
 
+        # The documentation does not change while the simulation is running, but is expensive
+        # to build, so it is not published.
+        self._publisher = None if publisher is None else PropertyPublisher(
+            {'device': self._device,
+             'simulation': ExposedObject(
+                 self, exclude=self._excluded_members + ('device_documentation',))},
+            publisher)
+
     def _create_control_server(self, control_server):
         if control_server is None:
             return None
 
-        return ControlServer(
-            {'device': self._device,
-             'simulation': ExposedObject(self, exclude=('start', 'control_server'))},
-            control_server)
+        exposed_objects = {
+            'device': self._device,
+            'simulation': ExposedObject(self, exclude=self._excluded_members)}
+
+        for adapter in self._adapters:
+            if adapter.control_members:
+                name = 'adapter' if len(self._adapters) == 1 else 'adapter_' + adapter.protocol
+
+                exposed_objects[name] = ExposedObject(adapter, members=adapter.control_members)
+
+        server_type = ThreadedControlServer if self._control_server_thread else ControlServer
+
+        return server_type(exposed_objects, control_server)
 
     def start(self):
         """
-        Starts the simulation.
+        Starts the simulation. When the simulation is stopped, the adapters, the control
+        server and the publisher are stopped as well, they are restarted if start is called
+        again.
         """
         self._running = True
         self._started = True
@@ -116,17 +164,31 @@ class Simulation(object):
         if self._control_server is not None:
             self._control_server.start_server()
 
-        self._adapter.start_server()
+        if self._publisher is not None:
+            self._publisher.start_server()
+
+        for adapter in self._adapters:
+            adapter.start_server()
 
         self._start_time = datetime.now()
 
         delta = 0.0
 
-        while not self._stop_commanded:
-            delta = self._process_cycle(delta)
+        try:
+            while not self._stop_commanded:
+                delta = self._process_cycle(delta)
+        finally:
+            for adapter in self._adapters:
+                adapter.stop_server()
 
-        self._running = False
-        self._started = False
+            if self._control_server is not None:
+                self._control_server.stop_server()
+
+            if self._publisher is not None:
+                self._publisher.stop_server()
+
+            self._running = False
+            self._started = False
 
     def _process_cycle(self, delta):
         """
@@ -144,6 +206,9 @@ class Simulation(object):
         if self._control_server:
             self._control_server.process()
 
+        if self._publisher:
+            self._publisher.process()
+
         delta = seconds_since(start)
 
         return delta
@@ -159,7 +224,7 @@ class Simulation(object):
         :param delta: Time delta passed to simulation.
         """
         if self._device_connected:
-            self._adapter.handle(self._cycle_delay)
+            self._process_adapters()
         else:
             sleep(self._cycle_delay)
 
@@ -170,6 +235,19 @@ class Simulation(object):
             self._cycles += 1
             self._runtime += delta_simulation
 
+    def _process_adapters(self):
+        """
+        Calls the handle-method of each adapter. Each adapter gets an equal share of the time
+        that is left in the cycle when it is processed.
+        """
+        start = datetime.now()
+        remaining = self._cycle_delay
+
+        for i, adapter in enumerate(self._adapters):
+            adapter.handle(remaining / (len(self._adapters) - i))
+
+            remaining = max(0.0, self._cycle_delay - seconds_since(start))
+
     @property
     def cycle_delay(self):
         """
@@ -320,6 +398,7 @@ class Simulation(object):
         """
         This property returns the dynamically created device interface documentation. With the
         information contained in the documentation it should be obvious to users how to operate
-        the exposed device via its native protocol.
+        the exposed device via its native protocol. If the device is exposed via several
+        adapters, the documentation of all adapters is returned.
         """
-        return self._adapter.documentation
+        return '\n\n'.join(adapter.documentation for adapter in self._adapters)
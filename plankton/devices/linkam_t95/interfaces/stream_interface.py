@@ -35,7 +35,7 @@ class LinkamT95StreamInterface(StreamAdapter):
     """
 
     commands = {
-        Cmd('get_status', '^T$'),
+        Cmd('get_status', '^T$', pure=True),
         Cmd('set_rate', '^R1([0-9]+)$'),
         Cmd('set_limit', '^L1([0-9]+)$'),
         Cmd('start', '^S$'),
@@ -56,6 +56,8 @@ class LinkamT95StreamInterface(StreamAdapter):
         """
 
         # "The first command sent must be a 'T' command" from T95 manual
+        # The command is still pure, because this write is idempotent: the device never
+        # leaves serial command mode, so skipping it for cached replies changes nothing.
         self._device.serial_command_mode = True
 
         Tarray = [0x80] * 10
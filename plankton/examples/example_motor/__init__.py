@@ -93,9 +93,9 @@ class ExampleMotorStreamInterface(StreamAdapter):
     it has to be stopped to receive a new target, otherwise an error is generated.
     """
     commands = {
-        Cmd('get_status', r'^S\?$'),
-        Cmd('get_position', r'^P\?$'),
-        Cmd('get_target', r'^T\?$'),
+        Cmd('get_status', r'^S\?$', pure=True),
+        Cmd('get_position', r'^P\?$', pure=True),
+        Cmd('get_target', r'^T\?$', pure=True),
         Cmd('set_target', r'^T=([-+]?[0-9]*\.?[0-9]+)$', argument_mappings=(float,)),
         Cmd('stop', r'^H$',
             return_mapping=lambda x: 'T={},P={}'.format(x[0], x[1])),
@@ -39,7 +39,7 @@ class VerySimpleInterface(StreamAdapter):
     After that, typing either of the commands and pressing enter sends them to the server.
     """
     commands = {
-        Cmd('get_param', '^P$'),
+        Cmd('get_param', '^P$', pure=True),
         Cmd('set_param', '^P=(.+)$'),
     }
 
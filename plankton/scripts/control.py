@@ -83,7 +83,8 @@ parser = argparse.ArgumentParser(
     description='A client to manipulate the simulated device remotely through a separate '
                 'channel. The simulation must be started with the --rpc-host option.')
 parser.add_argument('-r', '--rpc-host', default='127.0.0.1:10000',
-                    help='HOST:PORT string specifying control server to connect to.')
+                    help='HOST:PORT string or ZMQ endpoint (for example ipc:///tmp/plankton) '
+                         'specifying control server to connect to.')
 parser.add_argument('-n', '--print-none', action='store_true',
                     help='Print None return value.')
 parser.add_argument('object', nargs='?', default=None,
@@ -98,7 +99,8 @@ parser.add_argument('arguments', nargs='*',
 def control_simulation(argument_list=None):
     args = parser.parse_args(argument_list or sys.argv[1:])
 
-    remote = ControlClient(*args.rpc_host.split(':')).get_object_collection()
+    endpoint = args.rpc_host if '://' in args.rpc_host else 'tcp://' + args.rpc_host
+    remote = ControlClient(endpoint).get_object_collection()
 
     if not args.object:
         list_objects(remote)
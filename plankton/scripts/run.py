@@ -30,19 +30,29 @@ from plankton.core.simulation import Simulation
 from plankton.core.exceptions import PlanktonException
 
 parser = argparse.ArgumentParser(
-    description='Run a simulated device and expose it via a specified communication protocol.')
+    description='Run a simulated device and expose it via a specified communication protocol.',
+    epilog='To expose the device via several protocols, -p can be specified multiple times. '
+           'Adapter arguments can then be assigned to a protocol by preceding them with the '
+           'protocol name and a colon, for example: -p epics -p stream chopper -- '
+           'epics: -p SIM: stream: -p 9999')
 
 parser.add_argument('-r', '--rpc-host', default=None,
-                    help='HOST:PORT format string for exposing the device via '
-                         'JSON-RPC over ZMQ.')
+                    help='HOST:PORT format string or ZMQ endpoint (for example '
+                         'ipc:///tmp/plankton) for exposing the device via JSON-RPC over ZMQ.')
+parser.add_argument('--rpc-thread', action='store_true',
+                    help='Answer JSON-RPC requests in a background thread, property reads '
+                         'are answered from the values at the end of the last cycle.')
+parser.add_argument('--publish-host', default=None,
+                    help='HOST:PORT format string or ZMQ endpoint for publishing property '
+                         'values via ZMQ PUB/SUB.')
 parser.add_argument('-s', '--setup', default=None,
                     help='Name of the setup to load.')
 parser.add_argument('-l', '--list-protocols',
                     help='List available protocols for selected device.', action='store_true')
 parser.add_argument('-i', '--show-interface', action='store_true',
                     help='Show command interface of device interface.')
-parser.add_argument('-p', '--protocol', default=None,
-                    help='Communication protocol to expose devices.')
+parser.add_argument('-p', '--protocol', action='append', default=None,
+                    help='Communication protocol to expose devices, can be repeated.')
 parser.add_argument('-c', '--cycle-delay', type=float, default=0.1,
                     help='Approximate time to spend in each cycle of the simulation. '
                          '0 for maximum simulation rate.')
@@ -63,6 +73,31 @@ parser.add_argument('adapter_args', nargs='*',
                     help='Arguments for the adapter.')
 
 
+def split_adapter_arguments(adapter_args, protocols):
+    """
+    Distributes the adapter arguments among the supplied protocols. Arguments that follow
+    a protocol name with a colon (for example ``stream:``) are passed to the adapter of that
+    protocol only. Arguments before the first such marker are passed to all adapters.
+
+    :param adapter_args: List of adapter arguments.
+    :param protocols: List of protocol names.
+    :return: Dictionary with a list of arguments for each protocol.
+    """
+    markers = {protocol + ':': protocol for protocol in protocols if protocol}
+
+    common = []
+    arguments = {protocol: [] for protocol in protocols}
+    current = common
+
+    for argument in adapter_args:
+        if argument in markers:
+            current = arguments[markers[argument]]
+        else:
+            current.append(argument)
+
+    return {protocol: common + args for protocol, args in arguments.items()}
+
+
 def do_run_simulation(argument_list=None):
     arguments = parser.parse_args(argument_list or sys.argv[1:])
 
@@ -96,19 +131,24 @@ def do_run_simulation(argument_list=None):
         print('\n'.join(protocols))
         return
 
+    protocols = arguments.protocol or [None]
+    adapter_args = split_adapter_arguments(arguments.adapter_args, protocols)
+
     device = device_type(**parameters)
-    adapter = import_adapter(
-        arguments.device, arguments.protocol,
-        device_package=arguments.device_package)(device, arguments.adapter_args)
+    adapters = [
+        import_adapter(arguments.device, protocol, device_package=arguments.device_package)(
+            device, adapter_args[protocol]) for protocol in protocols]
 
     if arguments.show_interface:
-        print(adapter.documentation)
+        print('\n\n'.join(adapter.documentation for adapter in adapters))
         return
 
     simulation = Simulation(
         device=device,
-        adapter=adapter,
-        control_server=arguments.rpc_host)
+        adapter=adapters,
+        control_server=arguments.rpc_host,
+        publisher=arguments.publish_host,
+        control_server_thread=arguments.rpc_thread)
 
     simulation.cycle_delay = arguments.cycle_delay
     simulation.speed = arguments.speed
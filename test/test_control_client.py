@@ -17,12 +17,17 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # *********************************************************************
 
+import threading
 import unittest
 
+import zmq
+
 from mock import Mock, patch, call
 
 from plankton.core.control_client import ObjectProxy, ControlClient, \
-    ProtocolException, RemoteException
+    ProtocolException, RemoteException, PropertySubscriber, SocketPool
+from plankton.core.serialization import BinaryCodec
+from . import assertRaisesNothing
 
 
 class TestControlClient(unittest.TestCase):
@@ -35,11 +40,44 @@ class TestControlClient(unittest.TestCase):
         connection.json_rpc('foo')
 
         mock_socket.assert_has_calls(
-            [call(),
-             call().connect('tcp://127.0.0.1:10001'),
+            [call('tcp://127.0.0.1:10001'),
              call().send_json({'method': 'foo', 'params': (), 'jsonrpc': '2.0', 'id': '2'}),
              call().recv_json()])
 
+    @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_connect_to_endpoint(self, mock_socket):
+        ControlClient(host='ipc:///tmp/plankton-test')
+
+        mock_socket.assert_called_once_with('ipc:///tmp/plankton-test')
+
+    def test_close_returns_socket_to_pool(self):
+        pool = SocketPool()
+
+        with patch('plankton.core.control_client.socket_pool', pool):
+            with ControlClient('inproc://plankton-test-client') as client:
+                sock = client._socket
+
+            self.assertRaises(RuntimeError, client.json_rpc, 'foo')
+            assertRaisesNothing(self, client.close)
+
+            self.assertIs(ControlClient('inproc://plankton-test-client')._socket, sock)
+
+        pool.clear()
+
+    def test_interrupted_socket_is_not_reused(self):
+        pool = SocketPool()
+
+        with patch('plankton.core.control_client.socket_pool', pool):
+            client = ControlClient('inproc://plankton-test-client')
+            sock = client._socket
+
+            with patch.object(client, '_exchange', side_effect=KeyboardInterrupt):
+                self.assertRaises(KeyboardInterrupt, client.json_rpc, 'foo')
+
+            client.close()
+
+        self.assertTrue(sock.closed)
+
     @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
     def test_get_remote_object_works(self, mock_socket):
         client = ControlClient(host='127.0.0.1', port='10001')
@@ -89,6 +127,189 @@ class TestControlClient(unittest.TestCase):
                  call('obj1'),
                  call('obj2')])
 
+    @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_api_is_cached(self, mock_socket):
+        client = ControlClient(host='127.0.0.1', port='10001')
+
+        with patch.object(client, 'json_rpc') as json_rpc_mock:
+            json_rpc_mock.return_value = ({'id': 2, 'result': {'class': 'Test',
+                                                               'methods': ['a:get']}}, 2)
+
+            client.get_object('device')
+            client.get_object('device')
+
+            json_rpc_mock.assert_called_once_with('device:api')
+
+    @patch('uuid.uuid4')
+    @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_json_rpc_batch(self, mock_socket, mock_uuid):
+        mock_uuid.side_effect = ['1', '2']
+        mock_socket.return_value.recv_json.return_value = [
+            {'id': '2', 'result': 4}, {'id': '1', 'result': 3}]
+
+        client = ControlClient(host='127.0.0.1', port='10001')
+        responses = client.json_rpc_batch([('a:get', ()), ('b', (1,))])
+
+        mock_socket.return_value.send_json.assert_called_once_with(
+            [{'method': 'a:get', 'params': (), 'jsonrpc': '2.0', 'id': '1'},
+             {'method': 'b', 'params': (1,), 'jsonrpc': '2.0', 'id': '2'}])
+
+        self.assertEqual(responses, [{'id': '1', 'result': 3}, {'id': '2', 'result': 4}])
+
+    @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_batch(self, mock_socket):
+        client = ControlClient(host='127.0.0.1', port='10001')
+        client._api_cache['device'] = {'class': 'Test', 'methods': ['a:get', 'a:set', 'b']}
+
+        with patch.object(client, 'json_rpc_batch') as json_rpc_batch_mock:
+            json_rpc_batch_mock.return_value = [
+                {'result': 3}, {'result': None},
+                {'error': {'data': {'type': 'ValueError', 'message': 'Some message'}}}]
+
+            with client.batch() as batch:
+                a = batch.device.a
+                batch.device.a = 4
+                b = batch.device.b(2)
+
+                self.assertFalse(a.done())
+                self.assertRaises(RuntimeError, a.result)
+
+            json_rpc_batch_mock.assert_called_once_with(
+                [('device.a:get', ()), ('device.a:set', (4,)), ('device.b', (2,))])
+
+        self.assertTrue(a.done())
+        self.assertEqual(a.result(), 3)
+        self.assertRaises(ValueError, b.result)
+
+    @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_batch_is_not_sent_on_exception(self, mock_socket):
+        client = ControlClient(host='127.0.0.1', port='10001')
+
+        with patch.object(client, 'json_rpc_batch') as json_rpc_batch_mock:
+            try:
+                with client.batch() as batch:
+                    batch.call('a:get')
+                    raise RuntimeError()
+            except RuntimeError:
+                pass
+
+            with client.batch():
+                pass
+
+            json_rpc_batch_mock.assert_not_called()
+
+    @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_codec(self, mock_socket):
+        codec = BinaryCodec()
+        mock_socket.return_value.recv_multipart.return_value = [b'binary'] + codec.encode(
+            {'id': '1', 'result': 3})
+
+        client = ControlClient(host='127.0.0.1', port='10001', codec='binary')
+        response, _ = client.json_rpc('a:get')
+
+        self.assertEqual(response['result'], 3)
+        self.assertEqual(client.codec, 'binary')
+
+        frames = mock_socket.return_value.send_multipart.call_args[0][0]
+        self.assertEqual(frames[0], b'binary')
+        self.assertEqual(codec.decode(frames[1:])['method'], 'a:get')
+
+    @patch('plankton.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_codec_falls_back_to_json(self, mock_socket):
+        mock_socket.return_value.recv_multipart.return_value = [
+            b'json', b'{"error": {"message": "Unsupported codec", "code": -32001}}']
+        mock_socket.return_value.recv_json.return_value = {'id': '1', 'result': 3}
+
+        client = ControlClient(host='127.0.0.1', port='10001', codec='binary')
+        response, _ = client.json_rpc('a:get')
+
+        self.assertEqual(response['result'], 3)
+        self.assertEqual(client.codec, 'json')
+
+    def test_unknown_codec_raises(self):
+        self.assertRaises(ValueError, ControlClient, codec='unknown')
+
+
+class TestSocketPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = SocketPool(max_idle=2)
+
+    def tearDown(self):
+        self.pool.clear()
+
+    def test_sockets_are_reused_per_endpoint(self):
+        a = self.pool.acquire('inproc://plankton-test-a')
+        b = self.pool.acquire('inproc://plankton-test-a')
+        self.assertIsNot(a, b)
+
+        self.pool.release('inproc://plankton-test-a', a)
+
+        self.assertIsNot(self.pool.acquire('inproc://plankton-test-b'), a)
+        self.assertIs(self.pool.acquire('inproc://plankton-test-a'), a)
+
+    def test_excess_and_unusable_sockets_are_closed(self):
+        sockets = [self.pool.acquire('inproc://plankton-test') for _ in range(4)]
+
+        self.pool.release('inproc://plankton-test', sockets[0], reusable=False)
+
+        for sock in sockets[1:]:
+            self.pool.release('inproc://plankton-test', sock)
+
+        self.assertEqual([sock.closed for sock in sockets], [True, False, False, True])
+
+    def test_concurrent_checkout(self):
+        pool = SocketPool(max_idle=4)
+        acquired = []
+        in_use = set()
+
+        def acquire():
+            for _ in range(20):
+                sock = pool.acquire('inproc://plankton-test')
+                self.assertNotIn(sock, in_use)
+                in_use.add(sock)
+                acquired.append(sock)
+
+                in_use.discard(sock)
+                pool.release('inproc://plankton-test', sock)
+
+        threads = [threading.Thread(target=acquire) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        pool.clear()
+
+        self.assertEqual(len(acquired), 80)
+        self.assertLessEqual(len(set(acquired)), 4)
+
+
+class TestPropertySubscriber(unittest.TestCase):
+    @patch('zmq.Context')
+    def test_subscribe_and_receive(self, mock_context):
+        mock_socket = mock_context.instance.return_value.socket.return_value
+        mock_socket.recv_multipart.return_value = [b'device.speed', b'4.5']
+
+        subscriber = PropertySubscriber('127.0.0.1', '10001')
+        subscriber.subscribe('device.speed')
+
+        mock_socket.connect.assert_called_once_with('tcp://127.0.0.1:10001')
+        mock_socket.setsockopt.assert_called_once_with(zmq.SUBSCRIBE, b'device.speed')
+
+        self.assertEqual(subscriber.receive(), ('device.speed', 4.5))
+
+    @patch('zmq.Context')
+    def test_receive_timeout(self, mock_context):
+        mock_socket = mock_context.instance.return_value.socket.return_value
+        mock_socket.poll.return_value = 0
+
+        subscriber = PropertySubscriber('127.0.0.1', '10001')
+
+        self.assertIsNone(subscriber.receive(0.1))
+        mock_socket.recv_multipart.assert_not_called()
+
 
 class TestObjectProxy(unittest.TestCase):
     def test_init_adds_members(self):
@@ -17,17 +17,25 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # *********************************************************************
 
+import json
+import time
 import unittest
+from array import array
 
 from mock import Mock, patch, call
 import zmq
 import socket
 
-from plankton.core.control_server import ExposedObject, ExposedObjectCollection, ControlServer
+from plankton.core.control_server import ExposedObject, ExposedObjectCollection, ControlServer, \
+    ThreadedControlServer, PropertyPublisher
 from plankton.core.exceptions import PlanktonException
+from plankton.core.serialization import BinaryCodec
 from . import assertRaisesNothing
 
 
+REQUEST = b'{"method": "a:get", "params": [], "jsonrpc": "2.0", "id": 1}'
+
+
 class TestObject(object):
     def __init__(self):
         self.a = 10
@@ -37,6 +45,23 @@ class TestObject(object):
         self.setTest = Mock()
 
 
+class ExpensiveObject(object):
+    def __init__(self):
+        self.reads = 0
+
+    @property
+    def expensive(self):
+        self.reads += 1
+        return 42
+
+    @expensive.setter
+    def expensive(self, value):
+        pass
+
+    def method(self):
+        pass
+
+
 class TestRPCObject(unittest.TestCase):
     def test_all_methods_exposed(self):
         rpc_object = ExposedObject(TestObject())
@@ -109,6 +134,43 @@ class TestRPCObject(unittest.TestCase):
 
         obj.getTest.assert_called_with(45, 56)
 
+    def test_property_getters_are_not_invoked(self):
+        obj = ExpensiveObject()
+        rpc_object = ExposedObject(obj)
+
+        self.assertEqual(obj.reads, 0)
+        self.assertEqual(set(rpc_object), {':api', 'expensive:get', 'expensive:set',
+                                           'reads:get', 'reads:set', 'method'})
+        self.assertEqual(set(rpc_object.get_api()['methods']), set(rpc_object))
+        self.assertEqual(obj.reads, 0)
+
+        self.assertEqual(rpc_object['expensive:get'](), 42)
+        self.assertEqual(obj.reads, 1)
+
+    def test_class_members_are_cached(self):
+        ExposedObject(ExpensiveObject())
+
+        with patch('inspect.getmro') as getmro_mock:
+            ExposedObject(ExpensiveObject())
+
+        getmro_mock.assert_not_called()
+
+    def test_instance_attributes_are_classified(self):
+        obj = ExpensiveObject()
+        obj.method = 4
+        obj.callback = Mock()
+
+        rpc_object = ExposedObject(obj)
+
+        self.assertIn('method:get', rpc_object)
+        self.assertIn('callback', rpc_object)
+
+    def test_functions_are_created_once(self):
+        rpc_object = ExposedObject(TestObject())
+
+        self.assertIs(rpc_object['a:get'], rpc_object['a:get'])
+        self.assertIs(rpc_object['getTest'], rpc_object['getTest'])
+
     def test_get_api(self):
         obj = TestObject()
         rpc_object = ExposedObject(obj, ['a'])
@@ -175,8 +237,37 @@ class TestControlServer(unittest.TestCase):
         cs = ControlServer(None, connection_string='127.0.0.1:10001')
         cs.start_server()
 
-        mock_context.assert_has_calls([call(), call().socket(zmq.REP),
-                                       call().socket().bind('tcp://127.0.0.1:10001')])
+        mock_context.assert_has_calls(
+            [call.instance(), call.instance().socket(zmq.ROUTER),
+             call.instance().socket().setsockopt(zmq.ROUTER_MANDATORY, 1),
+             call.instance().socket().bind('tcp://127.0.0.1:10001')])
+
+    @patch('zmq.Context')
+    def test_ipc_endpoint(self, mock_context):
+        server = ControlServer(None, connection_string='ipc:///tmp/plankton-test')
+        server.start_server()
+
+        mock_context.instance().socket().bind.assert_called_once_with('ipc:///tmp/plankton-test')
+
+    def test_inproc_endpoint(self):
+        server = ControlServer(ExposedObject(TestObject()), 'inproc://plankton-test-control')
+        server.start_server()
+
+        client = zmq.Context.instance().socket(zmq.REQ)
+        client.connect('inproc://plankton-test-control')
+
+        try:
+            client.send(REQUEST)
+            server.process()
+
+            self.assertTrue(client.poll(2000))
+            self.assertEqual(json.loads(client.recv().decode('utf-8'))['result'], 10)
+        finally:
+            client.close(linger=0)
+            server._socket.close(linger=0)
+
+    def test_unsupported_transport_raises_PlanktonException(self):
+        self.assertRaises(PlanktonException, ControlServer, None, 'udp://127.0.0.1:10000')
 
     @patch('zmq.Context')
     def test_server_can_only_be_started_once(self, mock_context):
@@ -184,8 +275,8 @@ class TestControlServer(unittest.TestCase):
         server.start_server()
         server.start_server()
 
-        mock_context.assert_has_calls([call(), call().socket(zmq.REP),
-                                       call().socket().bind('tcp://127.0.0.1:10000')])
+        mock_context.instance().socket.assert_called_once_with(zmq.ROUTER)
+        mock_context.instance().socket().bind.assert_called_once_with('tcp://127.0.0.1:10000')
 
     def test_process_raises_if_not_started(self):
         server = ControlServer(None, connection_string='127.0.0.1:10000')
@@ -194,13 +285,181 @@ class TestControlServer(unittest.TestCase):
 
     def test_process_does_not_block(self):
         mock_socket = Mock()
-        mock_socket.recv_unicode.side_effect = zmq.Again()
+        mock_socket.recv_multipart.side_effect = zmq.Again()
 
         server = ControlServer(None, connection_string='127.0.0.1:10000')
         server._socket = mock_socket
         assertRaisesNothing(self, server.process)
 
-        mock_socket.recv_unicode.assert_has_calls([call(flags=zmq.NOBLOCK)])
+        mock_socket.recv_multipart.assert_has_calls([call(flags=zmq.NOBLOCK)])
+
+    def test_process_handles_waiting_and_follow_up_requests(self):
+        request = [b'client', b'', REQUEST]
+
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [
+            request, request, zmq.Again(), zmq.Again(), zmq.Again(), request, zmq.Again(),
+            zmq.Again()]
+        mock_socket.poll.side_effect = [zmq.POLLIN, 0]
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+
+        self.assertEqual(server.process(), 3)
+        self.assertEqual(mock_socket.send_multipart.call_count, 3)
+
+        envelope_and_reply = mock_socket.send_multipart.call_args[0][0]
+        self.assertEqual(envelope_and_reply[:2], [b'client', b''])
+        self.assertEqual(json.loads(envelope_and_reply[2].decode('utf-8'))['result'], 10)
+
+        self.assertEqual(server.statistics,
+                         {'processed_requests': 3, 'last_processed': 3, 'queue_depth': 0,
+                          'dropped_replies': 0, 'waiting_clients': 0})
+        self.assertEqual(server.client_statistics,
+                         {'636c69656e74': {'requests': 3, 'dropped_replies': 0, 'queued': 0}})
+
+    def test_process_stops_when_time_budget_is_exhausted(self):
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [
+            [b'a', b'', REQUEST], [b'a', b'', REQUEST], zmq.Again(), zmq.Again()]
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000',
+                               time_budget=0.0)
+        server._socket = mock_socket
+
+        self.assertEqual(server.process(), 1)
+        self.assertEqual(server.statistics['queue_depth'], 1)
+
+    def test_batch_request(self):
+        batch = b'[{"method": "a:get", "params": [], "jsonrpc": "2.0", "id": 1}, ' \
+                b'{"method": "b:get", "params": [], "jsonrpc": "2.0", "id": 2}]'
+
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [[b'a', b'', batch], zmq.Again(), zmq.Again()]
+        mock_socket.poll.return_value = 0
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+
+        self.assertEqual(server.process(), 1)
+
+        responses = json.loads(mock_socket.send_multipart.call_args[0][0][2].decode('utf-8'))
+        self.assertEqual({r['id']: r['result'] for r in responses}, {1: 10, 2: 20})
+
+    def test_reply_uses_codec_of_request(self):
+        codec = BinaryCodec()
+        request = {'method': 'a:get', 'params': [], 'jsonrpc': '2.0', 'id': 1}
+
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [
+            [b'a', b'', b'binary'] + codec.encode(request), zmq.Again(), zmq.Again()]
+        mock_socket.poll.return_value = 0
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+        server.process()
+
+        reply = mock_socket.send_multipart.call_args[0][0]
+        self.assertEqual(reply[:3], [b'a', b'', b'binary'])
+        self.assertEqual(codec.decode(reply[3:])['result'], 10)
+
+    def test_unknown_codec(self):
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [
+            [b'a', b'', b'unknown', REQUEST], zmq.Again(), zmq.Again()]
+        mock_socket.poll.return_value = 0
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+        server.process()
+
+        reply = mock_socket.send_multipart.call_args[0][0]
+        self.assertEqual(reply[:3], [b'a', b'', b'json'])
+        self.assertIn('error', json.loads(reply[3].decode('utf-8')))
+
+    def test_empty_requests_are_answered_with_parse_error(self):
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [
+            [b'a', b''], [b'b', b'', b''], zmq.Again(), zmq.Again(), zmq.Again()]
+        mock_socket.poll.return_value = 0
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+
+        self.assertEqual(server.process(), 2)
+
+        replies = [c[0][0] for c in mock_socket.send_multipart.call_args_list]
+        self.assertEqual([reply[:-1] for reply in replies], [[b'a', b''], [b'b', b'']])
+
+        for reply in replies:
+            self.assertEqual(json.loads(reply[-1].decode('utf-8'))['error']['code'], -32700)
+
+    def test_only_frame_after_identity_is_delimiter(self):
+        codec = BinaryCodec()
+        request = {'method': 'a:set', 'params': [array('d')], 'jsonrpc': '2.0', 'id': 1}
+        frames = [b'binary'] + codec.encode(request)
+        self.assertEqual(frames[-1], b'')
+
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [[b'a'] + frames, zmq.Again(), zmq.Again()]
+        mock_socket.poll.return_value = 0
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+        server.process()
+
+        self.assertEqual(mock_socket.send_multipart.call_args[0][0][:2], [b'a', b'binary'])
+
+    def test_clients_are_served_in_turn(self):
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [
+            [b'a', b'', REQUEST], [b'a', b'', REQUEST], [b'a', b'', REQUEST],
+            [b'b', b'', REQUEST], zmq.Again(), zmq.Again(), zmq.Again(), zmq.Again(),
+            zmq.Again()]
+        mock_socket.poll.return_value = 0
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+
+        self.assertEqual(server.process(), 4)
+        self.assertEqual([c[0][0][0] for c in mock_socket.send_multipart.call_args_list],
+                         [b'a', b'b', b'a', b'a'])
+
+    def test_replies_that_can_not_be_sent_are_dropped(self):
+        mock_socket = Mock()
+        mock_socket.recv_multipart.side_effect = [[b'a', b'', REQUEST], zmq.Again(), zmq.Again()]
+        mock_socket.send_multipart.side_effect = zmq.Again()
+        mock_socket.poll.return_value = 0
+
+        server = ControlServer(ExposedObject(TestObject()), connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+
+        assertRaisesNothing(self, server.process)
+        self.assertEqual(server.statistics['dropped_replies'], 1)
+
+    def test_replies_to_disconnected_clients_are_dropped(self):
+        server = ControlServer(ExposedObject(TestObject()), connection_string='tcp://127.0.0.1:*')
+        server.start_server()
+
+        try:
+            endpoint = server._socket.getsockopt(zmq.LAST_ENDPOINT).decode('ascii')
+            client = server._socket.context.socket(zmq.REQ)
+            client.connect(endpoint)
+
+            client.send(REQUEST)
+            self.assertTrue(server._socket.poll(2000))
+            client.close(linger=0)
+            time.sleep(0.1)
+
+            assertRaisesNothing(self, server.process)
+        finally:
+            server.stop_server()
+
+        self.assertEqual(server.statistics['processed_requests'], 1)
+        self.assertEqual(server.statistics['dropped_replies'], 1)
+
+        client_statistics = list(server.client_statistics.values())
+        self.assertEqual(client_statistics[0]['dropped_replies'], 1)
 
     def test_exposed_object_is_exposed_directly(self):
         mock_collection = Mock(spec=ExposedObject)
@@ -221,6 +480,16 @@ class TestControlServer(unittest.TestCase):
         server.start_server()
         self.assertTrue(server.is_running)
 
+    def test_stop_server(self):
+        mock_socket = Mock()
+
+        server = ControlServer(None, connection_string='127.0.0.1:10000')
+        server._socket = mock_socket
+        server.stop_server()
+
+        mock_socket.close.assert_called_once_with(linger=0)
+        self.assertFalse(server.is_running)
+
     @patch('plankton.core.control_server.socket.gethostbyname')
     def test_invalid_hostname_raises_PlanktonException(self, gethostbyname_mock):
         def raise_exception(self):
@@ -238,3 +507,276 @@ class TestControlServer(unittest.TestCase):
         assertRaisesNothing(
             self, ControlServer,
             object_map=None, connection_string='localhost:10000')
+
+
+class TestThreadedControlServer(unittest.TestCase):
+    def create_server(self, obj):
+        server = ThreadedControlServer(ExposedObject(obj), connection_string='127.0.0.1:10000')
+        server._socket = Mock()
+        server._wakeup_sender = Mock()
+
+        return server
+
+    def dispatch(self, server, identity, request):
+        server._dispatch(identity, [identity, b''], [request], server._client_stats(identity))
+
+    def replies(self, server):
+        return [json.loads(c[0][0][2].decode('utf-8'))
+                for c in server._socket.send_multipart.call_args_list]
+
+    def test_process_raises_if_not_started(self):
+        server = ThreadedControlServer(None, connection_string='127.0.0.1:10000')
+
+        self.assertRaises(RuntimeError, server.process)
+
+    def test_first_read_is_executed_at_cycle_boundary(self):
+        server = self.create_server(TestObject())
+
+        self.dispatch(server, b'a', REQUEST)
+        server._socket.send_multipart.assert_not_called()
+
+        self.assertEqual(server.process(), 1)
+        server._wakeup_sender.send.assert_called_once_with(b'', flags=zmq.NOBLOCK)
+
+        server._send_completed()
+        self.assertEqual(self.replies(server)[0]['result'], 10)
+        self.assertEqual(server.statistics['snapshot_size'], 1)
+
+    def test_reads_are_answered_from_snapshot(self):
+        obj = TestObject()
+        server = self.create_server(obj)
+
+        self.dispatch(server, b'a', REQUEST)
+        server.process()
+        server._send_completed()
+
+        obj.a = 30
+        self.dispatch(server, b'a', REQUEST)
+        self.assertEqual(self.replies(server)[1]['result'], 10)
+
+        server.process()
+        self.dispatch(server, b'a', REQUEST)
+        self.assertEqual(self.replies(server)[2]['result'], 30)
+
+        self.assertEqual(server.statistics['snapshot_reads'], 2)
+        self.assertEqual(server.statistics['processed_requests'], 3)
+
+    def test_writes_are_executed_at_cycle_boundary(self):
+        obj = TestObject()
+        server = self.create_server(obj)
+
+        self.dispatch(server, b'a', b'{"method": "a:set", "params": [5], "jsonrpc": "2.0", '
+                                    b'"id": 1}')
+        self.assertEqual(obj.a, 10)
+        self.assertEqual(server.statistics['pending_requests'], 1)
+
+        server.process()
+        self.assertEqual(obj.a, 5)
+
+    def test_requests_of_waiting_client_are_queued(self):
+        server = self.create_server(TestObject())
+
+        self.dispatch(server, b'a', REQUEST)
+        server.process()
+        server._send_completed()
+
+        self.dispatch(server, b'a', b'{"method": "a:set", "params": [5], "jsonrpc": "2.0", '
+                                    b'"id": 2}')
+        self.dispatch(server, b'a', REQUEST)
+        self.dispatch(server, b'b', REQUEST)
+
+        self.assertEqual(server.statistics['pending_requests'], 2)
+        self.assertEqual(self.replies(server)[-1]['result'], 10)
+
+        server.process()
+        server._send_completed()
+        self.assertEqual(self.replies(server)[-1]['result'], 5)
+
+    def test_batch_with_write_is_queued(self):
+        obj = TestObject()
+        server = self.create_server(obj)
+        server._snapshot = {'a:get': lambda: 10}
+
+        self.dispatch(server, b'a',
+                      b'[{"method": "a:get", "params": [], "jsonrpc": "2.0", "id": 1}, '
+                      b'{"method": "b:set", "params": [3], "jsonrpc": "2.0", "id": 2}]')
+
+        self.assertEqual(server.statistics['pending_requests'], 1)
+
+    def test_empty_request_is_answered_directly(self):
+        server = self.create_server(TestObject())
+
+        server._dispatch(b'a', [b'a'], [], server._client_stats(b'a'))
+
+        self.assertEqual(server._socket.send_multipart.call_args[0][0][0], b'a')
+        self.assertEqual(server.statistics['pending_requests'], 0)
+
+    def test_invalid_requests_are_answered_directly(self):
+        server = self.create_server(TestObject())
+
+        self.dispatch(server, b'a', b'{invalid')
+
+        self.assertIn('error', self.replies(server)[0])
+        self.assertEqual(server.statistics['pending_requests'], 0)
+
+    def test_real_sockets(self):
+        obj = TestObject()
+        server = ThreadedControlServer(ExposedObject(obj), connection_string='tcp://127.0.0.1:*')
+        server.start_server()
+
+        endpoint = server._socket.getsockopt(zmq.LAST_ENDPOINT).decode('ascii')
+        client = server._socket.context.socket(zmq.REQ)
+        client.connect(endpoint)
+
+        try:
+            client.send(REQUEST)
+            self.assertEqual(client.poll(200), 0)
+
+            server.process()
+            self.assertTrue(client.poll(2000))
+            self.assertEqual(json.loads(client.recv().decode('utf-8'))['result'], 10)
+
+            client.send(REQUEST)
+            self.assertTrue(client.poll(2000))
+            self.assertEqual(json.loads(client.recv().decode('utf-8'))['result'], 10)
+        finally:
+            client.close(linger=0)
+            server.stop_server(1.0)
+
+        self.assertFalse(server.is_running)
+
+    def test_queued_requests_are_rejected_on_stop(self):
+        server = ThreadedControlServer(ExposedObject(TestObject()),
+                                       connection_string='tcp://127.0.0.1:*')
+        server.start_server()
+
+        endpoint = server._socket.getsockopt(zmq.LAST_ENDPOINT).decode('ascii')
+        client = server._socket.context.socket(zmq.REQ)
+        client.connect(endpoint)
+
+        try:
+            client.send(REQUEST)
+            self.assertEqual(client.poll(200), 0)
+
+            server.stop_server(1.0)
+
+            self.assertTrue(client.poll(2000))
+            reply = json.loads(client.recv().decode('utf-8'))
+        finally:
+            client.close(linger=0)
+
+        self.assertEqual(reply['error']['code'], -32002)
+        self.assertFalse(server.is_running)
+
+
+class PublishedObject(object):
+    def __init__(self):
+        self.a = 10
+        self.b = 20
+
+    @property
+    def c(self):
+        return self.a + self.b
+
+    def method(self):
+        pass
+
+
+class TestPropertyPublisher(unittest.TestCase):
+    def create_publisher(self, subscriptions):
+        publisher = PropertyPublisher({'obj': PublishedObject()}, '127.0.0.1:10001', interval=0.0)
+        publisher._socket = Mock()
+        publisher._socket.recv.side_effect = subscriptions + [zmq.Again()]
+
+        return publisher
+
+    def test_topics(self):
+        publisher = PropertyPublisher({'obj': PublishedObject()}, '127.0.0.1:10001')
+
+        self.assertEqual(publisher.topics, ['obj.a', 'obj.b', 'obj.c'])
+
+    def test_process_raises_if_not_started(self):
+        publisher = PropertyPublisher({}, '127.0.0.1:10001')
+
+        self.assertRaises(RuntimeError, publisher.process)
+
+    def test_stop_server_forgets_subscriptions(self):
+        publisher = self.create_publisher([b'\x01obj.'])
+        mock_socket = publisher._socket
+        publisher.process()
+
+        publisher.stop_server()
+
+        mock_socket.close.assert_called_once_with(linger=0)
+        self.assertFalse(publisher.is_running)
+        self.assertEqual(publisher.statistics['subscriptions'], 0)
+        self.assertEqual(publisher.statistics['subscribed_topics'], 0)
+
+    def test_only_subscribed_topics_are_published(self):
+        publisher = self.create_publisher([b'\x01obj.a'])
+
+        self.assertEqual(publisher.process(), 1)
+        publisher._socket.send_multipart.assert_called_once_with([b'obj.a', b'10'])
+
+    def test_prefix_subscription(self):
+        publisher = self.create_publisher([b'\x01obj.'])
+
+        self.assertEqual(publisher.process(), 3)
+        self.assertEqual(publisher.statistics,
+                         {'subscriptions': 1, 'subscribed_topics': 3, 'published_updates': 3})
+
+    def test_values_modified_in_place_are_published(self):
+        obj = PublishedObject()
+        obj.a = [1, 2]
+        publisher = PropertyPublisher({'obj': obj}, '127.0.0.1:10001', interval=0.0)
+        publisher._socket = Mock()
+        publisher._socket.recv.side_effect = [b'\x01obj.a', zmq.Again(), zmq.Again()]
+
+        self.assertEqual(publisher.process(), 1)
+
+        obj.a.append(3)
+        self.assertEqual(publisher.process(), 1)
+        publisher._socket.send_multipart.assert_called_with([b'obj.a', b'[1, 2, 3]'])
+
+    def test_exposed_object_selects_members(self):
+        publisher = PropertyPublisher(
+            {'obj': ExposedObject(PublishedObject(), exclude=('b',))}, '127.0.0.1:10001')
+
+        self.assertEqual(publisher.topics, ['obj.a', 'obj.c'])
+
+    def test_values_are_published_when_changed(self):
+        obj = PublishedObject()
+        publisher = PropertyPublisher({'obj': obj}, '127.0.0.1:10001', interval=0.0)
+        publisher._socket = Mock()
+        publisher._socket.recv.side_effect = [b'\x01obj.c', zmq.Again(), zmq.Again(),
+                                              zmq.Again()]
+
+        self.assertEqual(publisher.process(), 1)
+        self.assertEqual(publisher.process(), 0)
+
+        obj.a = 5
+        self.assertEqual(publisher.process(), 1)
+        publisher._socket.send_multipart.assert_called_with([b'obj.c', b'25'])
+
+    def test_new_subscription_publishes_current_value(self):
+        publisher = self.create_publisher([b'\x01obj.a', zmq.Again(), b'\x01obj.a'])
+
+        self.assertEqual(publisher.process(), 1)
+        self.assertEqual(publisher.process(), 1)
+
+    def test_unsubscribe(self):
+        publisher = self.create_publisher([b'\x01obj.a', b'\x00obj.a'])
+
+        publisher.process()
+        self.assertEqual(publisher.statistics['subscriptions'], 0)
+        self.assertEqual(publisher.statistics['subscribed_topics'], 0)
+
+    def test_rate_limit(self):
+        obj = PublishedObject()
+        publisher = PropertyPublisher({'obj': obj}, '127.0.0.1:10001', interval=10.0)
+        publisher._socket = Mock()
+        publisher._socket.recv.side_effect = [b'\x01obj.a', zmq.Again(), zmq.Again()]
+
+        publisher.process()
+        obj.a = 5
+        self.assertEqual(publisher.process(), 0)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import socket
+import struct
+import time
+import unittest
+
+from plankton.adapters.datagram import DatagramAdapter
+from plankton.adapters.stream import StreamAdapter, Cmd, LengthPrefixedFramer
+
+
+class DummyDevice(object):
+    def __init__(self):
+        self.speed = 10
+
+
+class DummyStreamInterface(StreamAdapter):
+    commands = {
+        Cmd('get_speed', r'^S\?$'),
+        Cmd('set_speed', r'^S=([0-9]+)$', argument_mappings=(int,)),
+        Cmd('reset', r'^R$'),
+    }
+
+    in_terminator = '\r'
+    out_terminator = '\n'
+
+    def get_speed(self):
+        return self._device.speed
+
+    def set_speed(self, new_speed):
+        self._device.speed = new_speed
+        return 'OK'
+
+    def reset(self):
+        self._device.speed = 0
+
+    def handle_error(self, request, error):
+        return 'ERR'
+
+
+class DummyDatagramInterface(DatagramAdapter, DummyStreamInterface):
+    pass
+
+
+class BinaryDatagramInterface(DatagramAdapter):
+    framer = LengthPrefixedFramer('>H')
+
+    commands = {
+        Cmd('get_speed', '^\\x01$'),
+    }
+
+    def get_speed(self):
+        return struct.pack('>H', self._device.speed)
+
+
+class TestDatagramAdapter(unittest.TestCase):
+    def setUp(self):
+        self.device = DummyDevice()
+        self.adapter = DummyDatagramInterface(
+            self.device, ['-b', '127.0.0.1', '-p', '0', '--batch-size', '4'])
+        self.adapter.start_server()
+
+        self.server = self.adapter._server
+        self.address = self.server._socket.getsockname()
+
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.settimeout(1.0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def test_protocol(self):
+        self.assertEqual(self.adapter.protocol, 'datagram')
+
+    def test_request_reply(self):
+        self.client.sendto(b'S=20\r', self.address)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(self.client.recv(1024), b'OK\n')
+        self.assertEqual(self.device.speed, 20)
+
+    def test_request_without_terminator(self):
+        self.client.sendto(b'S?', self.address)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(self.client.recv(1024), b'10\n')
+
+    def test_error(self):
+        self.client.sendto(b'invalid', self.address)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(self.client.recv(1024), b'ERR\n')
+
+    def test_request_that_can_not_be_processed_is_dropped(self):
+        self.device.speed = u'\u2103'
+        self.client.sendto(b'S?', self.address)
+        self.adapter.handle(0.1)
+
+        self.device.speed = 10
+        self.client.sendto(b'S?', self.address)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(self.client.recv(1024), b'10\n')
+        self.assertEqual(self.server.statistics['errors'], 1)
+
+    def test_no_reply(self):
+        self.client.sendto(b'R', self.address)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(self.device.speed, 0)
+        self.assertEqual(self.server.statistics['replies'], 0)
+
+    def test_all_available_datagrams_are_processed(self):
+        for _ in range(10):
+            self.client.sendto(b'S?\r', self.address)
+
+        self.adapter.handle(0.1)
+
+        replies = [self.client.recv(1024) for _ in range(10)]
+        self.assertEqual(replies, [b'10\n'] * 10)
+
+        statistics = self.server.statistics
+        self.assertEqual(statistics['requests'], 10)
+        self.assertEqual(statistics['replies'], 10)
+        self.assertEqual(statistics['bytes_received'], 30)
+        self.assertEqual(statistics['bytes_sent'], 30)
+
+    def test_processing_stops_when_time_is_up(self):
+        for _ in range(10):
+            self.client.sendto(b'S?\r', self.address)
+
+        time.sleep(0.05)
+        self.adapter.handle(0.0)
+        self.assertEqual(self.server.statistics['requests'], 4)
+
+        self.adapter.handle(0.1)
+        self.assertEqual(self.server.statistics['requests'], 10)
+
+    def test_handle_without_requests(self):
+        self.adapter.handle(0.0)
+
+        self.assertEqual(self.adapter.statistics['requests'], 0)
+
+
+class TestBinaryDatagramAdapter(unittest.TestCase):
+    def setUp(self):
+        self.adapter = BinaryDatagramInterface(DummyDevice(), ['-b', '127.0.0.1', '-p', '0'])
+        self.adapter.start_server()
+
+        self.server = self.adapter._server
+        self.address = self.server._socket.getsockname()
+
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.settimeout(1.0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def test_replies_are_framed_by_framer(self):
+        self.client.sendto(b'\x00\x01\x01', self.address)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(self.client.recv(1024), b'\x00\x02\x00\x0a')
+
+    def test_incomplete_frame_is_dropped(self):
+        self.client.sendto(b'\x00\x02\x01', self.address)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(self.server.statistics['errors'], 1)
+        self.assertEqual(self.server.statistics['replies'], 0)
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import unittest
+from array import array
+from datetime import datetime
+
+from mock import ANY, Mock, patch, call
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from plankton.adapters.epics import EpicsAdapter, PV, PollScheduler, PropertyExposingDriver, \
+    value_changed, infer_array_config, to_pv_value
+
+
+class TestPollScheduler(unittest.TestCase):
+    def test_pvs_are_due_after_their_interval(self):
+        scheduler = PollScheduler({'A': 1.0, 'B': 0.5})
+
+        self.assertEqual(scheduler.advance(0.4), [])
+        self.assertEqual(scheduler.advance(0.1), ['B'])
+        scheduler.schedule('B', 0.5)
+
+        self.assertEqual(scheduler.advance(0.5), ['A', 'B'])
+
+    def test_schedule_is_relative_to_current_time(self):
+        scheduler = PollScheduler({'A': 1.0})
+
+        self.assertEqual(scheduler.advance(3.0), ['A'])
+        scheduler.schedule('A', 1.0)
+
+        self.assertEqual(scheduler.advance(0.9), [])
+        self.assertEqual(scheduler.advance(0.1), ['A'])
+
+    def test_retry(self):
+        scheduler = PollScheduler({'A': 1.0})
+
+        self.assertEqual(scheduler.advance(1.0), ['A'])
+        scheduler.retry('A')
+
+        self.assertEqual(scheduler.advance(0.0), ['A'])
+
+    def test_zero_interval(self):
+        scheduler = PollScheduler({'A': 0.0})
+
+        for _ in range(3):
+            self.assertEqual(scheduler.advance(0.1), ['A'])
+            scheduler.schedule('A', 0.0)
+
+
+class TestPropertyExposingDriver(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('plankton.adapters.epics.Driver.__init__', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_driver(self, target, pvs):
+        driver = PropertyExposingDriver(target, pvs)
+        driver.setParam = Mock()
+        driver.updatePVs = Mock()
+
+        return driver
+
+    def test_due_pvs_are_updated(self):
+        target = Mock(a=1, b=2)
+        driver = self.create_driver(target, {'A': PV('a', poll_interval=1.0),
+                                             'B': PV('b', poll_interval=2.0)})
+
+        driver.process_pv_updates(0.5)
+        driver.setParam.assert_not_called()
+
+        driver.process_pv_updates(0.5)
+        driver.setParam.assert_called_once_with('A', 1)
+
+        target.a = 3
+        driver.setParam.reset_mock()
+        driver.process_pv_updates(1.0)
+        driver.setParam.assert_has_calls([call('A', 3), call('B', 2)], any_order=True)
+
+    def test_failed_updates_are_retried(self):
+        target = Mock(spec=[])
+        driver = self.create_driver(target, {'A': PV('a', poll_interval=1.0)})
+
+        driver.process_pv_updates(1.0)
+        driver.setParam.assert_not_called()
+
+        target.a = 3
+        driver.process_pv_updates(0.1)
+        driver.setParam.assert_called_once_with('A', 3)
+
+    def test_noise_is_added(self):
+        driver = self.create_driver(
+            Mock(a=1.0), {'A': PV('a', poll_interval=1.0, noise=lambda: 0.5)})
+
+        driver.process_pv_updates(1.0)
+        driver.setParam.assert_called_once_with('A', 1.5)
+
+    def test_unchanged_values_are_not_published(self):
+        target = Mock(a=1.0)
+        driver = self.create_driver(target, {'A': PV('a', poll_interval=1.0)})
+
+        driver.process_pv_updates(1.0)
+        driver.setParam.assert_called_once_with('A', 1.0)
+        driver.updatePVs.assert_called_once_with()
+
+        driver.setParam.reset_mock()
+        driver.updatePVs.reset_mock()
+
+        driver.process_pv_updates(1.0)
+        driver.setParam.assert_not_called()
+        driver.updatePVs.assert_not_called()
+
+        self.assertEqual(driver.published_updates, 1)
+        self.assertEqual(driver.suppressed_updates, 1)
+
+    def test_deadband(self):
+        target = Mock(a=1.0)
+        driver = self.create_driver(target, {'A': PV('a', poll_interval=1.0, mdel=0.5)})
+
+        driver.process_pv_updates(1.0)
+
+        target.a = 1.4
+        driver.process_pv_updates(1.0)
+
+        target.a = 1.6
+        driver.process_pv_updates(1.0)
+
+        driver.setParam.assert_has_calls([call('A', 1.0), call('A', 1.6)])
+        self.assertEqual(driver.setParam.call_count, 2)
+
+    def test_written_values_are_published(self):
+        target = Mock(a=1.0)
+        driver = self.create_driver(target, {'A': PV('a', poll_interval=1.0)})
+
+        self.assertTrue(driver.write('A', 2.0))
+        driver.setParam.assert_called_once_with('A', 2.0)
+
+        driver.process_pv_updates(1.0)
+        driver.updatePVs.assert_called_once_with()
+        self.assertEqual(driver.suppressed_updates, 1)
+
+    def test_accessors_are_used(self):
+        getter, setter = Mock(return_value=4.0), Mock()
+        driver = PropertyExposingDriver(Mock(spec=[]), {'A': PV('a', poll_interval=1.0)},
+                                        accessors={'a': (getter, setter)})
+        driver.setParam = Mock()
+        driver.updatePVs = Mock()
+
+        driver.process_pv_updates(1.0)
+        driver.setParam.assert_called_once_with('A', 4.0)
+
+        driver.write('A', 2.0)
+        setter.assert_called_once_with(2.0)
+
+    def test_queued_writes(self):
+        getter, setter = Mock(return_value=2.0), Mock()
+        driver = PropertyExposingDriver(Mock(spec=[]),
+                                        {'A': PV('a'), 'B': PV('b', read_only=True)},
+                                        accessors={'a': (getter, setter), 'b': (getter, setter)},
+                                        queue_writes=True)
+        driver.setParam = Mock()
+        driver.updatePVs = Mock()
+
+        self.assertTrue(driver.write('A', 2.0))
+        self.assertFalse(driver.write('B', 2.0))
+        setter.assert_not_called()
+        driver.setParam.assert_not_called()
+
+        driver.apply_pending_writes()
+        setter.assert_called_once_with(2.0)
+        driver.setParam.assert_called_once_with('A', 2.0)
+
+    def test_failed_queued_writes_are_discarded(self):
+        setter = Mock(side_effect=RuntimeError)
+        driver = PropertyExposingDriver(Mock(spec=[]), {'A': PV('a')},
+                                        accessors={'a': (Mock(), setter)}, queue_writes=True)
+        driver.setParam = Mock()
+
+        driver.write('A', 2.0)
+        driver.apply_pending_writes()
+
+        setter.assert_called_once_with(2.0)
+        driver.setParam.assert_not_called()
+
+    def test_arrays_are_published_without_version(self):
+        target = Mock(a=array('d', [0.0] * 3))
+        driver = self.create_driver(target, {'A': PV('a', poll_interval=1.0)})
+
+        driver.process_pv_updates(1.0)
+        driver.process_pv_updates(1.0)
+
+        self.assertEqual(driver.setParam.call_count, 2)
+        self.assertEqual(list(driver.setParam.call_args[0][1]), [0.0] * 3)
+
+    def test_arrays_are_published_when_version_changes(self):
+        target = Mock(a=array('d', [0.0] * 3), a_version=0)
+        driver = self.create_driver(
+            target, {'A': PV('a', poll_interval=1.0, version_property='a_version')})
+
+        driver.process_pv_updates(1.0)
+        driver.process_pv_updates(1.0)
+        self.assertEqual(driver.setParam.call_count, 1)
+
+        target.a[0] = 1.0
+        target.a_version = 1
+        driver.process_pv_updates(1.0)
+        self.assertEqual(driver.setParam.call_count, 2)
+        self.assertEqual(driver.suppressed_updates, 1)
+
+
+class TestArrayValues(unittest.TestCase):
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_infer_array_config_numpy(self):
+        self.assertEqual(infer_array_config(numpy.zeros(10)), {'count': 10, 'type': 'float'})
+        self.assertEqual(infer_array_config(numpy.zeros(4, dtype=numpy.int32)),
+                         {'count': 4, 'type': 'int'})
+        self.assertEqual(infer_array_config(numpy.zeros(4, dtype=numpy.uint8)),
+                         {'count': 4, 'type': 'char'})
+
+    def test_infer_array_config(self):
+        self.assertEqual(infer_array_config(array('d', [1.0, 2.0])), {'count': 2, 'type': 'float'})
+        self.assertEqual(infer_array_config(array('l', [1, 2, 3])), {'count': 3, 'type': 'int'})
+        self.assertEqual(infer_array_config(array('B', [1])), {'count': 1, 'type': 'char'})
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_to_pv_value_shares_memory(self):
+        values = array('d', [1.0, 2.0])
+        pv_value = to_pv_value(values)
+
+        values[0] = 3.0
+        self.assertEqual(pv_value[0], 3.0)
+
+        self.assertEqual(to_pv_value(1.0), 1.0)
+
+
+class DummyDevice(object):
+    def __init__(self):
+        self.speed = 2.0
+        self.spectrum = array('d', [0.0] * 100)
+
+    @property
+    def position(self):
+        """Position of the device."""
+        return 3.0
+
+
+class DummyEpicsInterface(EpicsAdapter):
+    pvs = {
+        'SPEED': PV('speed'),
+        'POS': PV('position', read_only=True),
+        'STOP': PV('stop'),
+    }
+
+    stop = 0
+
+
+class TestEpicsAdapter(unittest.TestCase):
+    def test_missing_property_raises(self):
+        class InvalidInterface(EpicsAdapter):
+            pvs = {'A': PV('does_not_exist')}
+
+        self.assertRaises(AttributeError, InvalidInterface, DummyDevice())
+
+    def test_accessors(self):
+        device = DummyDevice()
+        adapter = DummyEpicsInterface(device)
+
+        get_speed, set_speed = adapter._accessors['speed']
+        set_speed(4.0)
+        self.assertEqual(device.speed, 4.0)
+        self.assertEqual(get_speed(), 4.0)
+
+        get_stop, set_stop = adapter._accessors['stop']
+        set_stop(1)
+        self.assertEqual(adapter.stop, 1)
+        self.assertEqual(get_stop(), 1)
+
+        self.assertEqual(adapter._accessors['position'][0](), 3.0)
+
+    def test_adapter_type_is_not_modified(self):
+        DummyEpicsInterface(DummyDevice())
+
+        self.assertFalse(hasattr(DummyEpicsInterface, 'speed'))
+        self.assertFalse(hasattr(DummyEpicsInterface, 'position'))
+
+    def test_handle(self):
+        adapter = DummyEpicsInterface(DummyDevice(), [])
+        adapter._server = Mock()
+        adapter._driver = Mock()
+        adapter._last_update = datetime.now()
+
+        adapter.handle(0.1)
+
+        adapter._server.process.assert_called_once_with(0.1)
+        adapter._driver.process_pv_updates.assert_called_once_with(ANY)
+        adapter._driver.apply_pending_writes.assert_not_called()
+
+    @patch('plankton.adapters.epics.SimpleServer')
+    @patch('plankton.adapters.epics.PropertyExposingDriver')
+    def test_io_thread(self, driver_mock, _):
+        adapter = DummyEpicsInterface(DummyDevice(), ['--io-thread'])
+        adapter.start_server()
+        self.addCleanup(adapter.stop_io_thread, 1.0)
+
+        self.assertTrue(driver_mock.call_args[1]['queue_writes'])
+
+        adapter.handle(0.0)
+
+        driver = driver_mock.return_value
+        driver.apply_pending_writes.assert_called_once_with()
+        driver.process_pv_updates.assert_called_once_with(ANY)
+
+        adapter.stop_io_thread(1.0)
+        self.assertIsNone(adapter._io_thread)
+
+    @patch('plankton.adapters.epics.SimpleServer')
+    @patch('plankton.adapters.epics.PropertyExposingDriver')
+    def test_io_thread_is_restarted_and_stopped(self, driver_mock, _):
+        adapter = DummyEpicsInterface(DummyDevice(), ['--io-thread'])
+        adapter.start_server()
+        self.addCleanup(adapter.stop_io_thread, 1.0)
+
+        first_thread = adapter._io_thread
+        adapter.start_server()
+
+        self.assertFalse(first_thread.is_alive())
+        self.assertTrue(adapter._io_thread.is_alive())
+
+        second_thread = adapter._io_thread
+        adapter.stop_server()
+
+        self.assertFalse(second_thread.is_alive())
+        self.assertIsNone(adapter._io_thread)
+
+    def test_array_pv_config(self):
+        class ArrayInterface(DummyEpicsInterface):
+            pvs = {'SPEC': PV('spectrum', read_only=True),
+                   'SPEC2': PV('spectrum', count=50, unit='counts')}
+
+        adapter = ArrayInterface(DummyDevice())
+
+        self.assertEqual(adapter._get_pv_config(adapter.pvs['SPEC']),
+                         {'count': 100, 'type': 'float'})
+        self.assertEqual(adapter._get_pv_config(adapter.pvs['SPEC2']),
+                         {'count': 50, 'type': 'float', 'unit': 'counts'})
+
+        adapter = DummyEpicsInterface(DummyDevice())
+        self.assertEqual(adapter._get_pv_config(adapter.pvs['SPEED']), {})
+
+    def test_missing_version_property_raises(self):
+        class InvalidInterface(EpicsAdapter):
+            pvs = {'SPEC': PV('spectrum', version_property='does_not_exist')}
+
+        self.assertRaises(AttributeError, InvalidInterface, DummyDevice())
+
+    def test_documentation(self):
+        adapter = DummyEpicsInterface(DummyDevice(), ['-p', 'SIM:'])
+
+        self.assertIn('Position of the device.', adapter.documentation)
+
+
+class TestValueChanged(unittest.TestCase):
+    def test_numbers(self):
+        self.assertFalse(value_changed(1.0, 1.0))
+        self.assertTrue(value_changed(1.0, 1.1))
+        self.assertFalse(value_changed(1.0, 1.1, deadband=0.2))
+        self.assertTrue(value_changed(1.0, 0.7, deadband=0.2))
+
+    def test_negative_deadband(self):
+        self.assertTrue(value_changed(1.0, 1.0, deadband=-1))
+
+    def test_nan(self):
+        nan = float('nan')
+
+        self.assertTrue(value_changed(1.0, nan))
+        self.assertTrue(value_changed(nan, 1.0))
+        self.assertTrue(value_changed(nan, 1.0, deadband=2.0))
+        self.assertFalse(value_changed(nan, nan))
+
+        inf = float('inf')
+        self.assertFalse(value_changed(inf, inf))
+        self.assertTrue(value_changed(inf, -inf))
+
+    def test_strings(self):
+        self.assertFalse(value_changed('on', 'on'))
+        self.assertTrue(value_changed('on', 'off'))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import unittest
+from mock import patch
+
+from plankton.core.noise import GaussianNoise, UniformNoise, Noisy
+
+
+def sample(generator, count):
+    return [generator() for _ in range(count)]
+
+
+def mean_and_deviation(values):
+    mean = sum(values) / len(values)
+    return mean, (sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5
+
+
+def autocorrelation(values):
+    mean, deviation = mean_and_deviation(values)
+    return sum((a - mean) * (b - mean)
+               for a, b in zip(values[:-1], values[1:])) / (len(values) - 1) / deviation ** 2
+
+
+class TestGaussianNoise(unittest.TestCase):
+    def test_invalid_parameters_raise(self):
+        self.assertRaises(ValueError, GaussianNoise, buffer_size=0)
+        self.assertRaises(ValueError, GaussianNoise, correlation=1.0)
+        self.assertRaises(ValueError, GaussianNoise, correlation=-0.1)
+
+    def test_seed_makes_noise_reproducible(self):
+        self.assertEqual(sample(GaussianNoise(seed=3), 100), sample(GaussianNoise(seed=3), 100))
+
+    def test_buffer_is_refilled(self):
+        noise = GaussianNoise(buffer_size=10, seed=1)
+        values = sample(noise, 25)
+
+        self.assertEqual(len(set(values)), 25)
+
+    def test_mean_and_sigma(self):
+        mean, deviation = mean_and_deviation(
+            sample(GaussianNoise(sigma=2.0, mean=5.0, seed=1), 20000))
+
+        self.assertAlmostEqual(mean, 5.0, delta=0.1)
+        self.assertAlmostEqual(deviation, 2.0, delta=0.1)
+
+    def test_correlation(self):
+        values = sample(GaussianNoise(sigma=1.0, correlation=0.9, buffer_size=1000, seed=1),
+                        20000)
+
+        self.assertAlmostEqual(autocorrelation(values), 0.9, delta=0.05)
+        self.assertAlmostEqual(mean_and_deviation(values)[1], 1.0, delta=0.2)
+
+    def test_drift(self):
+        values = sample(GaussianNoise(sigma=0.0, drift=0.1, buffer_size=100, seed=1), 1000)
+        steps = [b - a for a, b in zip(values[:-1], values[1:])]
+
+        self.assertAlmostEqual(mean_and_deviation(steps)[1], 0.1, delta=0.02)
+
+    @patch('plankton.core.noise.numpy', None)
+    def test_without_numpy(self):
+        values = sample(GaussianNoise(sigma=1.0, correlation=0.9, buffer_size=1000, seed=1),
+                        20000)
+
+        self.assertAlmostEqual(autocorrelation(values), 0.9, delta=0.05)
+        self.assertAlmostEqual(mean_and_deviation(values)[1], 1.0, delta=0.2)
+
+
+class TestUniformNoise(unittest.TestCase):
+    def test_values_in_range(self):
+        values = sample(UniformNoise(amplitude=0.5, buffer_size=100, seed=1), 1000)
+
+        self.assertTrue(all(-0.5 <= v <= 0.5 for v in values))
+
+    @patch('plankton.core.noise.numpy', None)
+    def test_values_in_range_without_numpy(self):
+        values = sample(UniformNoise(amplitude=0.5, buffer_size=100, seed=1), 1000)
+
+        self.assertTrue(all(-0.5 <= v <= 0.5 for v in values))
+
+
+class TestNoisy(unittest.TestCase):
+    def test_noise_is_added_to_attribute(self):
+        class Device(object):
+            speed = 10.0
+            noisy_speed = Noisy('speed', lambda: 0.5)
+
+        device = Device()
+        self.assertEqual(device.noisy_speed, 10.5)
+        self.assertEqual(device.speed, 10.0)
+
+    def test_noisy_attribute_is_read_only(self):
+        class Device(object):
+            speed = 10.0
+            noisy_speed = Noisy('speed', lambda: 0.5)
+
+        self.assertRaises(AttributeError, setattr, Device(), 'noisy_speed', 3.0)
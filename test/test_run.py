@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import unittest
+
+from plankton.scripts.run import split_adapter_arguments
+
+
+class TestSplitAdapterArguments(unittest.TestCase):
+    def test_without_markers_all_arguments_are_passed_to_all_adapters(self):
+        self.assertEqual(split_adapter_arguments(['-p', '9999'], [None]), {None: ['-p', '9999']})
+        self.assertEqual(split_adapter_arguments(['-b', 'localhost'], ['epics', 'stream']),
+                         {'epics': ['-b', 'localhost'], 'stream': ['-b', 'localhost']})
+
+    def test_arguments_after_marker(self):
+        self.assertEqual(
+            split_adapter_arguments(
+                ['-v', 'epics:', '-p', 'SIM:', 'stream:', '-p', '9999'], ['epics', 'stream']),
+            {'epics': ['-v', '-p', 'SIM:'], 'stream': ['-v', '-p', '9999']})
+
+    def test_markers_of_other_protocols_are_arguments(self):
+        self.assertEqual(split_adapter_arguments(['-p', 'stream:'], ['epics']),
+                         {'epics': ['-p', 'stream:']})
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import unittest
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from plankton.core.serialization import JsonCodec, BinaryCodec, MsgpackCodec, msgpack
+
+MESSAGE = {'jsonrpc': '2.0', 'id': '1', 'result': {'a': 1.5, 'b': [1, 2], 'c': 'text'}}
+
+
+class TestJsonCodec(unittest.TestCase):
+    def test_roundtrip(self):
+        codec = JsonCodec()
+        frames = codec.encode(MESSAGE)
+
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(codec.decode(frames), MESSAGE)
+
+    def test_arrays_are_converted_to_lists(self):
+        codec = JsonCodec()
+
+        self.assertEqual(codec.decode(codec.encode({'result': array('d', [1.0, 2.0])})),
+                         {'result': [1.0, 2.0]})
+
+
+class TestBinaryCodec(unittest.TestCase):
+    def test_roundtrip(self):
+        codec = BinaryCodec()
+
+        self.assertEqual(codec.decode(codec.encode(MESSAGE)), MESSAGE)
+
+    def test_array_is_sent_in_separate_frame(self):
+        codec = BinaryCodec()
+        values = array('d', [1.0, 2.0, 3.0])
+
+        frames = codec.encode({'result': values})
+
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(bytes(frames[1]), values.tobytes())
+        self.assertEqual(codec.decode([bytes(frame) for frame in frames]), {'result': values})
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy_roundtrip(self):
+        codec = BinaryCodec()
+        values = numpy.arange(12, dtype=numpy.int32).reshape(3, 4)
+
+        frames = codec.encode({'result': [values, values.T]})
+        self.assertEqual(len(frames), 3)
+
+        decoded = codec.decode([bytes(frame) for frame in frames])['result']
+        numpy.testing.assert_array_equal(decoded[0], values)
+        numpy.testing.assert_array_equal(decoded[1], values.T)
+        self.assertEqual(decoded[0].dtype, numpy.int32)
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class TestMsgpackCodec(unittest.TestCase):
+    def test_roundtrip(self):
+        codec = MsgpackCodec()
+
+        self.assertEqual(codec.decode(codec.encode(MESSAGE)), MESSAGE)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy_roundtrip(self):
+        codec = MsgpackCodec()
+        values = numpy.linspace(0.0, 1.0, 10).reshape(2, 5)
+
+        decoded = codec.decode(codec.encode({'result': values}))['result']
+        numpy.testing.assert_array_equal(decoded, values)
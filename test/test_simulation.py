@@ -21,6 +21,7 @@ import unittest
 
 from mock import Mock, patch, call, ANY
 
+from plankton.core.control_server import ExposedObject
 from plankton.core.simulation import Simulation
 from . import assertRaisesNothing
 
@@ -144,6 +145,25 @@ class TestSimulation(unittest.TestCase):
 
         control_mock.assert_has_calls([call.process()])
 
+    @patch('plankton.core.simulation.PropertyPublisher')
+    def test_publisher(self, publisher_mock):
+        device = Mock()
+        env = Simulation(device=device, adapter=Mock(), publisher='127.0.0.1:10001')
+
+        publisher_mock.assert_called_once_with(
+            {'device': device, 'simulation': ANY}, '127.0.0.1:10001')
+
+        simulation = publisher_mock.call_args[0][0]['simulation']
+        self.assertIsInstance(simulation, ExposedObject)
+        self.assertIn('cycles:get', simulation)
+        self.assertNotIn('control_server:get', simulation)
+        self.assertNotIn('device_documentation:get', simulation)
+
+        set_simulation_running(env)
+        env._process_cycle(0.5)
+
+        publisher_mock.return_value.process.assert_called_once_with()
+
     def test_None_control_server_is_None(self):
         env = Simulation(device=Mock(), adapter=Mock(), control_server=None)
 
@@ -167,15 +187,47 @@ class TestSimulation(unittest.TestCase):
     @patch('plankton.core.simulation.ControlServer')
     def test_construct_control_server(self, mock_control_server_type, exposed_object_mock):
         device = Mock()
-        adapter = Mock()
+        adapter = Mock(control_members=())
+
+        exposed_object_mock.return_value = 'test'
+        assertRaisesNothing(self, Simulation, device=device, adapter=adapter,
+                            control_server='localhost:10000')
+
+        mock_control_server_type.assert_called_once_with(
+            {'device': device, 'simulation': 'test'},
+            'localhost:10000')
+
+    @patch('plankton.core.simulation.ExposedObject')
+    @patch('plankton.core.simulation.ControlServer')
+    def test_construct_control_server_with_adapter(self, mock_control_server_type,
+                                                   exposed_object_mock):
+        device = Mock()
+        adapter = Mock(control_members=('statistics',))
 
         exposed_object_mock.return_value = 'test'
         assertRaisesNothing(self, Simulation, device=device, adapter=adapter,
                             control_server='localhost:10000')
 
+        exposed_object_mock.assert_called_with(adapter, members=('statistics',))
+        mock_control_server_type.assert_called_once_with(
+            {'device': device, 'simulation': 'test', 'adapter': 'test'},
+            'localhost:10000')
+
+    @patch('plankton.core.simulation.ExposedObject')
+    @patch('plankton.core.simulation.ThreadedControlServer')
+    def test_construct_threaded_control_server(self, mock_control_server_type,
+                                               exposed_object_mock):
+        device = Mock()
+        adapter = Mock(control_members=())
+
+        exposed_object_mock.return_value = 'test'
+        simulation = Simulation(device=device, adapter=adapter, control_server='localhost:10000',
+                                control_server_thread=True)
+
         mock_control_server_type.assert_called_once_with(
             {'device': device, 'simulation': 'test'},
             'localhost:10000')
+        self.assertEqual(simulation.control_server, mock_control_server_type.return_value)
 
     def test_start_starts_control_server(self):
         env = Simulation(device=Mock(), adapter=Mock())
@@ -191,6 +243,27 @@ class TestSimulation(unittest.TestCase):
 
         control_server_mock.assert_has_calls([call.start_server()])
 
+    def test_start_stops_servers_when_finished(self):
+        adapter_mock = Mock()
+        env = Simulation(device=Mock(), adapter=adapter_mock)
+
+        control_server_mock = Mock()
+        env._control_server = control_server_mock
+
+        publisher_mock = Mock()
+        env._publisher = publisher_mock
+
+        def process_cycle_side_effect(delta):
+            env.stop()
+
+        env._process_cycle = Mock(side_effect=process_cycle_side_effect)
+        env.start()
+
+        adapter_mock.stop_server.assert_called_once_with()
+        control_server_mock.stop_server.assert_called_once_with()
+        publisher_mock.stop_server.assert_called_once_with()
+        self.assertFalse(env.is_started)
+
     def test_speed_range(self):
         env = Simulation(device=Mock(), adapter=Mock())
 
@@ -235,7 +308,7 @@ class TestSimulation(unittest.TestCase):
         exposed_object_mock.return_value = 'test'
         device_mock = Mock()
 
-        env = Simulation(device=device_mock, adapter=Mock())
+        env = Simulation(device=device_mock, adapter=Mock(control_members=()))
 
         assertRaisesNothing(self, setattr, env, 'control_server', '127.0.0.1:10001')
         control_server_mock.assert_called_once_with(
@@ -311,3 +384,50 @@ class TestSimulation(unittest.TestCase):
         doc = env.device_documentation
 
         self.assertEqual(doc, 'test')
+
+    def test_device_documentation_of_multiple_adapters(self):
+        env = Simulation(device=Mock(), adapter=[Mock(documentation='a'), Mock(documentation='b')])
+
+        self.assertEqual(env.device_documentation, 'a\n\nb')
+
+    def test_multiple_adapters_are_started(self):
+        adapters = [Mock(), Mock()]
+        env = Simulation(device=Mock(), adapter=adapters)
+
+        with patch.object(env, '_process_cycle', side_effect=lambda x: env.stop()):
+            env.start()
+
+        for adapter in adapters:
+            adapter.start_server.assert_called_once_with()
+
+    @patch('plankton.core.simulation.seconds_since')
+    def test_multiple_adapters_share_cycle_delay(self, seconds_since_mock):
+        adapters = [Mock(), Mock(), Mock()]
+        env = Simulation(device=Mock(), adapter=adapters)
+        env.cycle_delay = 3.0
+
+        # The first adapter uses 0.5 s of its share, the second one its entire share
+        seconds_since_mock.side_effect = [0.5, 1.75, 3.0]
+        env._process_adapters()
+
+        adapters[0].handle.assert_called_once_with(1.0)
+        adapters[1].handle.assert_called_once_with(1.25)
+        adapters[2].handle.assert_called_once_with(1.25)
+
+    @patch('plankton.core.simulation.ExposedObject')
+    @patch('plankton.core.simulation.ControlServer')
+    def test_construct_control_server_with_multiple_adapters(self, mock_control_server_type,
+                                                             exposed_object_mock):
+        device = Mock()
+        adapters = [Mock(control_members=('a',), protocol='epics'),
+                    Mock(control_members=(), protocol='stream'),
+                    Mock(control_members=('b',), protocol='datagram')]
+
+        exposed_object_mock.return_value = 'test'
+        assertRaisesNothing(self, Simulation, device=device, adapter=adapters,
+                            control_server='localhost:10000')
+
+        mock_control_server_type.assert_called_once_with(
+            {'device': device, 'simulation': 'test',
+             'adapter_epics': 'test', 'adapter_datagram': 'test'},
+            'localhost:10000')
@@ -0,0 +1,676 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# plankton - a library for creating hardware device simulators
+# Copyright (C) 2016 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import json
+import os
+import re
+import selectors
+import socket
+import struct
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from plankton.adapters.stream import StreamAdapter, Cmd, CommandIndex, CommandMetrics, \
+    literal_prefix, TerminatorFramer, FixedLengthFramer, LengthPrefixedFramer, _release
+from plankton.core.control_server import ExposedObject
+from . import assertRaisesNothing
+
+
+class DummyDevice(object):
+    def __init__(self):
+        self.speed = 10
+
+
+class DummyInterface(StreamAdapter):
+    commands = {
+        Cmd('get_speed', r'^S\?$'),
+        Cmd('set_speed', r'^S=([0-9]+)$', argument_mappings=(int,)),
+    }
+
+    def get_speed(self):
+        return self._device.speed
+
+    def set_speed(self, new_speed):
+        self._device.speed = new_speed
+        return 'OK'
+
+    def handle_error(self, request, error):
+        return 'ERR'
+
+
+class BinaryInterface(StreamAdapter):
+    framer = LengthPrefixedFramer('>H')
+
+    commands = {
+        Cmd('get_speed', '^\\x01$'),
+        Cmd('set_speed', '^\\x02(..)$', argument_struct='>H'),
+    }
+
+    def get_speed(self):
+        return struct.pack('>H', self._device.speed)
+
+    def set_speed(self, new_speed):
+        self._device.speed = new_speed
+
+
+class TestStreamServer(unittest.TestCase):
+    def setUp(self):
+        self.device = DummyDevice()
+        self.adapter = DummyInterface(self.device, ['-b', '127.0.0.1', '-p', '0'])
+        self.adapter.start_server()
+
+        self.server = self.adapter._server
+        self.port = self.server._socket.getsockname()[1]
+
+    def tearDown(self):
+        self.server.close()
+
+    def connect(self):
+        client = socket.create_connection(('127.0.0.1', self.port))
+        client.settimeout(1.0)
+        self.adapter.handle(0.1)
+
+        return client
+
+    def receive(self, client, expected):
+        data = b''
+        while len(data) < len(expected):
+            self.adapter.handle(0.01)
+            data += client.recv(4096)
+
+        return data
+
+    def test_accepts_clients(self):
+        clients = [self.connect() for _ in range(10)]
+        self.adapter.handle(0.1)
+
+        self.assertEqual(len(self.server.handlers), 10)
+
+        for client in clients:
+            client.close()
+
+    def test_request_and_reply(self):
+        client = self.connect()
+        client.sendall(b'S=20\rS?\r')
+
+        self.assertEqual(self.receive(client, b'OK\r20\r'), b'OK\r20\r')
+        self.assertEqual(self.device.speed, 20)
+
+        client.close()
+
+    def test_incomplete_request_is_buffered(self):
+        client = self.connect()
+        client.sendall(b'S')
+        self.adapter.handle(0.1)
+        client.sendall(b'?\r')
+
+        self.assertEqual(self.receive(client, b'10\r'), b'10\r')
+
+        client.close()
+
+    def test_errors_are_handled(self):
+        client = self.connect()
+        client.sendall(b'X\r')
+
+        self.assertEqual(self.receive(client, b'ERR\r'), b'ERR\r')
+
+        client.close()
+
+    def test_disconnected_client_is_removed(self):
+        client = self.connect()
+        self.assertEqual(len(self.server.handlers), 1)
+
+        client.close()
+        self.adapter.handle(0.1)
+
+        self.assertEqual(len(self.server.handlers), 0)
+
+    def test_pipelined_requests_are_answered_in_one_write(self):
+        client = self.connect()
+        handler = self.server.handlers[0]
+
+        with patch.object(handler, 'handle_write', wraps=handler.handle_write) as write_mock:
+            client.sendall(b'S?\r' * 50)
+            self.assertEqual(self.receive(client, b'10\r' * 50), b'10\r' * 50)
+
+        self.assertEqual(write_mock.call_count, 1)
+
+        client.close()
+
+    def test_requests_are_held_back_while_write_buffer_is_full(self):
+        client = self.connect()
+        handler = self.server.handlers[0]
+
+        handler._out_buffer += b'x' * self.server.write_buffer_limit
+        handler.collect_incoming_data(b'S?\rS?\r')
+        handler.process_requests()
+
+        self.assertEqual(handler.buffer, b'S?\rS?\r')
+
+        del handler._out_buffer[:]
+        handler.process_requests()
+
+        self.assertEqual(handler.buffer, b'')
+        self.assertEqual(handler._out_buffer, b'10\r10\r')
+
+        client.close()
+
+    def test_full_write_buffer_stops_reading(self):
+        client = self.connect()
+        handler = self.server.handlers[0]
+
+        self.assertEqual(handler.events, selectors.EVENT_READ)
+
+        handler._out_buffer += b'x' * self.server.write_buffer_limit
+
+        self.assertEqual(handler.events, selectors.EVENT_WRITE)
+
+        client.close()
+
+    def test_max_connections(self):
+        self.server.max_connections = 2
+
+        clients = [self.connect() for _ in range(3)]
+        self.adapter.handle(0.1)
+
+        self.assertEqual(len(self.server.handlers), 2)
+        self.assertFalse(self.server.statistics['accepting'])
+
+        clients[0].close()
+        self.adapter.handle(0.1)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(len(self.server.handlers), 2)
+        self.assertEqual(self.server.statistics['accepted_connections'], 3)
+
+        for client in clients:
+            client.close()
+
+    def test_invalid_max_connections(self):
+        self.assertRaises(ValueError, setattr, self.server, 'max_connections', 0)
+
+    def test_incomplete_request_exceeding_limit_closes_connection(self):
+        self.server.read_buffer_limit = 10
+
+        client = self.connect()
+        client.sendall(b'S' * 11)
+        self.adapter.handle(0.1)
+
+        self.assertEqual(len(self.server.handlers), 0)
+        self.assertEqual(self.server.statistics['buffer_overflows'], 1)
+        self.assertEqual(client.recv(4096), b'')
+
+        client.close()
+
+    def test_error_closes_only_affected_connection(self):
+        failing_client = self.connect()
+        client = self.connect()
+
+        self.device.speed = u'\u2103'
+        failing_client.sendall(b'S?\r')
+        self.adapter.handle(0.1)
+
+        self.assertEqual(len(self.server.handlers), 1)
+        self.assertEqual(self.server.statistics['handler_errors'], 1)
+        self.assertEqual(failing_client.recv(4096), b'')
+
+        self.device.speed = 10
+        client.sendall(b'S?\r')
+        self.assertEqual(self.receive(client, b'10\r'), b'10\r')
+
+        failing_client.close()
+        client.close()
+
+    def test_server_can_be_restarted_on_same_port(self):
+        adapter = DummyInterface(self.device, ['-b', '127.0.0.1', '-p', str(self.port)])
+        self.adapter.stop_server()
+
+        self.assertIsNone(self.adapter._server)
+
+        adapter.start_server()
+        self.server = adapter._server
+
+        self.assertEqual(self.server._socket.getsockname()[1], self.port)
+
+    def test_invalid_frame_closes_connection(self):
+        adapter = BinaryInterface(self.device, ['-b', '127.0.0.1', '-p', '0'])
+        adapter.framer = LengthPrefixedFramer('>H', include_header=True)
+        adapter.start_server()
+
+        try:
+            client = socket.create_connection(
+                ('127.0.0.1', adapter._server._socket.getsockname()[1]))
+            client.settimeout(1.0)
+            adapter.handle(0.1)
+
+            client.sendall(b'\x00\x00')
+            adapter.handle(0.1)
+
+            self.assertEqual(len(adapter._server.handlers), 0)
+            self.assertEqual(adapter._server.statistics['framing_errors'], 1)
+            self.assertEqual(client.recv(4096), b'')
+
+            client.close()
+        finally:
+            adapter._server.close()
+
+    def test_complete_requests_do_not_count_towards_limit(self):
+        self.server.read_buffer_limit = 10
+
+        client = self.connect()
+        client.sendall(b'S?\r' * 10)
+
+        self.assertEqual(self.receive(client, b'10\r' * 10), b'10\r' * 10)
+        self.assertEqual(len(self.server.handlers), 1)
+
+        client.close()
+
+    def test_idle_connections_are_closed(self):
+        client = self.connect()
+        handler = self.server.handlers[0]
+
+        self.server.idle_timeout = 10.0
+        self.adapter.handle(0.0)
+        self.assertEqual(len(self.server.handlers), 1)
+
+        handler.last_activity -= 20.0
+        self.adapter.handle(0.0)
+
+        self.assertEqual(len(self.server.handlers), 0)
+        self.assertEqual(self.server.statistics['idle_disconnects'], 1)
+
+        client.close()
+
+    def test_connection_info(self):
+        client = self.connect()
+        client.sendall(b'S?\rS')
+        self.receive(client, b'10\r')
+
+        connections = self.adapter.connections
+        self.assertEqual(len(connections), 1)
+        self.assertEqual(connections[0]['address'], '{}:{}'.format(*client.getsockname()))
+        self.assertEqual(connections[0]['requests'], 1)
+        self.assertEqual(connections[0]['input_buffer'], 1)
+        self.assertEqual(self.adapter.statistics['buffered_bytes'], 1)
+
+        client.close()
+
+
+class TestBinaryStreamServer(unittest.TestCase):
+    def test_length_prefixed_requests(self):
+        device = DummyDevice()
+        adapter = BinaryInterface(device, ['-b', '127.0.0.1', '-p', '0'])
+        adapter.start_server()
+        port = adapter._server._socket.getsockname()[1]
+
+        client = socket.create_connection(('127.0.0.1', port))
+        client.settimeout(1.0)
+        adapter.handle(0.1)
+
+        client.sendall(b'\x00\x03\x02\x01\x02' + b'\x00\x01\x01')
+
+        data = b''
+        while len(data) < 4:
+            adapter.handle(0.01)
+            data += client.recv(4096)
+
+        self.assertEqual(data, b'\x00\x02\x01\x02')
+        self.assertEqual(device.speed, 258)
+
+        client.close()
+        adapter._server.close()
+
+
+class TestFramers(unittest.TestCase):
+    def test_terminator_framer(self):
+        framer = TerminatorFramer('\r\n', '\n')
+        buffer = bytearray(b'AB\r\nC\r\nD')
+
+        self.assertEqual(framer.find_frame(buffer, 0), (0, 2, 4))
+        self.assertEqual(framer.find_frame(buffer, 4), (4, 5, 7))
+        self.assertEqual(framer.find_frame(buffer, 7), None)
+
+        out = bytearray()
+        framer.write_frame(b'X', out)
+        self.assertEqual(out, b'X\n')
+
+    def test_fixed_length_framer(self):
+        framer = FixedLengthFramer(3)
+        buffer = bytearray(b'ABCDEFG')
+
+        self.assertEqual(framer.find_frame(buffer, 0), (0, 3, 3))
+        self.assertEqual(framer.find_frame(buffer, 3), (3, 6, 6))
+        self.assertEqual(framer.find_frame(buffer, 6), None)
+        self.assertRaises(ValueError, FixedLengthFramer, 0)
+
+    def test_length_prefixed_framer(self):
+        framer = LengthPrefixedFramer('>H')
+        buffer = bytearray(b'\x00\x02AB\x00\x03CD')
+
+        self.assertEqual(framer.find_frame(buffer, 0), (2, 4, 4))
+        self.assertEqual(framer.find_frame(buffer, 4), None)
+        self.assertEqual(framer.find_frame(buffer, 8), None)
+
+        out = bytearray()
+        framer.write_frame(b'XYZ', out)
+        self.assertEqual(out, b'\x00\x03XYZ')
+
+    def test_length_prefixed_framer_including_header(self):
+        framer = LengthPrefixedFramer('<B', include_header=True)
+
+        self.assertEqual(framer.find_frame(bytearray(b'\x03AB'), 0), (1, 3, 3))
+
+        out = bytearray()
+        framer.write_frame(b'XY', out)
+        self.assertEqual(out, b'\x03XY')
+
+    def test_length_prefixed_framer_rejects_negative_length(self):
+        self.assertRaises(ValueError, LengthPrefixedFramer('>H', include_header=True).find_frame,
+                          bytearray(b'\x00\x00'), 0)
+        self.assertRaises(ValueError, LengthPrefixedFramer('>h').find_frame,
+                          bytearray(b'\xff\xfe'), 0)
+
+
+class TestStreamAdapter(unittest.TestCase):
+    def test_missing_method_raises(self):
+        class InvalidInterface(StreamAdapter):
+            commands = {Cmd('does_not_exist', r'^A$')}
+
+        self.assertRaises(AttributeError, InvalidInterface, DummyDevice(), [])
+
+    def test_methods_are_resolved_without_modifying_the_adapter(self):
+        class DeviceWithMethod(DummyDevice):
+            def get_position(self):
+                """Position docstring."""
+                return 3
+
+        class ForwardingInterface(DummyInterface):
+            commands = {Cmd('get_position', r'^P\?$'), Cmd('get_speed', r'^S\?$')}
+
+        adapter = ForwardingInterface(DeviceWithMethod(), [])
+
+        self.assertEqual(adapter.handle_request(b'P?'), '3')
+        self.assertEqual(adapter.handle_request(b'S?'), '10')
+        self.assertNotIn('get_position', dir(adapter))
+        self.assertFalse(hasattr(ForwardingInterface, 'get_position'))
+
+    def test_handle_request(self):
+        device = DummyDevice()
+        adapter = DummyInterface(device, [])
+
+        self.assertEqual(adapter.handle_request(b'S=3'), 'OK')
+        self.assertEqual(adapter.handle_request(b'S?'), '3')
+        self.assertEqual(adapter.handle_request(b'invalid'), 'ERR')
+        self.assertEqual(adapter.handle_request(memoryview(b'S?')), '3')
+
+    def test_pure_commands_are_cached(self):
+        class PureInterface(DummyInterface):
+            commands = {
+                Cmd('get_speed', r'^S\?$', pure=True),
+                Cmd('set_speed', r'^S=([0-9]+)$', argument_mappings=(int,)),
+            }
+
+        device = DummyDevice()
+
+        with patch.object(PureInterface, 'get_speed', autospec=True,
+                          side_effect=DummyInterface.get_speed) as get_speed_mock:
+            adapter = PureInterface(device, [])
+
+            self.assertEqual(adapter.handle_request(b'S?'), '10')
+            self.assertEqual(adapter.handle_request(b'S?'), '10')
+            get_speed_mock.assert_called_once_with(adapter)
+
+            device.speed = 20
+            self.assertEqual(adapter.handle_request(b'S?'), '10')
+
+            adapter._server = Mock()
+            adapter.handle(0.0)
+            self.assertEqual(adapter.handle_request(b'S?'), '20')
+
+            adapter.handle_request(b'S=30')
+            self.assertEqual(adapter.handle_request(b'S?'), '30')
+            self.assertEqual(get_speed_mock.call_count, 3)
+
+    def test_metrics(self):
+        adapter = DummyInterface(DummyDevice(), [])
+
+        adapter.handle_request(b'S=3')
+        adapter.handle_request(b'S?')
+        adapter.handle_request(b'S?')
+        adapter.handle_request(b'invalid')
+
+        metrics = {entry['method']: entry for entry in adapter.metrics}
+
+        self.assertEqual(metrics['get_speed']['calls'], 2)
+        self.assertEqual(metrics['get_speed']['bytes_in'], 4)
+        self.assertEqual(metrics['get_speed']['bytes_out'], 2)
+        self.assertEqual(sum(metrics['get_speed']['latency']), 2)
+        self.assertEqual(metrics['set_speed']['calls'], 1)
+        self.assertEqual(metrics['set_speed']['errors'], 0)
+        self.assertEqual(metrics[None]['calls'], 1)
+        self.assertEqual(metrics[None]['errors'], 1)
+        self.assertEqual(metrics[None]['bytes_out'], 3)
+
+        adapter.reset_metrics()
+
+        self.assertEqual(sum(entry['calls'] for entry in adapter.metrics), 0)
+
+    def test_metrics_file(self):
+        metrics_file = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        metrics_file.close()
+        self.addCleanup(os.remove, metrics_file.name)
+
+        adapter = DummyInterface(DummyDevice(), [
+            '-b', '127.0.0.1', '-p', '0', '--metrics-file', metrics_file.name])
+        adapter.start_server()
+        self.addCleanup(adapter._server.close)
+
+        adapter.handle_request(b'S?')
+        adapter.handle(0.0)
+
+        with open(metrics_file.name) as f:
+            metrics = json.load(f)
+
+        self.assertEqual(len(metrics['latency_bounds']), CommandMetrics.latency_buckets - 1)
+        self.assertEqual(metrics['commands'], adapter.metrics)
+
+    def test_backlog_argument(self):
+        adapter = DummyInterface(DummyDevice(), ['--backlog', '20'])
+
+        self.assertEqual(adapter._options.backlog, 20)
+
+    def test_connection_limit_arguments(self):
+        adapter = DummyInterface(DummyDevice(), [
+            '--max-connections', '5', '--max-buffer', '100', '--idle-timeout', '2.5'])
+
+        self.assertEqual(adapter.max_connections, 5)
+        self.assertEqual(adapter.max_buffer, 100)
+        self.assertEqual(adapter.idle_timeout, 2.5)
+
+        adapter.max_connections = 3
+        self.assertEqual(adapter.max_connections, 3)
+
+    def test_control_members_are_exposed(self):
+        adapter = DummyInterface(DummyDevice(), ['-b', '127.0.0.1', '-p', '0'])
+        exposed = ExposedObject(adapter, members=adapter.control_members)
+
+        self.assertEqual(exposed['connections:get'](), [])
+        self.assertEqual(exposed['statistics:get'](), {})
+
+        exposed['idle_timeout:set'](3.0)
+        self.assertEqual(adapter.idle_timeout, 3.0)
+
+
+class TestRelease(unittest.TestCase):
+    def test_release(self):
+        view = memoryview(bytearray(b'abc'))
+        _release(view)
+
+        self.assertRaises(ValueError, len, view)
+
+    @patch('plankton.adapters.stream.PY2', True)
+    def test_release_is_skipped_on_python2(self):
+        # Python 2's memoryview has no release-method
+        view = Mock(spec=[])
+
+        assertRaisesNothing(self, _release, view)
+
+
+class TestCmd(unittest.TestCase):
+    def test_bytes_regex(self):
+        cmd = Cmd('a', b'^\x01(.)$')
+
+        self.assertEqual(cmd.pattern.pattern, b'^\x01(.)$')
+        self.assertTrue(cmd.pattern.match(memoryview(b'\x01\xff')))
+
+    def test_argument_mappings(self):
+        self.assertEqual(Cmd('a', r'^A$').convert_arguments(()), ())
+        self.assertEqual(Cmd('a', r'^A(.)$', argument_mappings=(int,)).convert_arguments(
+            (b'3',)), (3,))
+        self.assertEqual(Cmd('a', r'^A(.)(.)$', argument_mappings=(int, float)).map_arguments(
+            (b'3', b'4')), (3, 4.0))
+        self.assertEqual(Cmd('a', r'^A(.)(.)(.)$', argument_mappings=(int, float, bytes))
+                         .convert_arguments((b'3', b'4', b'5')), (3, 4.0, b'5'))
+
+    def test_wrong_number_of_argument_mappings(self):
+        self.assertRaises(RuntimeError, Cmd, 'a', r'^A(.)$', argument_mappings=(int, int))
+
+    def test_argument_struct(self):
+        cmd = Cmd('a', r'^A(.{6})$', argument_struct='<hf')
+        self.assertEqual(cmd.convert_arguments((struct.pack('<hf', -2, 1.5),)), (-2, 1.5))
+
+        cmd = Cmd('a', r'^A(.{6})$', argument_struct='<hf',
+                  argument_mappings=(abs, lambda x: x * 2))
+        self.assertEqual(cmd.convert_arguments((struct.pack('<hf', -2, 1.5),)), (2, 3.0))
+
+    def test_invalid_argument_struct(self):
+        self.assertRaises(RuntimeError, Cmd, 'a', r'^A(.)(.)$', argument_struct='<h')
+        self.assertRaises(RuntimeError, Cmd, 'a', r'^A(..)$', argument_struct='<h',
+                          argument_mappings=(int, int))
+
+    def test_return_value_conversion(self):
+        self.assertEqual(Cmd('a', r'^A$').convert_return_value(3), '3')
+        self.assertEqual(Cmd('a', r'^A$').convert_return_value(b'\x01'), b'\x01')
+        self.assertEqual(Cmd('a', r'^A$').convert_return_value(None), None)
+
+        cmd = Cmd('a', r'^A$', noise=lambda: 0.5, return_mapping=lambda x: x)
+        self.assertEqual(cmd.convert_return_value(1.0), 1.5)
+        self.assertEqual(cmd.convert_return_value(None), None)
+
+
+class TestCommandMetrics(unittest.TestCase):
+    def test_latency_buckets(self):
+        cmd = Cmd('a', r'^A$')
+        metrics = CommandMetrics([cmd])
+
+        metrics.record(cmd, 1, 1, 0.0)
+        metrics.record(cmd, 1, 1, 3e-6)
+        metrics.record(cmd, 1, 1, 100.0)
+
+        latency = metrics.as_list()[0]['latency']
+
+        self.assertEqual(latency[0], 1)
+        self.assertEqual(latency[2], 1)
+        self.assertEqual(latency[-1], 1)
+
+    def test_failed_requests(self):
+        cmd = Cmd('a', r'^A$')
+        metrics = CommandMetrics([cmd])
+
+        metrics.record(cmd, 1, 0, 0.0, failed=True)
+        metrics.record(None, 5, 0, 0.0, failed=True)
+
+        first, unmatched = metrics.as_list()
+
+        self.assertEqual((first['method'], first['pattern']), ('a', '^A$'))
+        self.assertEqual((first['calls'], first['errors']), (1, 1))
+        self.assertEqual((unmatched['method'], unmatched['calls']), (None, 1))
+        self.assertEqual(unmatched['bytes_in'], 5)
+
+    def test_counters_exceed_32_bits(self):
+        cmd = Cmd('a', r'^A$')
+        metrics = CommandMetrics([cmd])
+
+        for _ in range(3):
+            metrics.record(cmd, 2 ** 31, 2 ** 31, 0.0)
+
+        self.assertEqual(metrics.as_list()[0]['bytes_in'], 3 * 2 ** 31)
+        self.assertEqual(metrics.as_list()[0]['bytes_out'], 3 * 2 ** 31)
+
+
+class TestLiteralPrefix(unittest.TestCase):
+    def assertPrefix(self, regex, prefix, flags=0):
+        self.assertEqual(literal_prefix(re.compile(regex, flags)), prefix)
+
+    def test_literal_characters(self):
+        self.assertPrefix(br'^T$', b'T')
+        self.assertPrefix(br'^R1([0-9]+)$', b'R1')
+        self.assertPrefix(br'abc', b'abc')
+
+    def test_escaped_characters(self):
+        self.assertPrefix(br'^S\?$', b'S?')
+        self.assertPrefix(br'^\d+', b'')
+
+    def test_optional_characters_are_excluded(self):
+        self.assertPrefix(br'^ab*', b'a')
+        self.assertPrefix(br'^ab?', b'a')
+        self.assertPrefix(br'^ab{2}', b'a')
+        self.assertPrefix(br'^ab+', b'ab')
+
+    def test_alternation(self):
+        self.assertPrefix(br'^a|b', b'')
+        self.assertPrefix(br'^P(a0|m0)$', b'P')
+
+    def test_flags(self):
+        self.assertPrefix(br'^abc', b'', re.IGNORECASE)
+        self.assertPrefix(br'(?i)abc', b'')
+
+
+class TestCommandIndex(unittest.TestCase):
+    def test_match(self):
+        commands = [Cmd('a', r'^P1\?$'), Cmd('b', r'^P12\?$'), Cmd('c', r'^[0-9]+$')]
+        index = CommandIndex(commands)
+
+        self.assertEqual(index.match(b'P1?')[0], commands[0])
+        self.assertEqual(index.match(b'P12?')[0], commands[1])
+        self.assertEqual(index.match(b'123')[0], commands[2])
+        self.assertEqual(index.match(b'P2?'), (None, None))
+        self.assertEqual(index.match(b''), (None, None))
+
+    def test_first_command_takes_precedence(self):
+        commands = [Cmd('a', r'^[A-Z]+$'), Cmd('b', r'^AB$'), Cmd('c', r'^A.$')]
+
+        self.assertEqual(CommandIndex(commands).match(b'AB')[0], commands[0])
+        self.assertEqual(CommandIndex(commands[1:]).match(b'AB')[0], commands[1])
+
+    def test_candidates(self):
+        commands = [Cmd('a', r'^P1\?$'), Cmd('b', r'^T$'), Cmd('c', r'^(.+)$')]
+        index = CommandIndex(commands)
+
+        self.assertEqual([cmd for _, cmd in index.candidates(b'P1?')],
+                         [commands[0], commands[2]])
+        self.assertEqual([cmd for _, cmd in index.candidates(b'X')], [commands[2]])
+
+    def test_sets_are_ordered_by_pattern(self):
+        commands = {Cmd('a', r'^B$'), Cmd('b', r'^A$'), Cmd('c', r'^C$')}
+
+        self.assertEqual([cmd.pattern.pattern for cmd in CommandIndex(commands).commands],
+                         [b'^A$', b'^B$', b'^C$'])